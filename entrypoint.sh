@@ -27,6 +27,12 @@ echo "Creating media directories..."
 mkdir -p /app/media/audio
 chmod -R 777 /app/media || true
 
+# Файлы метрик прошлого запуска контейнера (процессов с такими PID больше нет)
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 echo "Starting application..."
 exec "$@"
 
@@ -6,4 +6,6 @@ class RecordingsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recordings'
     verbose_name = 'Записи'
-
+    
+    def ready(self):
+        from . import signals  # noqa: F401
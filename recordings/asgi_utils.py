@@ -0,0 +1,24 @@
+"""Helpers shared by raw ASGI endpoints (WebSocket live transcription, SSE events)"""
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user
+
+
+def get_headers(scope) -> dict:
+    return {name.decode('latin1').lower(): value.decode('latin1') for name, value in scope.get('headers', [])}
+
+
+def load_user(scope):
+    """Resolve Django user from the session cookie of the request"""
+    headers = get_headers(scope)
+    cookie = SimpleCookie()
+    cookie.load(headers.get('cookie', ''))
+    morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore(morsel.value if morsel else None)
+    # get_user() использует только request.session, полноценный HttpRequest не нужен
+    return get_user(SimpleNamespace(session=session))
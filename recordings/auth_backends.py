@@ -0,0 +1,32 @@
+"""Authentication backend that keeps session users in the cache"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+
+def _user_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def forget_cached_user(user_id):
+    cache.delete(_user_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend without a user query on every request
+
+    AuthenticationMiddleware загружает пользователя сессии на каждый запрос,
+    в том числе на опрос статусов из открытых вкладок. Пользователь кешируется
+    на AUTH_USER_CACHE_TIMEOUT секунд и сбрасывается сигналом при сохранении
+    (смена пароля по-прежнему завершает остальные сессии).
+    """
+
+    def get_user(self, user_id):
+        key = _user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 300))
+        return user
@@ -0,0 +1,157 @@
+"""Incremental checkpoints of long transcriptions (resume after retry or worker loss)"""
+import hashlib
+import json
+import logging
+import time
+from typing import Dict, List
+
+from django.conf import settings
+
+from .models import TranscriptionCheckpoint, UploadSession
+
+logger = logging.getLogger(__name__)
+
+
+def build_signature(recognition_service: str, model_name: str, language: str) -> str:
+    """Checkpoint is valid only for the same engine, model and language"""
+    payload = json.dumps([recognition_service, model_name or '', language or ''])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class Checkpointer:
+    """
+    Checkpoint passed to SpeechRecognitionService.transcribe_file()
+
+    Сервис читает resume_from (с какой секунды продолжать) и вызывает
+    commit(new_segments, processed_seconds), когда аудио до processed_seconds
+    распознано окончательно. В базу сегменты пишутся не чаще
+    TRANSCRIPTION_CHECKPOINT_INTERVAL секунд, поэтому при OOM или потере
+    воркера повторно декодируется не больше одного интервала.
+    """
+
+    def __init__(self, recording, signature: str):
+        self.recording = recording
+        self.signature = signature
+        self.interval = getattr(settings, 'TRANSCRIPTION_CHECKPOINT_INTERVAL', 30)
+        self.resume_from = 0.0
+        self.segments: List[Dict] = []
+        self._dirty = False
+        self._flushed_at = time.monotonic()
+        self._load()
+
+        # Сегменты предыдущих попыток - сервис вернет только то, что распознал сам
+        self.resumed_from = self.resume_from
+        self._prior_segments = list(self.segments)
+
+    def _load(self):
+        checkpoint = TranscriptionCheckpoint.objects.filter(recording=self.recording).first()
+        if checkpoint is not None:
+            if checkpoint.signature == self.signature:
+                self.resume_from = checkpoint.processed_seconds
+                self.segments = list(checkpoint.segments or [])
+            else:
+                # Распознавание перезапущено с другой моделью или языком
+                checkpoint.delete()
+
+    def _store(self):
+        TranscriptionCheckpoint.objects.update_or_create(
+            recording=self.recording,
+            defaults={
+                'signature': self.signature,
+                'processed_seconds': self.resume_from,
+                'segments': self.segments,
+            },
+        )
+
+    def _label(self) -> str:
+        return f"записи {self.recording.pk}"
+
+    @property
+    def is_resumed(self) -> bool:
+        return self.resumed_from > 0
+
+    def commit(self, segments: List[Dict], processed_seconds: float):
+        """Add finalized segments, audio up to processed_seconds will not be decoded again"""
+        self.segments.extend(segments)
+        self.resume_from = max(self.resume_from, processed_seconds)
+        self._dirty = True
+        if time.monotonic() - self._flushed_at >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """Write pending segments to the database"""
+        if not self._dirty:
+            return
+        try:
+            self._store()
+            self._dirty = False
+            self._flushed_at = time.monotonic()
+            logger.debug(f"Чекпоинт {self._label()}: {self.resume_from:.1f} сек, сегментов {len(self.segments)}")
+        except Exception as e:
+            # Сбой чекпоинта не должен прерывать распознавание
+            logger.warning(f"Не удалось сохранить чекпоинт {self._label()}: {e}")
+
+    def merge(self, result: Dict) -> Dict:
+        """Prepend segments recognized before the resume to the service result"""
+        if not self.is_resumed:
+            return result
+        prior = self._prior_segments
+        segments = prior + list(result.get('segments') or [])
+        prior_text = ' '.join(segment.get('text', '').strip() for segment in prior).strip()
+        return dict(
+            result,
+            text=' '.join(part for part in (prior_text, result.get('text', '')) if part).strip(),
+            segments=segments or None,
+        )
+
+    def delete(self):
+        TranscriptionCheckpoint.objects.filter(recording=self.recording).delete()
+
+
+
+class UploadPrefixCheckpointer(Checkpointer):
+    """
+    Checkpoint of a streaming upload whose recording is still going on
+
+    Распознается уже принятое начало файла. Сегменты сохраняются в
+    UploadSession, а при завершении загрузки переносятся в чекпоинт новой
+    записи (uploads.adopt_prefix_checkpoint) - итоговая задача декодирует
+    только хвост. Конец принятой части обрезан посреди фразы и посреди
+    кластера контейнера, поэтому после limit ничего не фиксируется.
+    """
+
+    def __init__(self, session: UploadSession, signature: str, limit: float):
+        self.session = session
+        self.limit = limit
+        self.closed = False
+        super().__init__(None, signature)
+        # Загрузка может завершиться в любой момент - каждый сегмент пишется сразу
+        self.interval = 0
+
+    def _load(self):
+        if self.session.prefix_signature == self.signature:
+            self.resume_from = self.session.prefix_seconds
+            self.segments = list(self.session.prefix_segments or [])
+
+    def _store(self):
+        # После создания записи начало уже перенесено в ее чекпоинт
+        UploadSession.objects.filter(pk=self.session.pk, recording__isnull=True).update(
+            prefix_signature=self.signature,
+            prefix_seconds=self.resume_from,
+            prefix_segments=self.segments,
+        )
+
+    def _label(self) -> str:
+        return f"загрузки {self.session.pk}"
+
+    def commit(self, segments: List[Dict], processed_seconds: float):
+        if self.closed:
+            return
+        if processed_seconds > self.limit:
+            # Дальше граница принятых данных: берем только сегменты, целиком лежащие до нее
+            self.closed = True
+            segments = [segment for segment in segments if segment['end'] <= self.limit]
+            if segments:
+                super().commit(segments, segments[-1]['end'])
+            return
+        super().commit(segments, processed_seconds)
@@ -0,0 +1,92 @@
+"""Per-user dashboard statistics cached in the default cache (Redis)"""
+import logging
+from typing import Dict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .progress import get_progress_many
+
+logger = logging.getLogger(__name__)
+
+RECENT_LIMIT = 10
+
+
+def _generation_key(user_id):
+    return f'dashboard-gen:{user_id}'
+
+
+def _snapshot_key(user_id, generation):
+    # Поколение в ключе: снимок, построенный параллельно со сбросом, не переживет его
+    return f'dashboard:{user_id}:{generation}'
+
+
+def get_stats(user_id) -> Dict:
+    """Recording counters of the user in one conditional aggregation query"""
+    from .models import Recording
+
+    return Recording.objects.filter(user_id=user_id).aggregate(
+        total_recordings=Count('id'),
+        completed_recordings=Count('id', filter=Q(status='completed')),
+        processing_recordings=Count('id', filter=Q(status__in=['ingesting', 'processing', 'uploaded'])),
+    )
+
+
+def _build_snapshot(user_id) -> Dict:
+    from .models import Recording
+    from .tasks import get_transcription_queue
+
+    recent = Recording.objects.filter(user_id=user_id).without_transcription().order_by('-created_at')[:RECENT_LIMIT]
+    return {
+        **get_stats(user_id),
+        'recordings': [
+            {
+                'id': rec.id,
+                'title': rec.title,
+                'status': rec.status,
+                'status_display': rec.get_status_display(),
+                'created_at': rec.created_at.isoformat(),
+                'processed_at': rec.processed_at.isoformat() if rec.processed_at else None,
+                'has_transcription': rec.has_transcription,
+                'queue': get_transcription_queue(rec),
+            }
+            for rec in recent
+        ],
+    }
+
+
+def get_snapshot(user_id) -> Dict:
+    """
+    Counters and recent recordings of the user
+
+    Снимок хранится в кеше до изменения любой записи пользователя
+    (сигналы post_save/post_delete), поэтому опрос дашборда из открытых
+    вкладок не обращается к базе. Прогресс распознавания берется из кеша
+    отдельно при каждом запросе - он меняется чаще, чем записи.
+    """
+    key = _snapshot_key(user_id, cache.get(_generation_key(user_id), 0))
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = _build_snapshot(user_id)
+        cache.set(key, snapshot, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 600))
+
+    progress = get_progress_many(rec['id'] for rec in snapshot['recordings'] if rec['status'] == 'processing')
+    for rec in snapshot['recordings']:
+        rec_progress = progress.get(rec['id'], {})
+        rec['progress'] = rec_progress.get('progress')
+        rec['eta_seconds'] = rec_progress.get('eta_seconds')
+    return snapshot
+
+
+def invalidate(user_id):
+    """Drop cached snapshot after a recording of the user changed"""
+    key = _generation_key(user_id)
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+    except Exception as e:
+        # Недоступный кеш не должен мешать сохранению записи; снимок истечет по таймауту
+        logger.warning(f"Не удалось сбросить кеш дашборда пользователя {user_id}: {e}")
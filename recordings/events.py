@@ -0,0 +1,155 @@
+"""
+Dashboard events over Redis pub/sub, delivered to browsers as Server-Sent Events
+
+Изменения записей (сигнал post_save/post_delete, в том числе каждая смена
+статуса задачей распознавания) и прогресс распознавания публикуются в канал
+пользователя. ASGI endpoint DASHBOARD_EVENTS_PATH держит по одному потоку
+text/event-stream на вкладку и пересылает события из канала; открытый, но
+неизменный дашборд не делает запросов ни к Django, ни к базе данных.
+"""
+import asyncio
+import json
+import logging
+from typing import Dict, Iterable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .asgi_utils import load_user
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_EVENTS_PATH = '/events/dashboard/'
+CHANNEL = 'recording-events:{user_id}'
+
+
+def _get_redis():
+    """Raw Redis client of the default cache, None для не-Redis кеша (LocMem в разработке)"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except Exception:
+        return None
+
+
+def _get_redis_url():
+    cache_settings = settings.CACHES.get('default', {})
+    if 'django_redis' not in cache_settings.get('BACKEND', ''):
+        return None
+    location = cache_settings.get('LOCATION')
+    return location[0] if isinstance(location, (list, tuple)) else location
+
+
+def publish(user_ids: Iterable[int], event: Dict):
+    """Send event to dashboards of the users, ошибки Redis не пробрасываются"""
+    client = _get_redis()
+    if client is None:
+        return
+    message = json.dumps(event, ensure_ascii=False)
+    try:
+        pipe = client.pipeline()
+        for user_id in set(user_ids):
+            pipe.publish(CHANNEL.format(user_id=user_id), message)
+        pipe.execute()
+    except Exception as e:
+        logger.debug(f"Не удалось опубликовать событие {event.get('type')}: {e}")
+
+
+def publish_recording_changed(user_id, recording_id, status=None):
+    """Recording created, deleted or changed its state - клиент перечитает снимок дашборда"""
+    publish([user_id], {'type': 'recording', 'id': recording_id, 'status': status})
+
+
+def publish_progress(user_ids: Iterable[int], recording_ids: Iterable[int], progress: Dict):
+    """Progress of running transcription (поля progress и eta_seconds API статуса)"""
+    publish(user_ids, {'type': 'progress', 'ids': list(recording_ids), **progress})
+
+
+def _format_sse(event_type: str, data: Dict) -> bytes:
+    return f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
+
+
+async def _send_text(send, body: bytes):
+    await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+
+async def _reject(send, status: int):
+    # Клиент по ошибке соединения переходит на опрос API
+    await send({'type': 'http.response.start', 'status': status, 'headers': [(b'content-type', b'text/plain')]})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def dashboard_events_app(scope, receive, send):
+    """Stream dashboard events of the session user as text/event-stream"""
+    if scope['method'] != 'GET':
+        await _reject(send, 405)
+        return
+
+    user = await sync_to_async(load_user)(scope)
+    if not user.is_authenticated:
+        await _reject(send, 403)
+        return
+
+    redis_url = _get_redis_url()
+    if redis_url is None:
+        await _reject(send, 503)
+        return
+
+    import redis.asyncio as aioredis
+
+    client = aioredis.from_url(redis_url)
+    pubsub = client.pubsub()
+    try:
+        await pubsub.subscribe(CHANNEL.format(user_id=user.pk))
+    except Exception as e:
+        logger.warning(f"Не удалось подписаться на события пользователя {user.username}: {e}")
+        await client.aclose()
+        await _reject(send, 503)
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),  # nginx не должен буферизовать поток
+        ],
+    })
+    retry_ms = int(getattr(settings, 'DASHBOARD_EVENTS_RETRY', 5) * 1000)
+    await _send_text(send, f"retry: {retry_ms}\n".encode() + _format_sse('ready', {}))
+
+    heartbeat = getattr(settings, 'DASHBOARD_EVENTS_HEARTBEAT', 15)
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        while not disconnected.done():
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat)
+            if disconnected.done():
+                break
+            if message is None:
+                # Комментарий держит соединение через прокси и выявляет закрытые вкладки
+                await _send_text(send, b": ping\n\n")
+                continue
+            try:
+                event = json.loads(message['data'])
+            except (TypeError, ValueError):
+                continue
+            await _send_text(send, _format_sse(event.pop('type', 'message'), event))
+    except OSError:
+        # Соединение с клиентом оборвано
+        pass
+    finally:
+        disconnected.cancel()
+        try:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+            await client.aclose()
+        except Exception:
+            pass
+
+
+async def _wait_disconnect(receive):
+    while True:
+        event = await receive()
+        if event['type'] == 'http.disconnect':
+            return
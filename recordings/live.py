@@ -0,0 +1,175 @@
+"""ASGI WebSocket endpoint for live transcription with Vosk"""
+import json
+import logging
+from pathlib import Path
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .asgi_utils import get_headers, load_user
+from .models import Recording, TranscriptSegment, UserSettings, audio_upload_path
+from .search import get_search_config
+from .services.vosk_stream import LiveTranscriptionSession, STREAM_SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+LIVE_TRANSCRIPTION_PATH = '/ws/live-transcription/'
+
+
+def _origin_allowed(scope) -> bool:
+    """Protect against cross-site WebSocket hijacking (браузер всегда шлет Origin)"""
+    headers = get_headers(scope)
+    origin = headers.get('origin')
+    if not origin:
+        return False
+    if urlparse(origin).netloc == headers.get('host'):
+        return True
+    return origin in getattr(settings, 'CSRF_TRUSTED_ORIGINS', [])
+
+
+def _save_recording(user, file_name: str, model_id, title: str, result: dict):
+    """Persist finished live recording together with its transcript"""
+    with transaction.atomic():
+        recording = Recording.objects.create(
+            user=user,
+            title=title or f"Запись {timezone.localtime().strftime('%Y-%m-%d %H:%M:%S')}",
+            audio_file=file_name,
+            recognition_service='vosk',
+            whisper_model=None,
+            vosk_model=model_id,
+            status='completed',
+            transcription=result['text'],
+            search_config=get_search_config(
+                UserSettings.objects.filter(user=user).values_list('language', flat=True).first()
+            ),
+            duration=result['duration'],
+            processed_at=timezone.now(),
+        )
+        TranscriptSegment.objects.bulk_create(TranscriptSegment.from_result(recording, result['segments']))
+    return recording
+
+
+async def _send_json(send, payload: dict):
+    await send({'type': 'websocket.send', 'text': json.dumps(payload, ensure_ascii=False)})
+
+
+async def live_transcription_app(scope, receive, send):
+    """
+    Live transcription protocol
+
+    Клиент подключается к /ws/live-transcription/?vosk_model=<id>&title=<название>,
+    шлет бинарные кадры s16le 16 kHz моно и текстовое сообщение {"type": "stop"}
+    по окончании. Сервер отвечает событиями partial/final и в конце completed
+    с идентификатором сохраненной записи.
+    """
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+
+    user = await sync_to_async(load_user)(scope)
+    if not user.is_authenticated or not _origin_allowed(scope):
+        # Закрытие до accept - клиент получит HTTP 403
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+
+    params = parse_qs(scope.get('query_string', b'').decode())
+    model_id = (params.get('vosk_model') or [None])[0] or None
+    title = (params.get('title') or [''])[0].strip()[:200]
+
+    file_name = audio_upload_path(
+        SimpleNamespace(user=user),
+        f"live_{timezone.localtime().strftime('%Y%m%d_%H%M%S')}.wav",
+    )
+    file_name = default_storage.get_available_name(file_name)
+    output_path = Path(settings.MEDIA_ROOT) / file_name
+
+    await send({'type': 'websocket.accept'})
+
+    session = None
+    try:
+        session = await sync_to_async(LiveTranscriptionSession, thread_sensitive=False)(model_id, output_path)
+        started = await sync_to_async(session.start, thread_sensitive=False)()
+    except Exception as e:
+        logger.error(f"Не удалось начать живое распознавание для {user.username}: {e}")
+        if session is not None:
+            session.close()
+        output_path.unlink(missing_ok=True)
+        await _send_json(send, {'type': 'error', 'error': f'Ошибка инициализации Vosk: {e}'})
+        await send({'type': 'websocket.close', 'code': 1011})
+        return
+
+    if not started:
+        await _send_json(send, {'type': 'error', 'error': 'Все слоты живого распознавания заняты, попробуйте позже'})
+        await send({'type': 'websocket.close', 'code': 1013})
+        return
+
+    max_samples = getattr(settings, 'VOSK_STREAM_MAX_DURATION', 3 * 3600) * STREAM_SAMPLE_RATE
+    accept = sync_to_async(session.accept, thread_sensitive=False)
+    disconnected = False
+    recording = None
+    logger.info(f"Живое распознавание начато: user={user.username}, модель={model_id}, файл={file_name}")
+
+    try:
+        while True:
+            event = await receive()
+            if event['type'] == 'websocket.disconnect':
+                disconnected = True
+                break
+            if event['type'] != 'websocket.receive':
+                continue
+
+            if event.get('bytes'):
+                update = await accept(event['bytes'])
+                if update:
+                    await _send_json(send, update)
+                if session.samples >= max_samples:
+                    logger.warning(f"Живая запись {file_name} достигла лимита длительности")
+                    break
+            elif event.get('text'):
+                try:
+                    message = json.loads(event['text'])
+                except ValueError:
+                    continue
+                if message.get('type') == 'stop':
+                    break
+
+        result = await sync_to_async(session.finish, thread_sensitive=False)()
+        if session.samples == 0:
+            if not disconnected:
+                await _send_json(send, {'type': 'error', 'error': 'Аудио не получено'})
+                await send({'type': 'websocket.close', 'code': 1000})
+            return
+
+        # Запись сохраняется и при обрыве соединения - уже полученное аудио не теряется
+        recording = await sync_to_async(_save_recording)(
+            user, file_name, model_id or session.service.model_id, title, result
+        )
+        logger.info(f"Живая запись {recording.id} сохранена: {result['duration']:.1f} сек, {len(result['text'])} символов")
+
+        if not disconnected:
+            await _send_json(send, {
+                'type': 'completed',
+                'recording_id': recording.id,
+                'text': result['text'],
+                'redirect_url': reverse('recording_detail', args=[recording.id]),
+            })
+            await send({'type': 'websocket.close', 'code': 1000})
+    except Exception as e:
+        logger.error(f"Живое распознавание {file_name} прервано ошибкой: {e}")
+        if not disconnected and recording is None:
+            try:
+                await _send_json(send, {'type': 'error', 'error': f'Ошибка живого распознавания: {e}'})
+                await send({'type': 'websocket.close', 'code': 1011})
+            except Exception:
+                pass  # Соединение уже закрыто
+    finally:
+        session.close()
+        # WAV без записи в БД (ошибка, пустой поток) никому не принадлежит - удаляем
+        if recording is None:
+            output_path.unlink(missing_ok=True)
@@ -0,0 +1,81 @@
+"""
+Management command для заполнения длительности существующих записей по заголовкам файлов
+Использование: python manage.py backfill_durations --workers=16 --dry-run
+"""
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from recordings.models import Recording
+from recordings.services import audio_probe
+
+
+class Command(BaseCommand):
+    help = 'Определяет длительность записей без нее (или всех с --all) параллельным чтением заголовков файлов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Записей за один проход (по умолчанию 500)')
+        parser.add_argument('--workers', type=int, default=None, help='Потоков чтения файлов (по умолчанию AUDIO_PROBE_WORKERS)')
+        parser.add_argument('--all', action='store_true', help='Перепроверить все записи, а не только без длительности')
+        parser.add_argument('--dry-run', action='store_true', help='Показать найденные длительности без сохранения')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        query = Recording.objects.exclude(audio_file='')
+        if not options['all']:
+            query = query.filter(duration__isnull=True)
+        total = query.count()
+        if total == 0:
+            self.stdout.write(self.style.SUCCESS('Нет записей для заполнения длительности'))
+            return
+        self.stdout.write(f'Найдено {total} записей')
+        if dry_run:
+            self.stdout.write(self.style.WARNING('РЕЖИМ DRY-RUN - ничего не будет сохранено'))
+
+        started = time.perf_counter()
+        updated = unchanged = failed = 0
+        methods = {}
+        last_pk = 0
+        while True:
+            # Постранично по pk: записи, которые не удалось разобрать, не выбираются повторно
+            batch = list(query.filter(pk__gt=last_pk).order_by('pk').only('pk', 'audio_file', 'duration')[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            results = audio_probe.probe_many(
+                [Path(recording.audio_file.path) for recording in batch],
+                workers=options['workers'],
+            )
+            changed = []
+            for recording, info in zip(batch, results):
+                if info['duration'] is None:
+                    failed += 1
+                    continue
+                methods[info['method']] = methods.get(info['method'], 0) + 1
+                if recording.duration is not None and abs(recording.duration - info['duration']) < 0.01:
+                    unchanged += 1
+                    continue
+                if dry_run and len(changed) < 10:
+                    self.stdout.write(f"  - {recording.pk}: {recording.duration} -> {info['duration']:.2f} сек ({info['method']})")
+                recording.duration = info['duration']
+                changed.append(recording)
+
+            if changed and not dry_run:
+                Recording.objects.bulk_update(changed, ['duration'])
+            updated += len(changed)
+            self.stdout.write(f'Обработано {updated + unchanged + failed} из {total}...')
+
+        elapsed = time.perf_counter() - started
+        by_method = ', '.join(f'{method}: {count}' for method, count in methods.items()) or '-'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\n{"Будет обновлено" if dry_run else "Обновлено"} {updated} записей, без изменений {unchanged} '
+                f'за {elapsed:.1f} сек (источник - {by_method})'
+            )
+        )
+        if failed:
+            self.stdout.write(self.style.WARNING(f'Не удалось определить длительность {failed} записей'))
@@ -0,0 +1,65 @@
+"""
+Management command для сравнения пакетного и последовательного распознавания faster-whisper
+Использование: python manage.py benchmark_batch_transcription file1.wav file2.webm ... --model=base
+"""
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recordings.services.faster_whisper_service import FasterWhisperService, BATCHED_INFERENCE_AVAILABLE
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает пропускную способность пакетного режима faster-whisper с обработкой по одному файлу'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='Аудио файлы (имитация очереди записей)')
+        parser.add_argument('--model', default='base', help='Модель Whisper (по умолчанию base)')
+        parser.add_argument('--language', default='ru', help='Язык распознавания (по умолчанию ru)')
+        parser.add_argument('--batch-size', type=int, default=8, help='Окон в одном вызове модели')
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        if not BATCHED_INFERENCE_AVAILABLE:
+            raise CommandError('Пакетный режим требует faster-whisper>=1.1')
+
+        files = [Path(f) for f in options['files']]
+        missing = [str(f) for f in files if not f.exists()]
+        if missing:
+            raise CommandError(f'Файлы не найдены: {", ".join(missing)}')
+
+        service = FasterWhisperService(device='cpu', compute_type='int8')
+        model, language = options['model'], options['language']
+
+        # Прогрев: загрузка модели не должна попадать в замеры
+        service.load_model(model)
+
+        started = time.perf_counter()
+        for path in files:
+            # Текущий путь: одна задача - один вызов transcribe_file
+            service.transcribe_file(path, model_size=model, language=language)
+        sequential = time.perf_counter() - started
+
+        started = time.perf_counter()
+        service.transcribe_batch(files, model_size=model, language=language, batch_size=options['batch_size'])
+        batched = time.perf_counter() - started
+
+        report = {
+            'files': len(files),
+            'model': model,
+            'batch_size': options['batch_size'],
+            'sequential_seconds': round(sequential, 2),
+            'batched_seconds': round(batched, 2),
+            'speedup': round(sequential / batched, 2) if batched else None,
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(f'Файлов: {len(files)}, модель: {model}, batch_size: {options["batch_size"]}')
+        self.stdout.write(f'По одному файлу: {sequential:.2f} сек')
+        self.stdout.write(f'Пакетно:         {batched:.2f} сек')
+        self.stdout.write(self.style.SUCCESS(f'Ускорение: x{report["speedup"]}'))
@@ -0,0 +1,108 @@
+"""
+Management command для замера времени декодирования: каждый движок сам против кеша PCM
+Использование: python manage.py benchmark_decode media/audio/.../recording.webm --repeat=3
+"""
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recordings.models import Recording
+from recordings.services import pcm_cache
+
+
+def _median_ms(timings):
+    return round(statistics.median(timings) * 1000, 1)
+
+
+def _engine_decoders():
+    """Decoders that the engines use on their own, только установленные"""
+    decoders = {}
+    try:
+        from whisper.audio import load_audio
+        decoders['openai-whisper (ffmpeg s16le)'] = lambda path: load_audio(str(path))
+    except ImportError:
+        pass
+    try:
+        from faster_whisper import decode_audio
+        decoders['faster-whisper (PyAV)'] = lambda path: decode_audio(str(path), sampling_rate=pcm_cache.SAMPLE_RATE)
+    except ImportError:
+        pass
+    try:
+        from recordings.services.vosk_service import VoskService
+        # Модель Vosk не нужна - замеряется только поток PCM из ffmpeg, __init__ не вызывается
+        vosk = VoskService.__new__(VoskService)
+        decoders['vosk (ffmpeg pipe)'] = lambda path: sum(len(chunk) for chunk in vosk._iter_pcm(path))
+    except ImportError:
+        pass
+    return decoders
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает декодирование файла каждым движком с чтением готового PCM из кеша'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='Аудио файлы')
+        parser.add_argument('--recording', type=int, action='append', default=[], help='ID записи (можно несколько)')
+        parser.add_argument('--repeat', type=int, default=3, help='Повторов каждого замера')
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def _measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return _median_ms(timings)
+
+    def _benchmark_file(self, path: Path, repeat: int, decoders) -> dict:
+        report = {'file': str(path), 'size_mb': round(path.stat().st_size / (1024 * 1024), 2), 'engines': {}}
+        for name, decoder in decoders.items():
+            report['engines'][name] = self._measure(lambda: decoder(path), repeat)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            target = Path(tmp) / f'benchmark{pcm_cache.SUFFIX}'
+            report['pcm_decode_ms'] = self._measure(lambda: pcm_cache.decode(path, target), repeat)
+            audio = pcm_cache.open_pcm(target)
+            report['duration_seconds'] = round(len(audio) / pcm_cache.SAMPLE_RATE, 1)
+            report['pcm_mb'] = round(target.stat().st_size / (1024 * 1024), 1)
+            del audio
+            # Повторный запуск: отображение файла и чтение всех отсчетов (движок читает их все)
+            report['pcm_cached_ms'] = self._measure(lambda: float(pcm_cache.open_pcm(target).sum()), repeat)
+        return report
+
+    def handle(self, *args, **options):
+        paths = [Path(path) for path in options['paths']]
+        for recording_id in options['recording']:
+            try:
+                paths.append(Path(Recording.objects.get(pk=recording_id).audio_file.path))
+            except Recording.DoesNotExist:
+                raise CommandError(f'Запись {recording_id} не найдена')
+        if not paths:
+            raise CommandError('Укажите аудио файлы или --recording')
+        missing = [str(path) for path in paths if not path.exists()]
+        if missing:
+            raise CommandError(f"Файлы не найдены: {', '.join(missing)}")
+
+        decoders = _engine_decoders()
+        reports = [self._benchmark_file(path, options['repeat'], decoders) for path in paths]
+
+        if options['json']:
+            self.stdout.write(json.dumps(reports, ensure_ascii=False, indent=2))
+            return
+
+        for report in reports:
+            self.stdout.write(
+                f"{report['file']}: {report['size_mb']} MB, {report['duration_seconds']} сек аудио, "
+                f"PCM {report['pcm_mb']} MB"
+            )
+            cached = report['pcm_cached_ms']
+            self.stdout.write(f"  декодирование в кеш PCM      {report['pcm_decode_ms']:>9.1f} мс (один раз)")
+            self.stdout.write(f"  повторный запуск из кеша     {cached:>9.1f} мс")
+            for name, elapsed in report['engines'].items():
+                self.stdout.write(
+                    f"  {name:28} {elapsed:>9.1f} мс | экономия на повторе {elapsed - cached:>9.1f} мс"
+                )
@@ -0,0 +1,317 @@
+"""
+Management command для замера скорости движков распознавания на этом железе
+Использование:
+    python manage.py benchmark_recognition media/audio/.../a.webm --engine faster-whisper:base:int8 --engine vosk
+    python manage.py benchmark_recognition --synthetic 30,300 --output bench.json
+    python manage.py benchmark_recognition --corpus samples/ --baseline bench.json --tolerance 0.2
+"""
+import json
+import os
+import platform
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recordings.services import pcm_cache
+from recordings.services.model_registry import (
+    MB, get_model_registry, get_peak_rss_bytes, get_rss_bytes, reset_peak_rss,
+)
+from recordings.services.system_resources import get_cpu_quota
+
+DEFAULT_ENGINES = ['faster-whisper:tiny:int8', 'faster-whisper:base:int8', 'whisper:tiny', 'vosk']
+# Гласные (F1, F2) для синтетического сигнала
+VOWEL_FORMANTS = [(730, 1090), (530, 1840), (270, 2290), (570, 840), (300, 870), (660, 1720)]
+
+
+def speech_like_signal(duration: float, seed: int = 0) -> np.ndarray:
+    """
+    Speech-like test signal, 16 kHz float32
+
+    Не речь, но нагружает движки похоже: основной тон 100-220 Hz с гармониками,
+    форманты гласных меняются по слогам (~5 в секунду), между фразами паузы -
+    VAD режет сигнал на куски, как настоящую запись.
+    """
+    rng = np.random.default_rng(seed)
+    sample_rate = pcm_cache.SAMPLE_RATE
+    signal = np.zeros(int(duration * sample_rate), dtype=np.float32)
+    position = 0
+    while position < len(signal):
+        if rng.random() < 0.15:
+            # Пауза между фразами
+            position += int(rng.uniform(0.3, 1.2) * sample_rate)
+            continue
+        length = min(int(rng.uniform(0.12, 0.3) * sample_rate), len(signal) - position)
+        t = np.arange(length) / sample_rate
+        f0 = rng.uniform(100, 220) * (1 + 0.05 * np.sin(2 * np.pi * 3 * t))
+        phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+        f1, f2 = VOWEL_FORMANTS[rng.integers(len(VOWEL_FORMANTS))]
+        syllable = np.zeros(length)
+        for k in range(1, int(4000 / f0.mean())):
+            frequency = k * f0.mean()
+            gain = np.exp(-((frequency - f1) / 120) ** 2) + 0.6 * np.exp(-((frequency - f2) / 180) ** 2) + 0.02
+            syllable += gain * np.sin(k * phase)
+        syllable *= np.sin(np.pi * np.arange(length) / length) ** 2
+        signal[position:position + length] = syllable / (np.abs(syllable).max() or 1) * 0.5
+        position += length
+    signal += rng.normal(0, 0.003, len(signal)).astype(np.float32)
+    return signal
+
+
+def parse_engine(spec: str) -> dict:
+    """'faster-whisper:base:int8' -> {'engine', 'model', 'compute_type', 'key'}"""
+    engine, _, rest = spec.partition(':')
+    model, _, compute_type = rest.partition(':')
+    if engine not in ('whisper', 'faster-whisper', 'vosk'):
+        raise CommandError(f'Неизвестный движок: {engine}')
+    if engine == 'faster-whisper':
+        model, compute_type = model or 'base', compute_type or 'int8'
+    elif engine == 'whisper':
+        model, compute_type = model or 'base', ''
+    key = ':'.join(part for part in (engine, model, compute_type) if part)
+    return {'engine': engine, 'model': model, 'compute_type': compute_type, 'key': key}
+
+
+def create_service(spec: dict):
+    """Service and model loader of the spec (движки импортируются только при использовании)"""
+    if spec['engine'] == 'faster-whisper':
+        from recordings.services.faster_whisper_service import FasterWhisperService
+        service = FasterWhisperService(device='cpu', compute_type=spec['compute_type'])
+        return service, lambda: service.load_model(spec['model'])
+    if spec['engine'] == 'whisper':
+        from recordings.services.whisper_service import WhisperService
+        service = WhisperService()
+        return service, lambda: service.load_model(spec['model'])
+    from recordings.services.vosk_service import VoskService
+    service = VoskService(model_id=spec['model']) if spec['model'] else VoskService()
+    return service, service.load_model
+
+
+class Command(BaseCommand):
+    help = 'Замеряет real-time factor, загрузку моделей и память движков распознавания, сравнивает с базовым отчетом'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='Аудио файлы корпуса')
+        parser.add_argument('--corpus', help='Каталог с аудио файлами корпуса')
+        parser.add_argument('--synthetic', help='Сгенерировать речеподобные сигналы заданной длины, сек через запятую (30,300)')
+        parser.add_argument(
+            '--engine', action='append', default=[],
+            help='движок[:модель[:compute_type]], можно несколько (по умолчанию установленные из '
+                 + ', '.join(DEFAULT_ENGINES) + ')',
+        )
+        parser.add_argument('--language', default='ru', help='Язык распознавания (по умолчанию ru)')
+        parser.add_argument('--repeat', type=int, default=1, help='Прогонов каждого файла, берется лучший')
+        parser.add_argument('--output', help='Сохранить отчет JSON в файл (базовый отчет для следующих запусков)')
+        parser.add_argument('--baseline', help='Отчет JSON прошлого запуска для сравнения')
+        parser.add_argument('--tolerance', type=float, default=0.15, help='Допустимое ухудшение относительно базового, доля (0.15)')
+        parser.add_argument('--json', action='store_true', help='Вывести отчет в JSON')
+
+    def _load_corpus(self, options, temp_dir: Path) -> list:
+        """Corpus entries {'file', 'audio', 'duration_seconds', 'decode_seconds'}"""
+        paths = [Path(path) for path in options['paths']]
+        if options['corpus']:
+            corpus_dir = Path(options['corpus'])
+            if not corpus_dir.is_dir():
+                raise CommandError(f'Каталог не найден: {corpus_dir}')
+            extensions = {'.wav', '.mp3', '.m4a', '.flac', '.ogg', '.opus', '.webm'}
+            paths += sorted(path for path in corpus_dir.iterdir() if path.suffix.lower() in extensions)
+        missing = [str(path) for path in paths if not path.exists()]
+        if missing:
+            raise CommandError(f"Файлы не найдены: {', '.join(missing)}")
+
+        corpus = []
+        for path in paths:
+            # Декодирование - отдельная стадия: движки получают готовый PCM, как из кеша в задаче
+            target = temp_dir / f'{len(corpus)}{pcm_cache.SUFFIX}'
+            started = time.perf_counter()
+            pcm_cache.decode(path, target)
+            decode_seconds = time.perf_counter() - started
+            audio = pcm_cache.open_pcm(target)
+            corpus.append({
+                'file': str(path),
+                'audio': audio,
+                'duration_seconds': len(audio) / pcm_cache.SAMPLE_RATE,
+                'decode_seconds': decode_seconds,
+            })
+
+        if options['synthetic']:
+            try:
+                durations = [float(value) for value in options['synthetic'].split(',') if value.strip()]
+            except ValueError:
+                raise CommandError('--synthetic: длительности в секундах через запятую')
+            for index, duration in enumerate(durations):
+                audio = speech_like_signal(duration, seed=index)
+                corpus.append({
+                    'file': f'synthetic-{duration:g}s',
+                    'audio': audio,
+                    'duration_seconds': len(audio) / pcm_cache.SAMPLE_RATE,
+                    'decode_seconds': 0.0,
+                })
+
+        if not corpus:
+            raise CommandError('Укажите аудио файлы, --corpus или --synthetic')
+        return corpus
+
+    def _benchmark_engine(self, spec: dict, corpus: list, language: str, repeat: int) -> dict:
+        result = {**spec, 'error': None, 'installed': True}
+        registry = get_model_registry()
+        try:
+            service, load = create_service(spec)
+            registry.clear()
+            reset_peak_rss()
+            rss_before = get_rss_bytes()
+
+            # Холодная загрузка: первая в процессе (файлы модели могли быть в кеше ОС),
+            # теплая - повторная после вытеснения из реестра
+            started = time.perf_counter()
+            load()
+            result['load_cold_seconds'] = round(time.perf_counter() - started, 3)
+            result['model_rss_mb'] = round((get_rss_bytes() - rss_before) / MB, 1)
+            registry.clear()
+            started = time.perf_counter()
+            load()
+            result['load_warm_seconds'] = round(time.perf_counter() - started, 3)
+
+            files = []
+            for entry in corpus:
+                timings = []
+                for _ in range(max(1, repeat)):
+                    started = time.perf_counter()
+                    transcript = service.transcribe_file(
+                        Path(entry['file']), model_size=spec['model'] or 'base', language=language, audio=entry['audio'],
+                    )
+                    timings.append(time.perf_counter() - started)
+                best = min(timings)
+                files.append({
+                    'file': entry['file'],
+                    'duration_seconds': round(entry['duration_seconds'], 2),
+                    'transcribe_seconds': round(best, 3),
+                    'rtf': round(best / entry['duration_seconds'], 4) if entry['duration_seconds'] else None,
+                    'segments': len(transcript.get('segments') or []),
+                })
+
+            audio_seconds = sum(entry['duration_seconds'] for entry in corpus)
+            transcribe_seconds = sum(item['transcribe_seconds'] for item in files)
+            result.update({
+                'audio_seconds': round(audio_seconds, 2),
+                'transcribe_seconds': round(transcribe_seconds, 3),
+                'rtf': round(transcribe_seconds / audio_seconds, 4) if audio_seconds else None,
+                'peak_rss_mb': round(get_peak_rss_bytes() / MB, 1),
+                'files': files,
+            })
+        except ImportError as e:
+            result.update(error=str(e), installed=False)
+        except Exception as e:
+            result['error'] = str(e)
+        finally:
+            registry.clear()
+        return result
+
+    def _compare(self, report: dict, baseline_path: str, tolerance: float) -> list:
+        """Regressions against baseline: метрики, выросшие больше чем на tolerance"""
+        try:
+            baseline = json.loads(Path(baseline_path).read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Не удалось прочитать базовый отчет {baseline_path}: {e}')
+        previous = {result['key']: result for result in baseline.get('results', [])}
+
+        regressions = []
+        for result in report['results']:
+            old = previous.get(result['key'])
+            if old is None or result['error'] or old.get('error'):
+                continue
+            for metric in ('rtf', 'load_warm_seconds', 'peak_rss_mb'):
+                before, after = old.get(metric), result.get(metric)
+                if before and after is not None and after > before * (1 + tolerance):
+                    regressions.append({
+                        'key': result['key'],
+                        'metric': metric,
+                        'baseline': before,
+                        'current': after,
+                        'change': round(after / before - 1, 3),
+                    })
+        return regressions
+
+    def handle(self, *args, **options):
+        specs = [parse_engine(spec) for spec in options['engine'] or DEFAULT_ENGINES]
+        explicit = bool(options['engine'])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            corpus = self._load_corpus(options, Path(tmp))
+            results = []
+            for spec in specs:
+                if not options['json']:
+                    self.stdout.write(f"{spec['key']}...")
+                result = self._benchmark_engine(spec, corpus, options['language'], options['repeat'])
+                if not result['installed'] and not explicit:
+                    # Движок по умолчанию не установлен - не ошибка
+                    continue
+                results.append(result)
+
+        report = {
+            'host': {
+                'platform': platform.platform(),
+                'python': platform.python_version(),
+                'cpu_count': os.cpu_count(),
+                'cpu_quota': get_cpu_quota(),
+            },
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'corpus': [
+                {key: (round(value, 3) if isinstance(value, float) else value) for key, value in entry.items() if key != 'audio'}
+                for entry in corpus
+            ],
+            'results': results,
+        }
+        if options['baseline']:
+            report['regressions'] = self._compare(report, options['baseline'], options['tolerance'])
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+        else:
+            self._print_report(report)
+
+        if report.get('regressions'):
+            raise CommandError(f"Ухудшение относительно {options['baseline']}: {len(report['regressions'])} метрик")
+
+    def _print_report(self, report: dict):
+        audio_seconds = sum(entry['duration_seconds'] for entry in report['corpus'])
+        decode_seconds = sum(entry['decode_seconds'] for entry in report['corpus'])
+        self.stdout.write(
+            f"\nКорпус: {len(report['corpus'])} файлов, {audio_seconds:.0f} сек аудио, "
+            f"декодирование {decode_seconds:.2f} сек; CPU {report['host']['cpu_quota']}"
+        )
+        self.stdout.write(f"{'движок':28} {'RTF':>7} {'x реальн.':>9} {'загр. хол.':>10} {'загр. тепл.':>11} {'модель MB':>9} {'пик RSS MB':>10}")
+        for result in report['results']:
+            if result['error']:
+                self.stdout.write(self.style.ERROR(f"{result['key']:28} ошибка: {result['error']}"))
+                continue
+            speed = 1 / result['rtf'] if result['rtf'] else 0
+            self.stdout.write(
+                f"{result['key']:28} {result['rtf']:>7.3f} {speed:>9.1f} {result['load_cold_seconds']:>10.2f} "
+                f"{result['load_warm_seconds']:>11.2f} {result['model_rss_mb']:>9.0f} {result['peak_rss_mb']:>10.0f}"
+            )
+
+        # Значения для оценки стоимости задач планировщиком (ключ "движок:модель")
+        factors = {
+            ':'.join(result['key'].split(':')[:2]): result['rtf']
+            for result in report['results'] if not result['error'] and result['rtf']
+        }
+        if factors:
+            self.stdout.write(f"\nTRANSCRIPTION_REAL_TIME_FACTORS на этом железе: {json.dumps(factors)}")
+            configured = getattr(settings, 'TRANSCRIPTION_REAL_TIME_FACTORS', {})
+            for key, rtf in factors.items():
+                if key in configured:
+                    self.stdout.write(f"  {key}: настроено {configured[key]}, измерено {rtf}")
+
+        for regression in report.get('regressions', []):
+            self.stdout.write(self.style.ERROR(
+                f"  {regression['key']} {regression['metric']}: {regression['baseline']} -> {regression['current']} "
+                f"(+{regression['change'] * 100:.0f}%)"
+            ))
+        if 'regressions' in report and not report['regressions']:
+            self.stdout.write(self.style.SUCCESS('Ухудшений относительно базового отчета нет'))
@@ -0,0 +1,141 @@
+"""
+Management command для симуляции планировщика распознавания (FIFO против SJF со старением)
+Использование: python manage.py benchmark_scheduler --jobs=500 --workers=2 --seed=1
+"""
+import heapq
+import json
+import random
+import statistics
+
+from django.core.management.base import BaseCommand
+
+from recordings.scheduler import compute_score, select_jobs
+
+# Смешанная нагрузка: (доля, диапазон длительности аудио в секундах, real-time factor)
+WORKLOAD = [
+    (0.70, (10, 180), 0.1),       # короткие заметки, vosk/base
+    (0.20, (300, 1800), 0.3),     # совещания, small
+    (0.10, (1800, 5400), 0.8),    # лекции, medium
+]
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+class Command(BaseCommand):
+    help = 'Симулирует очередь распознавания и сравнивает среднее ожидание FIFO и SJF со старением'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=500, help='Количество задач')
+        parser.add_argument('--workers', type=int, default=2, help='Одновременно выполняемых задач')
+        parser.add_argument('--users', type=int, default=20, help='Количество пользователей')
+        parser.add_argument('--load', type=float, default=0.9, help='Загрузка воркеров (0..1)')
+        parser.add_argument('--bulk-share', type=float, default=0.3,
+                            help='Доля задач одного пользователя с массовой загрузкой')
+        parser.add_argument('--aging', type=float, default=5.0, help='Вес стоимости в приоритете SJF')
+        parser.add_argument('--max-per-user', type=int, default=1, help='Лимит одновременных задач на пользователя')
+        parser.add_argument('--estimate-error', type=float, default=0.2,
+                            help='Относительная ошибка оценки стоимости')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def _generate(self, options):
+        rng = random.Random(options['seed'])
+        jobs = []
+        for index in range(options['jobs']):
+            share, (low, high), rtf = rng.choices(WORKLOAD, weights=[w[0] for w in WORKLOAD])[0]
+            service = rng.uniform(low, high) * rtf
+            user = 0 if rng.random() < options['bulk_share'] else rng.randint(1, options['users'])
+            estimate = service * rng.uniform(1 - options['estimate_error'], 1 + options['estimate_error'])
+            jobs.append({'id': index, 'user': user, 'service': service, 'estimate': estimate})
+
+        # Пуассоновский поток с заданной загрузкой воркеров
+        mean_service = statistics.mean(job['service'] for job in jobs)
+        rate = options['load'] * options['workers'] / mean_service
+        clock = 0.0
+        for job in jobs:
+            clock += rng.expovariate(rate)
+            job['arrival'] = clock
+        return jobs
+
+    def _simulate(self, jobs, workers, policy, aging, max_per_user):
+        """Discrete-event simulation, returns wait time of every job"""
+        by_member = {f"{job['id']}:{job['user']}": job for job in jobs}
+        arrivals = sorted(jobs, key=lambda job: job['arrival'])
+        pending = []  # (score, member)
+        running = []  # heap (finish, member)
+        waits = {}
+        clock, next_arrival = 0.0, 0
+
+        while next_arrival < len(arrivals) or pending or running:
+            while next_arrival < len(arrivals) and arrivals[next_arrival]['arrival'] <= clock:
+                job = arrivals[next_arrival]
+                score = job['arrival'] if policy == 'fifo' else compute_score(job['arrival'], job['estimate'], aging)
+                pending.append((score, f"{job['id']}:{job['user']}"))
+                next_arrival += 1
+
+            pending.sort()
+            selected = select_jobs(
+                ((member, score) for score, member in pending),
+                [member.rsplit(':', 1)[1] for _, member in running],
+                workers - len(running),
+                max_per_user if policy != 'fifo' else 0,
+            )
+            for member in selected:
+                job = by_member[member]
+                waits[job['id']] = clock - job['arrival']
+                heapq.heappush(running, (clock + job['service'], member))
+            pending = [item for item in pending if item[1] not in selected]
+
+            candidates = []
+            if next_arrival < len(arrivals):
+                candidates.append(arrivals[next_arrival]['arrival'])
+            if running:
+                candidates.append(running[0][0])
+            if not candidates:
+                break
+            clock = min(candidates)
+            while running and running[0][0] <= clock:
+                heapq.heappop(running)
+
+        return waits
+
+    def _summarize(self, jobs, waits):
+        short = [waits[job['id']] for job in jobs if job['service'] < 60]
+        long = [waits[job['id']] for job in jobs if job['service'] >= 600]
+        others = [waits[job['id']] for job in jobs if job['user'] != 0]
+        return {
+            'mean_wait': round(statistics.mean(waits.values()), 1),
+            'short_p50_wait': round(_percentile(short, 50), 1),
+            'short_p95_wait': round(_percentile(short, 95), 1),
+            'long_max_wait': round(max(long, default=0.0), 1),
+            'other_users_mean_wait': round(statistics.mean(others), 1) if others else 0.0,
+        }
+
+    def handle(self, *args, **options):
+        jobs = self._generate(options)
+        report = {'jobs': len(jobs), 'workers': options['workers'], 'load': options['load']}
+        for policy in ('fifo', 'sjf'):
+            waits = self._simulate(jobs, options['workers'], policy, options['aging'], options['max_per_user'])
+            report[policy] = self._summarize(jobs, waits)
+        fifo_mean, sjf_mean = report['fifo']['mean_wait'], report['sjf']['mean_wait']
+        report['mean_wait_improvement'] = round(fifo_mean / sjf_mean, 2) if sjf_mean else None
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(f"Задач: {len(jobs)}, воркеров: {options['workers']}, загрузка: {options['load']}")
+        for policy in ('fifo', 'sjf'):
+            stats = report[policy]
+            self.stdout.write(
+                f"{policy.upper():5} среднее ожидание {stats['mean_wait']:>9.1f} сек | "
+                f"короткие p50 {stats['short_p50_wait']:>8.1f} p95 {stats['short_p95_wait']:>8.1f} | "
+                f"длинные max {stats['long_max_wait']:>9.1f} | "
+                f"другие пользователи {stats['other_users_mean_wait']:>8.1f}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Среднее ожидание меньше в x{report['mean_wait_improvement']}"))
@@ -0,0 +1,163 @@
+"""
+Management command для сравнения полнотекстового поиска (tsvector + GIN) с поиском icontains
+Использование: python manage.py benchmark_search --count=100000 --repeat=5 --explain
+"""
+import json
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from recordings.models import Recording
+from recordings.search import add_headlines, is_full_text_available, search_recordings
+
+# Словарь синтетических транскрипций: разговорная речь совещаний и заметок
+VOCABULARY = (
+    'проект задача сроки бюджет встреча клиент договор отчет презентация команда '
+    'разработка тестирование релиз сервер база данных пользователь интерфейс ошибка '
+    'исправление требования анализ продажи маркетинг квартал план результат решение '
+    'вопрос предложение обсуждение согласование документ письмо звонок поставщик '
+    'склад доставка оплата счет налог сотрудник отпуск обучение конференция '
+    'нужно можно сделать проверить отправить подготовить обсудить согласовать '
+    'завтра сегодня неделе месяце срочно важно хорошо понятно давайте коллеги'
+).split()
+
+# Редкие слова попадают в RARE_SHARE транскрипций: словарь выше мал, и каждое его слово
+# есть почти в каждой записи - такой запрос планировщик выполняет полным просмотром
+RARE_VOCABULARY = ('аудит', 'лицензия', 'инвентаризация', 'сертификация', 'арбитраж')
+RARE_SHARE = 0.005
+
+# Запросы разной селективности: частое слово, словоформа, фраза, редкое слово
+QUERIES = [
+    'проект', 'отчеты', 'договор поставщик', 'согласовать бюджет',
+    'аудит', 'лицензии', 'инвентаризация склад',
+]
+
+PAGE_SIZE = 12
+SEARCH_INDEX = 'recording_search_vector_idx'
+
+
+def _median_ms(timings):
+    return round(statistics.median(timings) * 1000, 1)
+
+
+class Command(BaseCommand):
+    help = 'Создает синтетические транскрипции и сравнивает время поиска tsvector и icontains'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000, help='Количество синтетических записей')
+        parser.add_argument('--words', type=int, default=300, help='Слов в одной транскрипции')
+        parser.add_argument('--repeat', type=int, default=5, help='Повторов каждого запроса')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--keep', action='store_true', help='Не удалять синтетические записи после замера')
+        parser.add_argument('--explain', action='store_true', help='Показать план запроса tsvector (EXPLAIN ANALYZE)')
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def _populate(self, user, options):
+        rng = random.Random(options['seed'])
+        created = 0
+        started = time.perf_counter()
+        while created < options['count']:
+            size = min(options['batch_size'], options['count'] - created)
+            Recording.objects.bulk_create([
+                Recording(
+                    user=user,
+                    title=' '.join(rng.choices(VOCABULARY, k=3)).capitalize(),
+                    audio_file=f'audio/benchmark/{created + index}.wav',
+                    status='completed',
+                    transcription=self._transcription(rng, options['words']),
+                    search_config='russian',
+                )
+                for index in range(size)
+            ])
+            created += size
+            self.stdout.write(f"Создано записей: {created}", ending='\r')
+        self.stdout.write('')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE recordings_recording')
+        return time.perf_counter() - started
+
+    @staticmethod
+    def _transcription(rng, words):
+        text = rng.choices(VOCABULARY, k=words)
+        if rng.random() < RARE_SHARE:
+            text[rng.randrange(words)] = rng.choice(RARE_VOCABULARY)
+        return ' '.join(text)
+
+    def _measure(self, make_queryset, query, repeat, headlines=False):
+        """Time the list view work: count for pagination plus the first page"""
+        timings, found = [], 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            queryset = make_queryset(query)
+            found = queryset.count()
+            page = list(queryset[:PAGE_SIZE])
+            if headlines:
+                add_headlines(page, query)
+            timings.append(time.perf_counter() - started)
+        return {'median_ms': _median_ms(timings), 'found': found}
+
+    def handle(self, *args, **options):
+        if not is_full_text_available():
+            raise CommandError('Полнотекстовый поиск доступен только на PostgreSQL')
+
+        user = User.objects.create_user(username=f'benchmark-search-{uuid.uuid4().hex[:8]}')
+        try:
+            populate_seconds = self._populate(user, options)
+            base = Recording.objects.filter(user=user).without_transcription()
+
+            def fts(query):
+                return search_recordings(base, query).order_by('-search_rank', '-created_at')
+
+            def icontains(query):
+                return base.filter(Q(title__icontains=query) | Q(transcription__icontains=query)).order_by('-created_at')
+
+            report = {
+                'count': options['count'],
+                'words': options['words'],
+                'populate_seconds': round(populate_seconds, 1),
+                'queries': {},
+            }
+            for query in QUERIES:
+                report['queries'][query] = {
+                    'fts': self._measure(fts, query, options['repeat']),
+                    'fts_with_headlines': self._measure(fts, query, options['repeat'], headlines=True),
+                    'icontains': self._measure(icontains, query, options['repeat']),
+                }
+                if options['explain']:
+                    plan = fts(query).explain(analyze=True)
+                    report['queries'][query]['fts']['plan'] = plan
+                    report['queries'][query]['fts']['uses_index'] = SEARCH_INDEX in plan
+        finally:
+            if options['keep']:
+                self.stdout.write(f"Синтетические записи оставлены у пользователя {user.username}")
+            else:
+                user.delete()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(
+            f"Записей: {report['count']} по {report['words']} слов, "
+            f"вставка с построением векторов {report['populate_seconds']} сек"
+        )
+        for query, result in report['queries'].items():
+            fts, icontains = result['fts'], result['icontains']
+            speedup = icontains['median_ms'] / fts['median_ms'] if fts['median_ms'] else 0
+            self.stdout.write(
+                f"{query:22} tsvector {fts['median_ms']:>8.1f} мс ({fts['found']:>6}) | "
+                f"с фрагментами {result['fts_with_headlines']['median_ms']:>8.1f} мс | "
+                f"icontains {icontains['median_ms']:>8.1f} мс ({icontains['found']:>6}) | x{speedup:.1f}"
+            )
+            if 'plan' in fts:
+                style = self.style.SUCCESS if fts['uses_index'] else self.style.WARNING
+                self.stdout.write(style(f"  индекс {SEARCH_INDEX}: {'да' if fts['uses_index'] else 'нет'}"))
+                for line in fts['plan'].splitlines():
+                    self.stdout.write(f"    {line}")
@@ -73,25 +73,27 @@ class Command(BaseCommand):
         for recording in old_recordings:
             try:
                 # Удалить файл если он существует
+                parent_dir = None
                 if recording.audio_file:
                     file_path = recording.audio_file.path
+                    parent_dir = os.path.dirname(file_path)
                     if os.path.exists(file_path):
                         file_size = os.path.getsize(file_path)
                         os.remove(file_path)
                         deleted_size += file_size
-                        
-                        # Попытаться удалить родительскую директорию если она пуста
-                        try:
-                            parent_dir = os.path.dirname(file_path)
-                            if os.path.exists(parent_dir) and not os.listdir(parent_dir):
-                                os.rmdir(parent_dir)
-                        except OSError:
-                            pass  # Директория не пуста или ошибка - не критично
                 
-                # Удалить запись из БД
+                # Удалить запись из БД (вместе с файлом пиков волны)
                 recording.delete()
                 deleted_count += 1
                 
+                # Попытаться удалить родительскую директорию если она пуста
+                if parent_dir:
+                    try:
+                        if os.path.exists(parent_dir) and not os.listdir(parent_dir):
+                            os.rmdir(parent_dir)
+                    except OSError:
+                        pass  # Директория не пуста или ошибка - не критично
+                
                 if deleted_count % 100 == 0:
                     self.stdout.write(f'Удалено {deleted_count} записей...')
                     
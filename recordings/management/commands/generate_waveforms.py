@@ -0,0 +1,45 @@
+"""
+Management command для построения пиков волны у записей, загруженных до их появления
+Использование: python manage.py generate_waveforms --limit=100
+"""
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from recordings.models import Recording
+from recordings.services import pcm_cache, waveform
+
+
+class Command(BaseCommand):
+    help = 'Строит файлы пиков волны для записей без них (или для всех с --all)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=0, help='Не больше N записей (0 - без ограничения)')
+        parser.add_argument('--all', action='store_true', help='Перестроить волну и у записей, где она уже есть')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        built = skipped = failed = 0
+        recordings = Recording.objects.exclude(audio_file='').exclude(status='ingesting').only('pk', 'audio_file', 'audio_sha256')
+        for recording in recordings.order_by('pk').iterator():
+            if options['limit'] and built + failed >= options['limit']:
+                break
+            audio_path = Path(recording.audio_file.path)
+            if not audio_path.exists() or (not options['all'] and waveform.get_path(audio_path).exists()):
+                skipped += 1
+                continue
+            # Через кеш PCM: так читаются и WebM/Opus, а распознавание потом не декодирует файл заново
+            if waveform.generate(audio_path, pcm_cache.get_pcm(audio_path, recording.audio_sha256)):
+                built += 1
+            else:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'  - {recording.pk}: не удалось прочитать аудио'))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Построено {built} волн за {time.perf_counter() - started:.1f} сек, пропущено {skipped}'
+            )
+        )
+        if failed:
+            self.stdout.write(self.style.WARNING(f'Не удалось построить {failed} волн'))
@@ -0,0 +1,91 @@
+"""
+Management command для отчета о времени стадий распознавания по движкам и моделям
+Использование: python manage.py transcription_report --days=7 --engine=faster-whisper --json
+"""
+import json
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recordings.models import TranscriptionRun
+
+MB = 1024 * 1024
+PERCENTILES = (50, 90, 99)
+# Поле запуска -> колонка отчета
+METRICS = [
+    ('queue_wait', 'очередь'),
+    ('convert_seconds', 'ffmpeg'),
+    ('model_load_seconds', 'модель'),
+    ('decode_seconds', 'распозн.'),
+    ('persist_seconds', 'сохран.'),
+    ('real_time_factor', 'RTF'),
+    ('peak_rss_mb', 'RSS MB'),
+]
+
+
+def percentiles(values) -> dict:
+    values = [value for value in values if value is not None]
+    if not values:
+        return {}
+    return {f'p{p}': round(float(np.percentile(values, p)), 3) for p in PERCENTILES}
+
+
+class Command(BaseCommand):
+    help = 'Перцентили очереди, стадий, RTF и памяти запусков распознавания по движкам и моделям'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Запуски за последние N дней (по умолчанию 7)')
+        parser.add_argument('--engine', help='Только этот движок (faster-whisper, whisper, vosk)')
+        parser.add_argument('--all-statuses', action='store_true', help='Учитывать и неудачные попытки, не только завершенные')
+        parser.add_argument('--json', action='store_true', help='Вывести отчет в JSON')
+
+    def handle(self, *args, **options):
+        runs = TranscriptionRun.objects.filter(started_at__gte=timezone.now() - timedelta(days=options['days']))
+        if options['engine']:
+            runs = runs.filter(recognition_service=options['engine'])
+        if not options['all_statuses']:
+            runs = runs.filter(status='completed')
+
+        groups = defaultdict(lambda: defaultdict(list))
+        statuses = defaultdict(lambda: defaultdict(int))
+        fields = (
+            'recognition_service', 'model_name', 'status', 'enqueued_at', 'started_at', 'convert_seconds',
+            'model_load_seconds', 'decode_seconds', 'persist_seconds', 'real_time_factor', 'peak_rss_bytes',
+        )
+        for run in runs.values(*fields).iterator():
+            key = ':'.join(part for part in (run['recognition_service'], run['model_name']) if part)
+            statuses[key][run['status']] += 1
+            values = groups[key]
+            if run['enqueued_at']:
+                values['queue_wait'].append(max(0.0, (run['started_at'] - run['enqueued_at']).total_seconds()))
+            for field in ('convert_seconds', 'model_load_seconds', 'decode_seconds', 'persist_seconds', 'real_time_factor'):
+                values[field].append(run[field])
+            values['peak_rss_mb'].append(run['peak_rss_bytes'] / MB if run['peak_rss_bytes'] else None)
+
+        report = {
+            key: {
+                'runs': dict(statuses[key]),
+                **{field: percentiles(values[field]) for field, _ in METRICS},
+            }
+            for key, values in sorted(groups.items())
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+        if not report:
+            self.stdout.write(self.style.WARNING(f"Нет запусков распознавания за {options['days']} дней"))
+            return
+
+        self.stdout.write(f"Запуски за {options['days']} дней, p50 / p90 / p99 (секунды, RTF, MB):")
+        for key, row in report.items():
+            total = sum(row['runs'].values())
+            details = ', '.join(f'{status}: {count}' for status, count in sorted(row['runs'].items()))
+            self.stdout.write(self.style.SUCCESS(f"\n{key} - {total} запусков ({details})"))
+            for field, title in METRICS:
+                values = row[field]
+                if values:
+                    self.stdout.write(f"  {title:10} " + ' / '.join(f"{values[f'p{p}']:>8.3f}" for p in PERCENTILES))
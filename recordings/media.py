@@ -0,0 +1,134 @@
+"""
+Authenticated delivery of recording audio and waveform files
+
+Django только проверяет владельца записи. За nginx (MEDIA_ACCEL_REDIRECT_PREFIX
+задан) ответ содержит X-Accel-Redirect на internal location, и файл отдает
+nginx через sendfile, с поддержкой Range - перемотка в плеере не скачивает файл
+заново, а поток gunicorn освобождается сразу. Без nginx (runserver) файл
+отдается из Python, тоже с поддержкой одного диапазона Range.
+"""
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+from .services import waveform
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+def get_accel_prefix() -> str:
+    """Internal nginx location of MEDIA_ROOT, '' - отдавать файлы из Django"""
+    return getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '')
+
+
+def _parse_range(header: str, size: int):
+    """
+    Single byte range of Range header as (start, end) включительно
+
+    Returns:
+        None - заголовка нет или он не поддерживается (отдать весь файл),
+        False - диапазон вне файла (416).
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or not (match[1] or match[2]):
+        return None
+    if match[1]:
+        start = int(match[1])
+        end = min(int(match[2]), size - 1) if match[2] else size - 1
+    else:
+        # bytes=-N - последние N байт
+        start = max(0, size - int(match[2]))
+        end = size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def _iter_range(path: Path, start: int, length: int):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(STREAM_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def _file_response(request, path: Path, as_attachment: bool, filename: str):
+    size = path.stat().st_size
+    byte_range = _parse_range(request.headers.get('Range', ''), size) if size else None
+    if byte_range is False:
+        return HttpResponse(status=416, headers={'Content-Range': f'bytes */{size}'})
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), as_attachment=as_attachment, filename=filename)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _iter_range(path, start, end - start + 1),
+            status=206,
+            content_type=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+        )
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _accel_response(name: str, as_attachment: bool, filename: str):
+    response = HttpResponse()
+    response['X-Accel-Redirect'] = get_accel_prefix().rstrip('/') + '/' + quote(name)
+    # Тип определяет nginx по расширению (mime.types), тело и длину - тоже он
+    del response['Content-Type']
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    return response
+
+
+def serve_media_file(request, name: str, filename: str, as_attachment: bool = False):
+    """Response with file name (относительно MEDIA_ROOT) через nginx или из Django"""
+    path = Path(settings.MEDIA_ROOT) / name
+    if not os.path.exists(path):
+        raise Http404("Файл не найден")
+    if get_accel_prefix():
+        return _accel_response(name, as_attachment, filename)
+    return _file_response(request, path, as_attachment, filename)
+
+
+def serve_recording_audio(request, recording, as_attachment: bool = False):
+    """Response with audio file of recording (владелец уже проверен вызывающим)"""
+    if not recording.audio_file:
+        raise Http404("Файл не найден")
+    response = serve_media_file(request, recording.audio_file.name, recording.get_file_name(), as_attachment)
+    # Файл записи не меняется, но доступен только владельцу - без общих кешей
+    response['Cache-Control'] = f"private, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 86400)}"
+    return response
+
+
+def get_waveform_version(recording) -> Optional[str]:
+    """Version of the waveform file for its URL, None - волны нет"""
+    if not recording.audio_file:
+        return None
+    try:
+        return str(waveform.get_path(Path(recording.audio_file.path)).stat().st_mtime_ns)
+    except OSError:
+        return None
+
+
+def serve_recording_waveform(request, recording):
+    """Response with waveform peaks of recording (владелец уже проверен вызывающим)"""
+    if not recording.audio_file:
+        raise Http404("Волна не построена")
+    name = f'{recording.audio_file.name}{waveform.SUFFIX}'
+    response = serve_media_file(request, name, Path(name).name)
+    # Версия файла в URL (?v=), поэтому ответ кешируется надолго
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
@@ -0,0 +1,221 @@
+"""
+Prometheus metrics of the transcription pipeline
+
+Web-процесс отдает метрики на /metrics, воркеры Celery - на отдельном порту
+METRICS_WORKER_PORT (экспортер в главном процессе воркера). Gunicorn и prefork
+Celery запускают несколько процессов, поэтому при заданной переменной окружения
+PROMETHEUS_MULTIPROC_DIR каждый процесс пишет значения в свой файл в этом
+каталоге, а экспортер суммирует их при запросе. Без переменной (runserver,
+celery --pool=solo) используется обычный реестр процесса.
+
+Если prometheus_client не установлен, метрики - пустые заглушки и ничего не стоят.
+"""
+import logging
+import os
+import time
+from functools import wraps
+
+from django.conf import settings
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+        generate_latest, multiprocess, start_http_server,
+    )
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    Counter = Gauge = Histogram = None
+    CONTENT_TYPE_LATEST = 'text/plain; version=0.0.4; charset=utf-8'
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = 'voice_recorder'
+# Длительности от долей секунды до часов: и короткие стадии, и распознавание многочасовых записей
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+API_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+RTF_BUCKETS = (0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 3)
+MB = 1024 * 1024
+UPLOAD_BYTES_BUCKETS = tuple(size * MB for size in (0.1, 0.5, 1, 5, 10, 25, 50, 100, 250, 500, 1024, 2048))
+AUDIO_DURATION_BUCKETS = (5, 15, 30, 60, 300, 600, 1800, 3600, 7200, 14400)
+
+
+class _NoopMetric:
+    """Metric stub used when prometheus_client is not installed"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, amount):
+        pass
+
+    def set(self, value):
+        pass
+
+
+def _metric(metric_class, name, documentation, labelnames=(), **kwargs):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return metric_class(name, documentation, labelnames, namespace=NAMESPACE, **kwargs)
+
+
+# Задача распознавания
+TRANSCRIPTION_TASKS = _metric(
+    Counter, 'transcription_tasks_total',
+    'Transcription task runs by outcome (completed, cached, retry, failed)', ('engine', 'model', 'outcome'),
+)
+TRANSCRIPTION_FAILURES = _metric(
+    Counter, 'transcription_failures_total',
+    'Transcription errors by exception type', ('engine', 'reason'),
+)
+TRANSCRIPTION_STAGE_SECONDS = _metric(
+    Histogram, 'transcription_stage_seconds',
+    'Duration of transcription task stages (convert, model_load, decode, persist)', ('stage', 'engine'),
+    buckets=SECONDS_BUCKETS,
+)
+TRANSCRIPTION_QUEUE_WAIT_SECONDS = _metric(
+    Histogram, 'transcription_queue_wait_seconds',
+    'Time between sending a transcription task to the broker and its start', ('queue',),
+    buckets=SECONDS_BUCKETS,
+)
+TRANSCRIPTION_AUDIO_SECONDS = _metric(
+    Counter, 'transcription_audio_seconds_total',
+    'Seconds of audio transcribed', ('engine', 'model'),
+)
+TRANSCRIPTION_REAL_TIME_FACTOR = _metric(
+    Histogram, 'transcription_real_time_factor',
+    'Transcription time divided by audio duration', ('engine', 'model'),
+    buckets=RTF_BUCKETS,
+)
+CACHE_REQUESTS = _metric(
+    Counter, 'cache_requests_total',
+    'Lookups in the transcription result cache and the PCM cache', ('cache', 'result'),
+)
+
+# Загрузка и проверка файлов
+UPLOAD_SIZE_BYTES = _metric(
+    Histogram, 'upload_size_bytes',
+    'Size of uploaded audio files', buckets=UPLOAD_BYTES_BUCKETS,
+)
+UPLOAD_DURATION_SECONDS = _metric(
+    Histogram, 'upload_audio_duration_seconds',
+    'Audio duration of uploaded recordings', buckets=AUDIO_DURATION_BUCKETS,
+)
+INGEST_SECONDS = _metric(
+    Histogram, 'ingest_seconds',
+    'Duration of uploaded file validation, probing and decoding', ('outcome',), buckets=SECONDS_BUCKETS,
+)
+
+# API
+API_REQUEST_SECONDS = _metric(
+    Histogram, 'api_request_seconds',
+    'Latency of polled API views', ('view',), buckets=API_BUCKETS,
+)
+
+# Реестр моделей
+MODEL_REGISTRY_EVENTS = _metric(
+    Counter, 'model_registry_events_total',
+    'Model registry hits, loads, load errors and evictions', ('engine', 'event'),
+)
+MODEL_LOAD_SECONDS = _metric(
+    Histogram, 'model_load_seconds',
+    'Model load time', ('engine',), buckets=(0.1, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300),
+)
+MODEL_RESIDENT_BYTES = _metric(
+    Gauge, 'model_registry_resident_bytes',
+    'Estimated memory of loaded models', multiprocess_mode='livesum',
+)
+
+
+def is_enabled() -> bool:
+    return PROMETHEUS_AVAILABLE and getattr(settings, 'METRICS_ENABLED', True)
+
+
+def observe_transcription(engine: str, model: str, audio_seconds: float, seconds: float):
+    """Count transcribed audio and its real-time factor"""
+    if not audio_seconds or audio_seconds <= 0:
+        return
+    TRANSCRIPTION_AUDIO_SECONDS.labels(engine=engine, model=model).inc(audio_seconds)
+    TRANSCRIPTION_REAL_TIME_FACTOR.labels(engine=engine, model=model).observe(seconds / audio_seconds)
+
+
+def timed_api(view_name: str):
+    """Decorator observing latency of an API view"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                API_REQUEST_SECONDS.labels(view=view_name).observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def stamp_publish_time(headers=None, **kwargs):
+    """before_task_publish handler: время отправки задачи для ожидания в очереди
+
+    Планировщик передает в заголовке время постановки в свою очередь - оно сохраняется.
+    """
+    if headers is not None and 'published_at' not in headers:
+        headers['published_at'] = time.time()
+
+
+def get_published_at(request):
+    """Unix time the task was queued (планировщик или брокер), None если неизвестно"""
+    published_at = request.get('published_at') or (request.headers or {}).get('published_at')
+    return float(published_at) if published_at else None
+
+
+def get_queue_wait(request):
+    """Seconds the task waited in the queue, None если время постановки неизвестно"""
+    published_at = get_published_at(request)
+    if published_at is None or request.retries:
+        # Повтор ждет countdown - это не очередь
+        return None
+    return max(0.0, time.time() - published_at)
+
+
+def _multiprocess_dir():
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir')
+
+
+def get_registry():
+    """Registry to expose: сумма по файлам процессов в multiprocess режиме"""
+    if _multiprocess_dir():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render() -> bytes:
+    """Metrics in Prometheus text exposition format"""
+    if not PROMETHEUS_AVAILABLE:
+        return b''
+    return generate_latest(get_registry())
+
+
+def start_worker_exporter():
+    """Start HTTP exporter in the Celery main process (worker_ready), если задан METRICS_WORKER_PORT"""
+    port = getattr(settings, 'METRICS_WORKER_PORT', 0)
+    if not port or not is_enabled():
+        return
+    if not _multiprocess_dir():
+        # Дочерние процессы prefork пишут в свои реестры - главный процесс их не видит
+        logger.warning("PROMETHEUS_MULTIPROC_DIR не задан, метрики дочерних процессов воркера недоступны")
+    try:
+        start_http_server(port, registry=get_registry())
+        logger.info(f"Метрики воркера доступны на порту {port}")
+    except OSError as e:
+        logger.warning(f"Не удалось запустить экспортер метрик на порту {port}: {e}")
+
+
+def mark_process_dead(pid=None, **kwargs):
+    """worker_process_shutdown handler: удалить live-значения завершенного дочернего процесса"""
+    if PROMETHEUS_AVAILABLE and _multiprocess_dir():
+        multiprocess.mark_process_dead(pid or os.getpid())
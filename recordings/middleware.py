@@ -1,5 +1,6 @@
 """Middleware for recordings app"""
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from .models import UserSettings
 
 
@@ -11,7 +12,11 @@ class CreateUserSettingsMiddleware:
     
     def __call__(self, request):
         if request.user.is_authenticated:
-            UserSettings.objects.get_or_create(user=request.user)
+            # Проверяем наличие настроек один раз, а не запросом на каждый запрос
+            key = f'user-settings-ensured:{request.user.pk}'
+            if not cache.get(key):
+                UserSettings.objects.get_or_create(user=request.user)
+                cache.set(key, True, 24 * 3600)
         
         response = self.get_response(request)
         return response
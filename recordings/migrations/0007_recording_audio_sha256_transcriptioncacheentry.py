@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordings', '0006_usersettings_default_vosk_model'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptionCacheEntry',
+            fields=[
+                ('key', models.CharField(help_text='SHA-256 от хеша аудио и параметров распознавания', max_length=64, primary_key=True, serialize=False)),
+                ('audio_sha256', models.CharField(db_index=True, max_length=64)),
+                ('recognition_service', models.CharField(max_length=20)),
+                ('model_name', models.CharField(blank=True, default='', max_length=50)),
+                ('language', models.CharField(blank=True, default='', max_length=10)),
+                ('text', models.TextField(blank=True, default='')),
+                ('segments', models.JSONField(blank=True, null=True)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Кеш распознавания',
+                'verbose_name_plural': 'Кеш распознавания',
+            },
+        ),
+        migrations.AddField(
+            model_name='recording',
+            name='audio_sha256',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 содержимого аудио файла (ключ кеша распознавания)', max_length=64, null=True),
+        ),
+    ]
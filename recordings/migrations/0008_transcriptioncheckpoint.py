@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordings', '0007_recording_audio_sha256_transcriptioncacheentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptionCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('signature', models.CharField(help_text='Хеш движка, модели и языка - чекпоинт другой модели не используется', max_length=64)),
+                ('processed_seconds', models.FloatField(default=0, help_text='Аудио до этой отметки уже распознано')),
+                ('segments', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('recording', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoint', to='recordings.recording')),
+            ],
+            options={
+                'verbose_name': 'Чекпоинт распознавания',
+                'verbose_name_plural': 'Чекпоинты распознавания',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordings', '0008_transcriptioncheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.FloatField(help_text='Начало в секундах')),
+                ('end', models.FloatField(help_text='Конец в секундах')),
+                ('text', models.TextField()),
+                ('words', models.JSONField(blank=True, help_text='Временные метки слов: [[start, end, "слово"], ...]', null=True)),
+                ('recording', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='recordings.recording')),
+            ],
+            options={
+                'verbose_name': 'Сегмент транскрипции',
+                'verbose_name_plural': 'Сегменты транскрипции',
+                'ordering': ['start'],
+                'indexes': [models.Index(fields=['recording', 'start'], name='segment_recording_start_idx')],
+            },
+        ),
+    ]
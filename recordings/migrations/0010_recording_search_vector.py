@@ -0,0 +1,102 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:10
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Вектор пересчитывается самой БД при любом изменении title, transcription или
+# search_config, поэтому не зависит от того, каким путем сохранена запись
+CREATE_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION recordings_recording_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector(NEW.search_config::regconfig, coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector(NEW.search_config::regconfig, coalesce(NEW.transcription, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER recordings_recording_search_vector_insert
+    BEFORE INSERT ON recordings_recording
+    FOR EACH ROW EXECUTE FUNCTION recordings_recording_search_vector_update();
+
+CREATE TRIGGER recordings_recording_search_vector_update
+    BEFORE UPDATE ON recordings_recording
+    FOR EACH ROW
+    WHEN (OLD.title IS DISTINCT FROM NEW.title
+          OR OLD.transcription IS DISTINCT FROM NEW.transcription
+          OR OLD.search_config IS DISTINCT FROM NEW.search_config)
+    EXECUTE FUNCTION recordings_recording_search_vector_update();
+"""
+
+DROP_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS recordings_recording_search_vector_update ON recordings_recording;
+DROP TRIGGER IF EXISTS recordings_recording_search_vector_insert ON recordings_recording;
+DROP FUNCTION IF EXISTS recordings_recording_search_vector_update();
+"""
+
+
+def create_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(CREATE_TRIGGER_SQL)
+
+    # Существующие записи: конфигурация по языку пользователя и вектор одним UPDATE
+    configs = getattr(settings, 'TRANSCRIPTION_SEARCH_CONFIGS', {'ru': 'russian'})
+    when_sql = ' '.join('WHEN %s THEN %s' for _ in configs) or 'WHEN NULL THEN NULL'
+    params = [value for item in configs.items() for value in item]
+    schema_editor.execute(
+        f"""
+        UPDATE recordings_recording AS r
+        SET search_config = COALESCE(
+            (SELECT CASE s.language {when_sql} END
+             FROM recordings_usersettings AS s WHERE s.user_id = r.user_id),
+            'simple'
+        )
+        """,
+        params,
+    )
+    # Строки со сменившейся конфигурацией уже пересчитал триггер, остальные - здесь
+    schema_editor.execute(
+        """
+        UPDATE recordings_recording
+        SET search_vector =
+            setweight(to_tsvector(search_config::regconfig, coalesce(title, '')), 'A') ||
+            setweight(to_tsvector(search_config::regconfig, coalesce(transcription, '')), 'B')
+        WHERE search_vector IS NULL
+        """
+    )
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP_TRIGGER_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordings', '0009_transcriptsegment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recording',
+            name='search_config',
+            field=models.CharField(default='simple', help_text='Конфигурация полнотекстового поиска PostgreSQL (russian, simple)', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='recording',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recording',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recording_search_vector_idx'),
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+    ]
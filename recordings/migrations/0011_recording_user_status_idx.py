@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordings', '0010_recording_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recording',
+            index=models.Index(fields=['user', 'status', 'created_at'], name='recording_user_status_idx'),
+        ),
+    ]
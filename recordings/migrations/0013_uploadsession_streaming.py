@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordings', '0012_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='prefix_seconds',
+            field=models.FloatField(default=0, help_text='Начало файла до этой отметки уже распознано'),
+        ),
+        migrations.AddField(
+            model_name='uploadsession',
+            name='prefix_segments',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='uploadsession',
+            name='prefix_signature',
+            field=models.CharField(blank=True, default='', help_text='Хеш движка, модели и языка распознанного начала', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='length',
+            field=models.BigIntegerField(blank=True, help_text='Полный размер файла в байтах (Upload-Length), пусто - запись еще идет', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordings', '0013_uploadsession_streaming'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recording',
+            name='status',
+            field=models.CharField(choices=[('ingesting', 'Проверка файла'), ('uploaded', 'Загружено'), ('processing', 'Обработка'), ('completed', 'Завершено'), ('failed', 'Ошибка')], default='uploaded', max_length=20),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recordings', '0014_recording_ingesting_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptionRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.CharField(blank=True, default='', max_length=255)),
+                ('attempt', models.PositiveSmallIntegerField(default=1)),
+                ('status', models.CharField(choices=[('running', 'Выполняется'), ('completed', 'Завершено'), ('cached', 'Из кеша'), ('retry', 'Повтор'), ('failed', 'Ошибка')], default='running', max_length=20)),
+                ('recognition_service', models.CharField(max_length=20)),
+                ('model_name', models.CharField(blank=True, default='', max_length=50)),
+                ('batch_size', models.PositiveSmallIntegerField(default=1, help_text='Записей, распознанных в этой попытке')),
+                ('enqueued_at', models.DateTimeField(blank=True, help_text='Постановка в очередь (планировщика или брокера)', null=True)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('convert_seconds', models.FloatField(blank=True, null=True)),
+                ('model_load_seconds', models.FloatField(blank=True, null=True)),
+                ('decode_seconds', models.FloatField(blank=True, null=True)),
+                ('persist_seconds', models.FloatField(blank=True, null=True)),
+                ('audio_duration', models.FloatField(blank=True, help_text='Секунд аудио, распознанных в попытке', null=True)),
+                ('real_time_factor', models.FloatField(blank=True, help_text='decode / audio_duration', null=True)),
+                ('hostname', models.CharField(blank=True, default='', max_length=255)),
+                ('pid', models.PositiveIntegerField(blank=True, null=True)),
+                ('peak_rss_bytes', models.BigIntegerField(blank=True, null=True)),
+                ('error_message', models.TextField(blank=True, default='')),
+                ('recording', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='runs', to='recordings.recording')),
+            ],
+            options={
+                'verbose_name': 'Запуск распознавания',
+                'verbose_name_plural': 'Запуски распознавания',
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['recognition_service', 'model_name', 'started_at'], name='recordings__recogni_0e1673_idx')],
+            },
+        ),
+    ]
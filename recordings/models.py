@@ -1,8 +1,12 @@
 """Models for recordings app"""
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 import os
+import uuid
+from pathlib import Path
 
 
 def audio_upload_path(instance, filename):
@@ -10,6 +14,23 @@ def audio_upload_path(instance, filename):
     return f'audio/{instance.user.id}/{filename}'
 
 
+class RecordingQuerySet(models.QuerySet):
+    def without_transcription(self):
+        """
+        Skip loading the transcript text (для списков и API статуса)
+
+        Полный текст длинной записи может занимать мегабайты; вместо него
+        аннотируется флаг has_transcription. Поисковый вектор тоже не загружаем -
+        он нужен только в SQL.
+        """
+        return self.defer('transcription', 'search_vector').annotate(
+            has_transcription=models.ExpressionWrapper(
+                models.Q(transcription__gt=''),
+                output_field=models.BooleanField(),
+            )
+        )
+
+
 class Recording(models.Model):
     """Audio recording model"""
     WHISPER_MODEL_CHOICES = [
@@ -27,6 +48,7 @@ class Recording(models.Model):
     ]
     
     STATUS_CHOICES = [
+        ('ingesting', 'Проверка файла'),
         ('uploaded', 'Загружено'),
         ('processing', 'Обработка'),
         ('completed', 'Завершено'),
@@ -60,9 +82,30 @@ class Recording(models.Model):
     processed_at = models.DateTimeField(null=True, blank=True)
     duration = models.FloatField(null=True, blank=True, help_text='Длительность в секундах')
     celery_task_id = models.CharField(max_length=255, blank=True, null=True, help_text='ID задачи Celery для отмены')
+    audio_sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        null=True,
+        db_index=True,
+        help_text='SHA-256 содержимого аудио файла (ключ кеша распознавания)'
+    )
+    search_config = models.CharField(
+        max_length=32,
+        default='simple',
+        help_text='Конфигурация полнотекстового поиска PostgreSQL (russian, simple)'
+    )
+    # Заполняется триггером БД из title и transcription (см. миграцию 0010)
+    search_vector = SearchVectorField(null=True, editable=False)
+    
+    objects = RecordingQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='recording_search_vector_idx'),
+            # Счетчики дашборда и последние записи пользователя
+            models.Index(fields=['user', 'status', 'created_at'], name='recording_user_status_idx'),
+        ]
         verbose_name = 'Запись'
         verbose_name_plural = 'Записи'
     
@@ -125,13 +168,217 @@ class Recording(models.Model):
         return None
     
     def delete(self, *args, **kwargs):
-        """Delete file when recording is deleted"""
+        """Delete file and its waveform peaks when recording is deleted"""
         if self.audio_file:
+            from .services import waveform
             if os.path.isfile(self.audio_file.path):
                 os.remove(self.audio_file.path)
+            # Пики волны хранятся рядом с аудио
+            waveform.get_path(Path(self.audio_file.path)).unlink(missing_ok=True)
         super().delete(*args, **kwargs)
 
 
+class TranscriptSegment(models.Model):
+    """
+    One timed segment of a recording's transcript
+
+    Сегменты пишутся одним bulk_create на задачу; индекс (recording, start)
+    позволяет читать окно по времени, не загружая всю транскрипцию.
+    """
+    recording = models.ForeignKey(Recording, on_delete=models.CASCADE, related_name='segments')
+    start = models.FloatField(help_text='Начало в секундах')
+    end = models.FloatField(help_text='Конец в секундах')
+    text = models.TextField()
+    words = models.JSONField(
+        blank=True,
+        null=True,
+        help_text='Временные метки слов: [[start, end, "слово"], ...]'
+    )
+    
+    class Meta:
+        ordering = ['start']
+        indexes = [
+            models.Index(fields=['recording', 'start'], name='segment_recording_start_idx'),
+        ]
+        verbose_name = 'Сегмент транскрипции'
+        verbose_name_plural = 'Сегменты транскрипции'
+    
+    def __str__(self):
+        return f"{self.recording_id} [{self.start:.1f}-{self.end:.1f}]"
+    
+    @staticmethod
+    def compact_words(words):
+        """Convert word dicts of Whisper/Vosk to compact [start, end, word] triples"""
+        if not words:
+            return None
+        compact = []
+        for word in words:
+            if isinstance(word, dict):
+                compact.append([
+                    round(float(word.get('start', 0)), 2),
+                    round(float(word.get('end', 0)), 2),
+                    (word.get('word') or '').strip(),
+                ])
+            else:
+                compact.append(list(word))
+        return compact
+    
+    @classmethod
+    def from_result(cls, recording, segments):
+        """Build unsaved segments from a service result (transcribe_file()['segments'])"""
+        objects = []
+        for segment in segments or []:
+            text = (segment.get('text') or '').strip()
+            if not text:
+                continue
+            objects.append(cls(
+                recording=recording,
+                start=float(segment.get('start') or 0),
+                end=float(segment.get('end') or 0),
+                text=text,
+                words=cls.compact_words(segment.get('words')),
+            ))
+        return objects
+
+
+class TranscriptionCacheEntry(models.Model):
+    """Cached transcription result keyed by audio content and decoding settings"""
+    key = models.CharField(max_length=64, primary_key=True, help_text='SHA-256 от хеша аудио и параметров распознавания')
+    audio_sha256 = models.CharField(max_length=64, db_index=True)
+    recognition_service = models.CharField(max_length=20)
+    model_name = models.CharField(max_length=50, blank=True, default='')
+    language = models.CharField(max_length=10, blank=True, default='')
+    text = models.TextField(blank=True, default='')
+    segments = models.JSONField(blank=True, null=True)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    class Meta:
+        verbose_name = 'Кеш распознавания'
+        verbose_name_plural = 'Кеш распознавания'
+    
+    def __str__(self):
+        return f"{self.recognition_service}/{self.model_name} {self.audio_sha256[:12]}"
+
+
+class TranscriptionCheckpoint(models.Model):
+    """Segments committed by an unfinished transcription (продолжение после retry или потери воркера)"""
+    recording = models.OneToOneField(Recording, on_delete=models.CASCADE, related_name='checkpoint')
+    signature = models.CharField(max_length=64, help_text='Хеш движка, модели и языка - чекпоинт другой модели не используется')
+    processed_seconds = models.FloatField(default=0, help_text='Аудио до этой отметки уже распознано')
+    segments = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Чекпоинт распознавания'
+        verbose_name_plural = 'Чекпоинты распознавания'
+    
+    def __str__(self):
+        return f"{self.recording_id} @ {self.processed_seconds:.1f}s"
+
+
+class TranscriptionRun(models.Model):
+    """
+    One attempt of a transcription task with per-stage timings
+
+    Стадии (секунды, recordings/spans.py): convert - ffmpeg в PCM, model_load,
+    decode - распознавание моделью, persist - сохранение результата в БД.
+    Пакетная попытка записывается на запись лидера, audio_duration - всего пакета.
+    """
+    STATUS_CHOICES = [
+        ('running', 'Выполняется'),
+        ('completed', 'Завершено'),
+        ('cached', 'Из кеша'),
+        ('retry', 'Повтор'),
+        ('failed', 'Ошибка'),
+    ]
+
+    recording = models.ForeignKey(Recording, on_delete=models.CASCADE, related_name='runs')
+    task_id = models.CharField(max_length=255, blank=True, default='')
+    attempt = models.PositiveSmallIntegerField(default=1)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    recognition_service = models.CharField(max_length=20)
+    model_name = models.CharField(max_length=50, blank=True, default='')
+    batch_size = models.PositiveSmallIntegerField(default=1, help_text='Записей, распознанных в этой попытке')
+    enqueued_at = models.DateTimeField(null=True, blank=True, help_text='Постановка в очередь (планировщика или брокера)')
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    convert_seconds = models.FloatField(null=True, blank=True)
+    model_load_seconds = models.FloatField(null=True, blank=True)
+    decode_seconds = models.FloatField(null=True, blank=True)
+    persist_seconds = models.FloatField(null=True, blank=True)
+    audio_duration = models.FloatField(null=True, blank=True, help_text='Секунд аудио, распознанных в попытке')
+    real_time_factor = models.FloatField(null=True, blank=True, help_text='decode / audio_duration')
+    hostname = models.CharField(max_length=255, blank=True, default='')
+    pid = models.PositiveIntegerField(null=True, blank=True)
+    peak_rss_bytes = models.BigIntegerField(null=True, blank=True)
+    error_message = models.TextField(blank=True, default='')
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = 'Запуск распознавания'
+        verbose_name_plural = 'Запуски распознавания'
+        indexes = [
+            models.Index(fields=['recognition_service', 'model_name', 'started_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.recording_id} #{self.attempt} {self.status}"
+
+    @property
+    def queue_wait_seconds(self):
+        if self.enqueued_at is None:
+            return None
+        return max(0.0, (self.started_at - self.enqueued_at).total_seconds())
+
+    @property
+    def total_seconds(self):
+        if self.finished_at is None:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+
+
+class UploadSession(models.Model):
+    """
+    Resumable chunked upload of an audio file (протокол в стиле tus)
+
+    Чанки дописываются прямо в итоговый файл file_name в хранилище; offset -
+    сколько байт уже принято. После приема последнего чанка создается Recording.
+    Потоковая загрузка во время записи начинается без length (Upload-Defer-Length),
+    а уже принятое начало может распознаваться заранее (поля prefix_*).
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    file_name = models.CharField(max_length=255, help_text='Путь файла в хранилище')
+    length = models.BigIntegerField(null=True, blank=True, help_text='Полный размер файла в байтах (Upload-Length), пусто - запись еще идет')
+    offset = models.BigIntegerField(default=0, help_text='Сколько байт уже принято')
+    metadata = models.JSONField(default=dict, blank=True, help_text='Upload-Metadata: название, модель и т.д.')
+    recording = models.OneToOneField(
+        Recording,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='upload_session',
+    )
+    prefix_signature = models.CharField(max_length=64, blank=True, default='', help_text='Хеш движка, модели и языка распознанного начала')
+    prefix_seconds = models.FloatField(default=0, help_text='Начало файла до этой отметки уже распознано')
+    prefix_segments = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Сессия загрузки'
+        verbose_name_plural = 'Сессии загрузки'
+    
+    def __str__(self):
+        return f"{self.file_name} {self.offset}/{self.length}"
+    
+    @property
+    def is_complete(self):
+        return self.length is not None and self.offset >= self.length
+
+
 class UserSettings(models.Model):
     """User preferences and settings"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='settings')
@@ -0,0 +1,98 @@
+"""Transcription progress published by tasks to the cache (Redis) and read by status APIs"""
+import logging
+import time
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+def _progress_key(recording_id):
+    return f'transcribe-progress:{recording_id}'
+
+
+class ProgressReporter:
+    """
+    Progress callback for SpeechRecognitionService.transcribe_file()
+
+    Сервис вызывает reporter(processed_seconds[, total_seconds]) по мере
+    декодирования; запись в кеш делается не чаще TRANSCRIPTION_PROGRESS_INTERVAL,
+    в базу данных ничего не пишется. Скорость декодирования считается от первого
+    вызова (сервис вызывает reporter(0) после загрузки модели).
+    """
+
+    def __init__(self, recording_ids: Iterable[int], total_seconds: Optional[float] = None,
+                 user_ids: Iterable[int] = ()):
+        self.recording_ids = list(recording_ids)
+        self.user_ids = set(user_ids)  # чьим дашбордам отправлять события прогресса
+        self.total_seconds = total_seconds
+        self.interval = getattr(settings, 'TRANSCRIPTION_PROGRESS_INTERVAL', 2.0)
+        self.started_at = None
+        self._baseline = 0.0
+        self._published_at = 0.0
+
+    def __call__(self, processed_seconds: float, total_seconds: Optional[float] = None):
+        now = time.monotonic()
+        if self.started_at is None:
+            # При продолжении с чекпоинта первый вызов - уже не 0, скорость считаем от него
+            self.started_at = now
+            self._baseline = processed_seconds
+        if total_seconds:
+            self.total_seconds = total_seconds
+        if now - self._published_at < self.interval:
+            return
+        self._published_at = now
+
+        elapsed = now - self.started_at
+        processed = processed_seconds
+        if self.total_seconds:
+            processed = min(processed_seconds, self.total_seconds)
+        state = {
+            'processed': processed,
+            'total': self.total_seconds,
+            'speed': (processed - self._baseline) / elapsed if elapsed > 0 else None,  # секунд аудио в секунду
+            'updated_at': time.time(),
+        }
+        timeout = getattr(settings, 'TRANSCRIPTION_CLAIM_TIMEOUT', 7200)
+        try:
+            cache.set_many({_progress_key(rid): state for rid in self.recording_ids}, timeout)
+        except Exception as e:
+            # Прогресс не должен ронять распознавание
+            logger.debug(f"Не удалось сохранить прогресс записей {self.recording_ids}: {e}")
+        if self.user_ids:
+            from .events import publish_progress
+            publish_progress(self.user_ids, self.recording_ids, _format(state))
+
+    def clear(self):
+        cache.delete_many([_progress_key(rid) for rid in self.recording_ids])
+
+
+def _format(state: Optional[Dict]) -> Dict:
+    """Convert stored state to API fields: progress (0..1) and eta_seconds"""
+    if not state or not state.get('total'):
+        return {'progress': None, 'eta_seconds': None}
+
+    total = state['total']
+    progress = min(1.0, state['processed'] / total)
+    eta = None
+    if state.get('speed'):
+        # Экстраполируем на время, прошедшее с последнего обновления
+        remaining = (total - state['processed']) / state['speed']
+        eta = max(0, round(remaining - (time.time() - state['updated_at'])))
+    return {'progress': round(progress, 3), 'eta_seconds': eta}
+
+
+def get_progress(recording_id) -> Dict:
+    """Progress fields for one recording"""
+    return _format(cache.get(_progress_key(recording_id)))
+
+
+def get_progress_many(recording_ids: Iterable[int]) -> Dict[int, Dict]:
+    """Progress fields for several recordings with one cache round trip"""
+    recording_ids = list(recording_ids)
+    if not recording_ids:
+        return {}
+    states = cache.get_many([_progress_key(rid) for rid in recording_ids])
+    return {rid: _format(states.get(_progress_key(rid))) for rid in recording_ids}
@@ -0,0 +1,311 @@
+"""
+Shortest-job-first dispatcher for transcription tasks
+
+Задачи не отправляются в Celery сразу: запись попадает в sorted set Redis
+своей очереди (fast/heavy) с приоритетом
+
+    score = время постановки + TRANSCRIPTION_SCHEDULER_AGING * оценка стоимости
+
+где стоимость - длительность записи, умноженная на real-time factor движка
+и модели. Короткие задачи обгоняют длинные, но длинная задача ждет не больше
+AGING * стоимость дольше, чем пришедшая одновременно с ней короткая - голодания нет.
+В Celery отправляется не больше задач, чем воркер очереди может выполнять
+одновременно, и не больше TRANSCRIPTION_SCHEDULER_MAX_PER_USER на пользователя.
+"""
+import logging
+import time
+import uuid
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'transcribe-sched:pending:{queue}'  # zset "recording:user" -> score
+INFLIGHT_KEY = 'transcribe-sched:inflight:{queue}'  # zset "recording:user" -> время отправки
+TASK_IDS_KEY = 'transcribe-sched:task-ids'  # hash recording -> заранее выданный id задачи Celery
+SUBMITTED_KEY = 'transcribe-sched:submitted'  # hash recording -> время постановки (для ожидания в очереди)
+LOCK_KEY = 'transcribe-sched:lock:{queue}'
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'TRANSCRIPTION_SCHEDULER_ENABLED', True) and _get_redis() is not None
+
+
+def _get_redis():
+    """Raw Redis client of the default cache, None для не-Redis кеша (LocMem в разработке)"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except Exception:
+        return None
+
+
+def get_real_time_factor(recognition_service: str, model_name: Optional[str]) -> float:
+    """Seconds of processing per second of audio for engine and model"""
+    factors = getattr(settings, 'TRANSCRIPTION_REAL_TIME_FACTORS', {})
+    key = f"{recognition_service}:{model_name}" if model_name else recognition_service
+    return factors.get(key, factors.get(recognition_service, 1.0))
+
+
+def estimate_cost(recording) -> float:
+    """Estimated processing time of recording in seconds"""
+    duration = recording.duration or getattr(settings, 'TRANSCRIPTION_SCHEDULER_DEFAULT_DURATION', 300)
+    service = recording.recognition_service or 'faster-whisper'
+    model_name = None if service == 'vosk' else (recording.whisper_model or 'base')
+    return duration * get_real_time_factor(service, model_name)
+
+
+def compute_score(submitted_at: float, cost: float, aging: Optional[float] = None) -> float:
+    """Priority of a pending job, меньше - раньше"""
+    if aging is None:
+        aging = getattr(settings, 'TRANSCRIPTION_SCHEDULER_AGING', 5.0)
+    return submitted_at + aging * cost
+
+
+def select_jobs(pending: Iterable[Tuple[str, float]], running_users: Iterable[str],
+                capacity: int, max_per_user: int) -> List[str]:
+    """
+    Pick jobs to start from pending (member, score) pairs ordered by score
+
+    Общая логика для диспетчера и симуляции (benchmark_scheduler).
+    Члены имеют вид "recording_id:user_id". Лимит на пользователя действует,
+    пока есть задачи других пользователей: свободные слоты не простаивают.
+    """
+    pending = list(pending)
+    per_user = Counter(running_users)
+    selected = []
+    for member, _score in pending:
+        if len(selected) >= capacity:
+            break
+        user_id = member.rsplit(':', 1)[1]
+        if max_per_user and per_user[user_id] >= max_per_user:
+            continue
+        per_user[user_id] += 1
+        selected.append(member)
+
+    # Остались слоты - отдаем их задачам сверх лимита в порядке приоритета
+    for member, _score in pending:
+        if len(selected) >= capacity:
+            break
+        if member not in selected:
+            selected.append(member)
+    return selected
+
+
+def select_peers(pending: Iterable[Tuple[str, float]], running_users: Iterable[str], limit: int,
+                 max_per_user: int, accept: Callable[[str], bool]) -> List[str]:
+    """
+    Pick pending jobs to join a running batch, in priority order
+
+    accept(member) проверяет, подходит ли запись в пакет, и захватывает ее.
+    Пиры занимают слот лидера, поэтому лимит на пользователя действует, как
+    в select_jobs: задачи сверх лимита берутся, только если никто из
+    пользователей в пределах лимита больше не ждет - иначе пакет лидера
+    удлинялся бы за счет их ожидания.
+    """
+    pending = list(pending)
+    per_user = Counter(running_users)
+    selected = []
+
+    def within_cap(member):
+        return not max_per_user or per_user[member.rsplit(':', 1)[1]] < max_per_user
+
+    for member, _score in pending:
+        if len(selected) >= limit:
+            return selected
+        if within_cap(member) and accept(member):
+            per_user[member.rsplit(':', 1)[1]] += 1
+            selected.append(member)
+
+    if any(within_cap(member) for member, _score in pending if member not in selected):
+        return selected
+    for member, _score in pending:
+        if len(selected) >= limit:
+            break
+        if member not in selected and accept(member):
+            selected.append(member)
+    return selected
+
+
+def _member(recording_id, user_id) -> str:
+    return f"{recording_id}:{user_id}"
+
+
+def _queues() -> List[str]:
+    return list(getattr(settings, 'TRANSCRIPTION_QUEUE_CONCURRENCY', {}).keys())
+
+
+def schedule(recording, queue: str) -> str:
+    """
+    Put recording into the queue's pending set and dispatch what fits
+
+    Returns:
+        Task id, под которым задача будет отправлена в Celery (известен заранее,
+        чтобы отмена через revoke работала и для еще не отправленной задачи)
+    """
+    client = _get_redis()
+    task_id = str(uuid.uuid4())
+    member = _member(recording.id, recording.user_id)
+    cost = estimate_cost(recording)
+    submitted_at = time.time()
+
+    # Повторная постановка (повторное распознавание) заменяет прежнюю запись
+    discard(recording.id)
+    pipe = client.pipeline()
+    pipe.hset(TASK_IDS_KEY, str(recording.id), task_id)
+    pipe.hset(SUBMITTED_KEY, str(recording.id), submitted_at)
+    pipe.zadd(PENDING_KEY.format(queue=queue), {member: compute_score(submitted_at, cost)})
+    pipe.execute()
+    logger.info(f"Запись {recording.id} поставлена в очередь {queue}, оценка {cost:.0f} сек")
+
+    dispatch(queue)
+    return task_id
+
+
+def dispatch(queue: str) -> int:
+    """Send as many pending jobs to Celery as the queue has free slots, returns count"""
+    from redis.exceptions import LockError
+    from .tasks import transcribe_recording_task
+
+    client = _get_redis()
+    try:
+        with client.lock(LOCK_KEY.format(queue=queue), timeout=30, blocking_timeout=10):
+            return _dispatch_locked(client, queue, transcribe_recording_task)
+    except LockError:
+        # Другой процесс уже раздает задачи этой очереди
+        logger.warning(f"Не удалось захватить блокировку планировщика очереди {queue}")
+        return 0
+
+
+def _dispatch_locked(client, queue: str, task) -> int:
+    """Move selected jobs from pending to inflight and send them (под блокировкой очереди)"""
+    concurrency = getattr(settings, 'TRANSCRIPTION_QUEUE_CONCURRENCY', {}).get(queue, 1)
+    max_per_user = getattr(settings, 'TRANSCRIPTION_SCHEDULER_MAX_PER_USER', 0)
+    stale_after = getattr(settings, 'TRANSCRIPTION_CLAIM_TIMEOUT', 7200)
+    pending_key = PENDING_KEY.format(queue=queue)
+    inflight_key = INFLIGHT_KEY.format(queue=queue)
+
+    # Слоты задач, потерянных без release (убитый воркер), освобождаются по таймауту
+    client.zremrangebyscore(inflight_key, '-inf', time.time() - stale_after)
+
+    running = [member.decode() for member in client.zrange(inflight_key, 0, -1)]
+    capacity = concurrency - len(running)
+    if capacity <= 0:
+        return 0
+
+    pending = ((member.decode(), score) for member, score in client.zrange(pending_key, 0, -1, withscores=True))
+    selected = select_jobs(pending, [m.rsplit(':', 1)[1] for m in running], capacity, max_per_user)
+
+    for member in selected:
+        recording_id = member.split(':', 1)[0]
+        task_id = client.hget(TASK_IDS_KEY, recording_id)
+        task_id = task_id.decode() if task_id else str(uuid.uuid4())
+        submitted_at = client.hget(SUBMITTED_KEY, recording_id)
+        pipe = client.pipeline()
+        pipe.zrem(pending_key, member)
+        pipe.zadd(inflight_key, {member: time.time()})
+        pipe.hdel(TASK_IDS_KEY, recording_id)
+        pipe.hdel(SUBMITTED_KEY, recording_id)
+        pipe.execute()
+        # Ожидание в очереди считается от постановки в pending, а не от раздачи
+        # (stamp_publish_time не перезаписывает переданное время)
+        headers = {'published_at': float(submitted_at)} if submitted_at else None
+        task.apply_async(args=[int(recording_id)], queue=queue, task_id=task_id, headers=headers)
+        logger.info(f"Задача {task_id} записи {recording_id} отправлена в очередь {queue}")
+
+    return len(selected)
+
+
+def pending_ids(queue: str) -> List[int]:
+    """Recording ids waiting in the queue's pending set, по приоритету"""
+    client = _get_redis()
+    if client is None:
+        return []
+    return [int(member.decode().split(':', 1)[0]) for member in client.zrange(PENDING_KEY.format(queue=queue), 0, -1)]
+
+
+def take_peers(queue: str, limit: int, accept: Callable[[str], bool]) -> List[int]:
+    """
+    Remove pending jobs picked for a running batch from the scheduler
+
+    Выбор идет под блокировкой очереди, поэтому диспетчер не отправит
+    в Celery задачу записи, которую забирает пакет. Собственные задачи
+    пиров не отправляются вовсе - их распознает задача лидера.
+
+    Returns:
+        Id записей, принятых accept и убранных из очереди
+    """
+    from redis.exceptions import LockError
+
+    client = _get_redis()
+    pending_key = PENDING_KEY.format(queue=queue)
+    max_per_user = getattr(settings, 'TRANSCRIPTION_SCHEDULER_MAX_PER_USER', 0)
+    lock = client.lock(LOCK_KEY.format(queue=queue), timeout=30)
+    if not lock.acquire(blocking_timeout=10):
+        logger.warning(f"Не удалось захватить блокировку планировщика очереди {queue}, пакет без пиров")
+        return []
+    try:
+        running = [member.decode() for member in client.zrange(INFLIGHT_KEY.format(queue=queue), 0, -1)]
+        pending = ((member.decode(), score) for member, score in client.zrange(pending_key, 0, -1, withscores=True))
+        selected = select_peers(pending, [m.rsplit(':', 1)[1] for m in running], limit, max_per_user, accept)
+        for member in selected:
+            recording_id = member.split(':', 1)[0]
+            pipe = client.pipeline()
+            pipe.zrem(pending_key, member)
+            pipe.hdel(TASK_IDS_KEY, recording_id)
+            pipe.hdel(SUBMITTED_KEY, recording_id)
+            pipe.execute()
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # Блокировка истекла - выбранные записи уже захвачены и убраны из очереди
+            pass
+    return [int(member.split(':', 1)[0]) for member in selected]
+
+
+def _remove(client, recording_id) -> List[str]:
+    """Remove recording from all pending/inflight sets, returns affected queues"""
+    affected = []
+    for queue in _queues():
+        for key in (PENDING_KEY.format(queue=queue), INFLIGHT_KEY.format(queue=queue)):
+            members = [m for m in client.zrange(key, 0, -1) if m.decode().split(':', 1)[0] == str(recording_id)]
+            if members and client.zrem(key, *members):
+                affected.append(queue)
+    client.hdel(TASK_IDS_KEY, str(recording_id))
+    client.hdel(SUBMITTED_KEY, str(recording_id))
+    return affected
+
+
+def discard(recording_id):
+    """Forget recording (отмена или обработка в составе пакета) без запуска новых задач"""
+    client = _get_redis()
+    if client is not None:
+        _remove(client, recording_id)
+
+
+def release(recording_id):
+    """Free recording's slot after its task finished and start the next jobs"""
+    client = _get_redis()
+    if client is None:
+        return
+    for queue in set(_remove(client, recording_id)):
+        dispatch(queue)
+
+
+def dispatch_all() -> Dict[str, int]:
+    """Dispatch every queue (периодическая страховка от потерянных release)"""
+    return {queue: dispatch(queue) for queue in _queues()}
+
+
+def get_position(recording_id, queue: str) -> Optional[int]:
+    """1-based position of recording among pending jobs of the queue, None if not pending"""
+    client = _get_redis()
+    if client is None:
+        return None
+    for index, member in enumerate(client.zrange(PENDING_KEY.format(queue=queue), 0, -1)):
+        if member.decode().split(':', 1)[0] == str(recording_id):
+            return index + 1
+    return None
@@ -0,0 +1,96 @@
+"""Full-text search over recording titles and transcripts (PostgreSQL tsvector)"""
+from typing import Iterable
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+# Маркеры подсветки из private use area Unicode: в тексте транскрипции их нет,
+# поэтому после экранирования HTML их можно безопасно заменить на <mark>
+_START_SEL = '\ue000'
+_STOP_SEL = '\ue001'
+
+
+def get_search_config(language: str) -> str:
+    """PostgreSQL text search configuration for recognition language"""
+    configs = getattr(settings, 'TRANSCRIPTION_SEARCH_CONFIGS', {'ru': 'russian'})
+    return configs.get(language or '', 'simple')
+
+
+def is_full_text_available() -> bool:
+    return connection.vendor == 'postgresql'
+
+
+def build_query(query: str):
+    """
+    Query matching documents of every configuration in use
+
+    Вектор каждой записи построен в своей конфигурации (russian со стеммингом
+    или simple), поэтому запрос разбирается в каждой из них.
+    """
+    configs = set(getattr(settings, 'TRANSCRIPTION_SEARCH_CONFIGS', {'ru': 'russian'}).values()) | {'simple'}
+    search_query = None
+    for config in sorted(configs):
+        part = SearchQuery(query, config=config, search_type='websearch')
+        search_query = part if search_query is None else search_query | part
+    return search_query
+
+
+def search_recordings(queryset, query: str):
+    """
+    Filter recordings by query and annotate search_rank
+
+    Условие только по tsvector, чтобы запрос целиком обслуживался GIN индексом
+    (OR с ILIKE по названию перевел бы план в полный просмотр). Название уже
+    входит в вектор с весом A.
+    """
+    if not is_full_text_available():
+        return queryset.filter(Q(title__icontains=query) | Q(transcription__icontains=query))
+
+    search_query = build_query(query)
+    return (
+        queryset
+        .filter(search_vector=search_query)
+        .annotate(search_rank=SearchRank(F('search_vector'), search_query))
+    )
+
+
+def add_headlines(recordings: Iterable, query: str):
+    """
+    Set search_headline (HTML with <mark>) on recordings of the current page
+
+    ts_headline разбирает весь документ, поэтому считается отдельным запросом
+    только для записей страницы, а не для всех найденных.
+    """
+    from .models import Recording
+
+    recordings = list(recordings)
+    if not recordings or not is_full_text_available():
+        return
+
+    headlines = dict(
+        Recording.objects
+        .filter(pk__in=[recording.pk for recording in recordings], transcription__gt='')
+        .annotate(headline=SearchHeadline(
+            'transcription',
+            build_query(query),
+            config=F('search_config'),
+            start_sel=_START_SEL,
+            stop_sel=_STOP_SEL,
+            max_words=getattr(settings, 'SEARCH_HEADLINE_MAX_WORDS', 30),
+            min_words=getattr(settings, 'SEARCH_HEADLINE_MIN_WORDS', 12),
+            max_fragments=getattr(settings, 'SEARCH_HEADLINE_MAX_FRAGMENTS', 2),
+            fragment_delimiter=' … ',
+        ))
+        .values_list('pk', 'headline')
+    )
+    for recording in recordings:
+        headline = headlines.get(recording.pk)
+        if headline and _START_SEL in headline:
+            html = escape(headline).replace(_START_SEL, '<mark>').replace(_STOP_SEL, '</mark>')
+            recording.search_headline = mark_safe(html)
+        else:
+            recording.search_headline = None
@@ -0,0 +1,505 @@
+"""
+Container-level probing of audio duration and format
+
+Длительность читается из метаданных контейнера без декодирования: заголовки
+и хвост файла, но не сами аудиоданные.
+
+    WAV       размер чанка data / byte rate из fmt
+    FLAC      число сэмплов из STREAMINFO
+    Ogg       granule position последней страницы (Opus - с учетом pre-skip)
+    WebM/MKV  Segment/Info/Duration, а у записей MediaRecorder (Duration нет) -
+              метка времени последнего блока последнего кластера
+    MP4/M4A   mvhd в moov (moov ищется переходами по размерам боксов)
+    MP3       число фреймов из заголовка Xing/Info/VBRI или оценка по CBR
+
+Если разобрать контейнер не удалось, выполняется один вызов ffprobe.
+"""
+import json
+import logging
+import os
+import struct
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+HEAD_BYTES = 64 * 1024
+# Последняя страница Ogg не длиннее 65307 байт, последний кластер WebM MediaRecorder - единицы секунд
+TAIL_BYTES = 256 * 1024
+# moov длинной записи с таблицами сэмплов - несколько MB
+MAX_MOOV_BYTES = 32 * 1024 * 1024
+
+
+def _result(fmt, duration=None, sample_rate=None, channels=None, codec=None, method='container') -> Dict:
+    return {
+        'duration': float(duration) if duration is not None and duration > 0 else None,
+        'sample_rate': int(sample_rate) if sample_rate else None,
+        'channels': int(channels) if channels else None,
+        'format': fmt,
+        'codec': codec,
+        'method': method,
+    }
+
+
+def _read_tail(f: BinaryIO, size: int) -> bytes:
+    f.seek(0, os.SEEK_END)
+    f.seek(max(0, f.tell() - size))
+    return f.read(size)
+
+
+# --- WAV ---
+
+def _probe_wav(f: BinaryIO, head: bytes, file_size: int) -> Optional[Dict]:
+    pos = 12
+    fmt = None
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        chunk_id, chunk_size = struct.unpack('<4sI', f.read(8))
+        if chunk_id == b'fmt ':
+            audio_format, channels, sample_rate, byte_rate = struct.unpack('<HHII', f.read(12))
+            fmt = (channels, sample_rate, byte_rate)
+        elif chunk_id == b'data':
+            if fmt is None or not fmt[2]:
+                return None
+            # Записанный потоком WAV: размер в заголовке не заполнен
+            data_size = min(chunk_size, file_size - pos - 8)
+            return _result('wav', data_size / fmt[2], fmt[1], fmt[0], 'pcm')
+        pos += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+# --- FLAC ---
+
+def _skip_id3(f: BinaryIO, head: bytes) -> int:
+    """Offset after ID3v2 tag (0 если тега нет)"""
+    if head[:3] != b'ID3' or len(head) < 10:
+        return 0
+    size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+    footer = 10 if head[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _probe_flac(f: BinaryIO, head: bytes, file_size: int) -> Optional[Dict]:
+    start = _skip_id3(f, head)
+    f.seek(start)
+    block = f.read(4 + 4 + 34)
+    if block[:4] != b'fLaC' or block[4] & 0x7F != 0:
+        return None
+    info = int.from_bytes(block[18:26], 'big')
+    sample_rate = info >> 44
+    channels = ((info >> 41) & 0x7) + 1
+    total_samples = info & ((1 << 36) - 1)
+    duration = total_samples / sample_rate if sample_rate and total_samples else None
+    return _result('flac', duration, sample_rate, channels, 'flac')
+
+
+# --- Ogg ---
+
+def _probe_ogg(f: BinaryIO, head: bytes, file_size: int) -> Optional[Dict]:
+    if len(head) < 28:
+        return None
+    serial = head[14:18]
+    segments = head[26]
+    body = head[27 + segments:]
+    if body[:8] == b'OpusHead':
+        codec = 'opus'
+        channels = body[9]
+        pre_skip = struct.unpack('<H', body[10:12])[0]
+        sample_rate = struct.unpack('<I', body[12:16])[0] or 48000
+        # Granule position Opus всегда в отсчетах 48 kHz
+        granule_rate = 48000
+    elif body[:7] == b'\x01vorbis':
+        codec = 'vorbis'
+        channels = body[11]
+        sample_rate = struct.unpack('<I', body[12:16])[0]
+        granule_rate = sample_rate
+        pre_skip = 0
+    else:
+        return None
+
+    tail = _read_tail(f, TAIL_BYTES)
+    pos = tail.rfind(b'OggS')
+    while pos >= 0:
+        if tail[pos + 14:pos + 18] == serial and pos + 14 <= len(tail):
+            granule = struct.unpack('<q', tail[pos + 6:pos + 14])[0]
+            if granule >= 0:
+                return _result('ogg', (granule - pre_skip) / granule_rate, sample_rate, channels, codec)
+        pos = tail.rfind(b'OggS', 0, pos)
+    return _result('ogg', None, sample_rate, channels, codec)
+
+
+# --- WebM / Matroska (EBML) ---
+
+EBML_HEADER = 0x1A45DFA3
+SEGMENT = 0x18538067
+INFO = 0x1549A966
+TIMECODE_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+AUDIO = 0xE1
+SAMPLING_FREQUENCY = 0xB5
+CHANNELS = 0x9F
+CLUSTER = 0x1F43B675
+CLUSTER_TIMECODE = 0xE7
+SIMPLE_BLOCK = 0xA3
+BLOCK_GROUP = 0xA0
+BLOCK = 0xA1
+DOC_TYPE = 0x4282
+
+
+def _read_vint(data: bytes, pos: int, keep_marker: bool = False):
+    """EBML variable-size integer: (value, next_pos, unknown_size)"""
+    first = data[pos]
+    length, mask = 1, 0x80
+    while length <= 8 and not first & mask:
+        length += 1
+        mask >>= 1
+    if length > 8 or pos + length > len(data):
+        raise ValueError('Некорректное EBML число')
+    value = first if keep_marker else first & (mask - 1)
+    for byte in data[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    unknown = not keep_marker and value == (1 << (7 * length)) - 1
+    return value, pos + length, unknown
+
+
+def _iter_elements(data: bytes, start: int, end: int):
+    """Yield (id, data_start, data_end) of EBML elements, неизвестный размер - до end"""
+    pos = start
+    while pos < end:
+        try:
+            element_id, pos, _ = _read_vint(data, pos, keep_marker=True)
+            size, pos, unknown = _read_vint(data, pos)
+        except (ValueError, IndexError):
+            return
+        data_end = end if unknown else min(end, pos + size)
+        yield element_id, pos, data_end
+        if unknown and element_id in (SEGMENT, CLUSTER):
+            # Элементы неизвестного размера (запись потоком) - дочерние идут сразу после заголовка
+            continue
+        pos = data_end
+
+
+def _ebml_uint(data: bytes) -> int:
+    return int.from_bytes(data, 'big') if data else 0
+
+
+def _ebml_float(data: bytes) -> Optional[float]:
+    if len(data) == 4:
+        return struct.unpack('>f', data)[0]
+    if len(data) == 8:
+        return struct.unpack('>d', data)[0]
+    return None
+
+
+def _last_block_time(tail: bytes) -> Optional[int]:
+    """Timecode (в единицах TimecodeScale) последнего блока последнего целого кластера хвоста"""
+    pos = tail.rfind(b'\x1f\x43\xb6\x75')
+    while pos >= 0:
+        cluster_time = None
+        last_block = None
+        try:
+            _, data_start, _ = next(_iter_elements(tail, pos, len(tail)))
+            for element_id, start, end in _iter_elements(tail, data_start, len(tail)):
+                if element_id == CLUSTER_TIMECODE:
+                    cluster_time = _ebml_uint(tail[start:end])
+                elif element_id in (SIMPLE_BLOCK, BLOCK_GROUP):
+                    if element_id == BLOCK_GROUP:
+                        block = next((s for i, s, e in _iter_elements(tail, start, end) if i == BLOCK), None)
+                        if block is None:
+                            continue
+                        start = block
+                    _, offset, _ = _read_vint(tail, start)
+                    relative = struct.unpack('>h', tail[offset:offset + 2])[0]
+                    last_block = max(last_block or relative, relative)
+                elif element_id == CLUSTER:
+                    break
+        except (StopIteration, ValueError, IndexError, struct.error):
+            pass
+        # Байты 1F43B675 могут встретиться внутри аудиоданных - настоящий кластер начинается с Timecode
+        if cluster_time is not None:
+            return cluster_time + (last_block or 0)
+        pos = tail.rfind(b'\x1f\x43\xb6\x75', 0, pos)
+    return None
+
+
+def _probe_matroska(f: BinaryIO, head: bytes, file_size: int) -> Optional[Dict]:
+    fmt = 'webm'
+    timecode_scale = 1000000
+    duration = None
+    sample_rate = channels = codec = None
+
+    for element_id, start, end in _iter_elements(head, 0, len(head)):
+        if element_id == EBML_HEADER:
+            for child_id, child_start, child_end in _iter_elements(head, start, end):
+                if child_id == DOC_TYPE and head[child_start:child_end] == b'matroska':
+                    fmt = 'matroska'
+        elif element_id == SEGMENT:
+            for child_id, child_start, child_end in _iter_elements(head, start, end):
+                if child_id == INFO:
+                    for info_id, info_start, info_end in _iter_elements(head, child_start, child_end):
+                        if info_id == TIMECODE_SCALE:
+                            timecode_scale = _ebml_uint(head[info_start:info_end]) or timecode_scale
+                        elif info_id == DURATION:
+                            duration = _ebml_float(head[info_start:info_end])
+                elif child_id == TRACKS:
+                    for entry_id, entry_start, entry_end in _iter_elements(head, child_start, child_end):
+                        if entry_id != TRACK_ENTRY:
+                            continue
+                        track = {}
+                        for track_id, track_start, track_end in _iter_elements(head, entry_start, entry_end):
+                            value = head[track_start:track_end]
+                            if track_id == TRACK_TYPE:
+                                track['type'] = _ebml_uint(value)
+                            elif track_id == CODEC_ID:
+                                track['codec'] = value.decode('ascii', 'replace')
+                            elif track_id == AUDIO:
+                                for audio_id, audio_start, audio_end in _iter_elements(head, track_start, track_end):
+                                    if audio_id == SAMPLING_FREQUENCY:
+                                        track['sample_rate'] = _ebml_float(head[audio_start:audio_end])
+                                    elif audio_id == CHANNELS:
+                                        track['channels'] = _ebml_uint(head[audio_start:audio_end])
+                        if track.get('type') == 2 and codec is None:
+                            codec = track.get('codec', '').replace('A_', '').lower() or None
+                            sample_rate = track.get('sample_rate')
+                            channels = track.get('channels')
+                elif child_id == CLUSTER:
+                    break
+            break
+
+    if duration is None:
+        # MediaRecorder пишет WebM без Duration - берем время последнего блока
+        last_time = _last_block_time(_read_tail(f, TAIL_BYTES))
+        if last_time is not None:
+            duration = last_time
+    seconds = duration * timecode_scale / 1e9 if duration is not None else None
+    return _result(fmt, seconds, sample_rate, channels, codec)
+
+
+# --- MP4 / M4A ---
+
+def _iter_boxes(data: bytes, start: int, end: int):
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack('>I4s', data[pos:pos + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', data[pos + 8:pos + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield box_type, pos + header, min(end, pos + size)
+        pos += size
+
+
+def _find_moov(f: BinaryIO, file_size: int) -> Optional[bytes]:
+    """Top-level walk by box sizes: mdat пропускается без чтения"""
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        header = f.read(16)
+        size, box_type = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header_size:
+            return None
+        if box_type == b'moov':
+            if size > MAX_MOOV_BYTES:
+                return None
+            f.seek(pos + header_size)
+            return f.read(size - header_size)
+        pos += size
+    return None
+
+
+def _probe_mp4(f: BinaryIO, head: bytes, file_size: int) -> Optional[Dict]:
+    moov = _find_moov(f, file_size)
+    if moov is None:
+        return None
+    duration = sample_rate = channels = codec = None
+    for box_type, start, end in _iter_boxes(moov, 0, len(moov)):
+        if box_type == b'mvhd':
+            if moov[start] == 1:
+                timescale, length = struct.unpack('>IQ', moov[start + 20:start + 32])
+            else:
+                timescale, length = struct.unpack('>II', moov[start + 12:start + 20])
+            # Фрагментированный MP4 (Safari MediaRecorder): длительность в moov нулевая
+            if timescale and length not in (0, 0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+                duration = length / timescale
+        elif box_type == b'trak' and codec is None:
+            stack = [(start, end)]
+            while stack:
+                box_start, box_end = stack.pop()
+                for child_type, child_start, child_end in _iter_boxes(moov, box_start, box_end):
+                    if child_type in (b'mdia', b'minf', b'stbl'):
+                        stack.append((child_start, child_end))
+                    elif child_type == b'stsd':
+                        # version/flags, entry_count, затем первая запись образца
+                        entry = child_start + 8
+                        entry_type = moov[entry + 4:entry + 8]
+                        if entry_type in (b'mp4a', b'alac', b'Opus', b'fLaC'):
+                            codec = {b'mp4a': 'aac'}.get(entry_type, entry_type.decode('ascii').lower())
+                            channels = struct.unpack('>H', moov[entry + 24:entry + 26])[0]
+                            sample_rate = struct.unpack('>H', moov[entry + 32:entry + 34])[0]
+    return _result('mp4', duration, sample_rate, channels, codec)
+
+
+# --- MP3 ---
+
+MP3_BITRATES = {
+    # (MPEG-1, Layer III) и (MPEG-2/2.5, Layer III), kbit/s
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+def _probe_mp3(f: BinaryIO, head: bytes, file_size: int) -> Optional[Dict]:
+    start = _skip_id3(f, head)
+    f.seek(start)
+    data = f.read(HEAD_BYTES)
+    pos = 0
+    while pos + 4 <= len(data):
+        if data[pos] == 0xFF and data[pos + 1] & 0xE0 == 0xE0:
+            header = struct.unpack('>I', data[pos:pos + 4])[0]
+            version = (header >> 19) & 0x3
+            layer = (header >> 17) & 0x3
+            bitrate_index = (header >> 12) & 0xF
+            rate_index = (header >> 10) & 0x3
+            # Только Layer III (layer == 1) с корректными индексами
+            if version != 1 and layer == 1 and 0 < bitrate_index < 15 and rate_index < 3:
+                break
+        pos += 1
+    else:
+        return None
+
+    mpeg1 = version == 3
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    bitrate = MP3_BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+    channels = 1 if (header >> 6) & 0x3 == 3 else 2
+    samples_per_frame = 1152 if mpeg1 else 576
+
+    # Заголовок VBR в первом фрейме: после side info (Xing/Info) или по смещению 32 (VBRI)
+    side_info = (32 if channels == 2 else 17) if mpeg1 else (17 if channels == 2 else 9)
+    xing = pos + 4 + side_info
+    frames = None
+    if data[xing:xing + 4] in (b'Xing', b'Info'):
+        flags = struct.unpack('>I', data[xing + 4:xing + 8])[0]
+        if flags & 0x1:
+            frames = struct.unpack('>I', data[xing + 8:xing + 12])[0]
+    elif data[pos + 36:pos + 40] == b'VBRI':
+        frames = struct.unpack('>I', data[pos + 50:pos + 54])[0]
+
+    if frames:
+        duration = frames * samples_per_frame / sample_rate
+    else:
+        # CBR: аудиоданные от первого фрейма до тега ID3v1
+        f.seek(max(0, file_size - 128))
+        audio_bytes = file_size - start - pos - (128 if f.read(3) == b'TAG' else 0)
+        duration = audio_bytes * 8 / bitrate
+    return _result('mp3', duration, sample_rate, channels, 'mp3')
+
+
+def _detect(head: bytes):
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return _probe_wav
+    if head[:4] == b'fLaC' or (head[:3] == b'ID3' and b'fLaC' in head[:HEAD_BYTES]):
+        return _probe_flac
+    if head[:4] == b'OggS':
+        return _probe_ogg
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return _probe_matroska
+    if head[4:8] == b'ftyp':
+        return _probe_mp4
+    if head[:3] == b'ID3' or (head[:1] == b'\xff' and head[1:2] and head[1] & 0xE0 == 0xE0):
+        return _probe_mp3
+    return None
+
+
+def _ffprobe(file_path: Path) -> Optional[Dict]:
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'format=duration,format_name:stream=codec_name,sample_rate,channels',
+        '-of', 'json',
+        str(file_path),
+    ]
+    try:
+        completed = subprocess.run(
+            cmd, capture_output=True, check=True,
+            timeout=getattr(settings, 'AUDIO_PROBE_FFPROBE_TIMEOUT', 30),
+        )
+        data = json.loads(completed.stdout or b'{}')
+    except FileNotFoundError:
+        logger.warning("ffprobe не найден, длительность не определена")
+        return None
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, ValueError) as e:
+        logger.warning(f"ffprobe не смог прочитать {file_path}: {e}")
+        return None
+
+    stream = (data.get('streams') or [{}])[0]
+    fmt = data.get('format') or {}
+    try:
+        duration = float(fmt['duration'])
+    except (KeyError, TypeError, ValueError):
+        duration = None
+    format_name = (fmt.get('format_name') or file_path.suffix.lstrip('.')).split(',')[0]
+    return _result(format_name, duration, stream.get('sample_rate'), stream.get('channels'),
+                   stream.get('codec_name'), method='ffprobe')
+
+
+def probe(file_path: Path) -> Dict:
+    """
+    Probe duration, sample rate, channels and codec of an audio file
+
+    Returns:
+        {'duration', 'sample_rate', 'channels', 'format', 'codec', 'method'} -
+        неизвестные значения None; method - 'container', 'ffprobe' или None,
+        если файл не удалось разобрать ничем.
+    """
+    file_path = Path(file_path)
+    try:
+        file_size = file_path.stat().st_size
+        with open(file_path, 'rb') as f:
+            head = f.read(HEAD_BYTES)
+            parser = _detect(head)
+            if parser is not None:
+                try:
+                    result = parser(f, head, file_size)
+                except (ValueError, IndexError, struct.error) as e:
+                    logger.debug(f"Не удалось разобрать контейнер {file_path}: {e}")
+                    result = None
+                if result is not None and result['duration'] is not None:
+                    return result
+    except OSError as e:
+        logger.warning(f"Не удалось открыть {file_path}: {e}")
+        return _result(file_path.suffix.lstrip('.').lower(), method=None)
+
+    probed = _ffprobe(file_path)
+    if probed is not None:
+        return probed
+    # Формат из заголовков без длительности лучше, чем ничего
+    if parser is not None and result is not None:
+        return result
+    return _result(file_path.suffix.lstrip('.').lower(), method=None)
+
+
+def probe_many(file_paths: Iterable[Path], workers: Optional[int] = None) -> List[Dict]:
+    """Probe files in parallel threads (чтение заголовков и ffprobe - ожидание I/O), порядок сохраняется"""
+    if workers is None:
+        workers = getattr(settings, 'AUDIO_PROBE_WORKERS', 8)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return list(executor.map(probe, file_paths))
@@ -1,4 +1,5 @@
 """Service for audio file processing"""
+import hashlib
 import os
 import soundfile as sf
 import numpy as np
@@ -6,6 +7,8 @@ from pathlib import Path
 from typing import Optional, Tuple
 import logging
 
+from recordings.services import audio_probe
+
 logger = logging.getLogger(__name__)
 
 
@@ -16,44 +19,31 @@ class AudioService:
     def get_audio_info(file_path: Path) -> dict:
         """Get audio file information"""
         file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
-        
-        # Для webm/opus файлов из браузера - использовать базовую информацию
-        if file_path.suffix.lower() in ['.webm', '.opus']:
-            # Whisper может обработать эти форматы, но soundfile не всегда может
-            # Возвращаем базовую информацию
-            return {
-                'duration': None,  # Будет определено при обработке Whisper
-                'sample_rate': None,
-                'channels': None,
-                'format': file_path.suffix.lower(),
-                'file_size': file_size,
-            }
-        
-        # Для других форматов - использовать soundfile
-        try:
-            with sf.SoundFile(str(file_path)) as f:
-                duration = len(f) / f.samplerate
-                sample_rate = f.samplerate
-                channels = f.channels
-                format_type = f.format
-            
-            return {
-                'duration': duration,
-                'sample_rate': sample_rate,
-                'channels': channels,
-                'format': format_type,
-                'file_size': file_size,
-            }
-        except Exception as e:
-            logger.warning(f"Не удалось получить полную информацию об аудио {file_path}: {e}")
-            # Возвращаем хотя бы размер файла
-            return {
-                'duration': None,
-                'sample_rate': None,
-                'channels': None,
-                'format': file_path.suffix.lower(),
-                'file_size': file_size,
-            }
+
+        # Заголовки контейнера (WebM/Opus из браузера тоже), при неудаче - один вызов ffprobe
+        info = audio_probe.probe(file_path)
+        if info['duration'] is None and file_path.suffix.lower() not in ['.webm', '.opus']:
+            # Без ffprobe - хотя бы то, что читает soundfile
+            try:
+                with sf.SoundFile(str(file_path)) as f:
+                    info.update(
+                        duration=len(f) / f.samplerate,
+                        sample_rate=f.samplerate,
+                        channels=f.channels,
+                        format=f.format,
+                        method='soundfile',
+                    )
+            except Exception as e:
+                logger.warning(f"Не удалось получить полную информацию об аудио {file_path}: {e}")
+
+        return {
+            'duration': info['duration'],
+            'sample_rate': info['sample_rate'],
+            'channels': info['channels'],
+            'format': info['format'] or file_path.suffix.lower(),
+            'codec': info['codec'],
+            'file_size': file_size,
+        }
     
     @staticmethod
     def is_valid_audio_file(file_path: Path) -> bool:
@@ -77,6 +67,15 @@ class AudioService:
                 return os.path.exists(file_path) and os.path.getsize(file_path) > 0
             return False
     
+    @staticmethod
+    def compute_sha256(file_path: Path, chunk_size: int = 1024 * 1024) -> str:
+        """Compute SHA-256 of file content (для записей, загруженных до появления кеша)"""
+        hasher = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+    
     @staticmethod
     def get_supported_formats():
         """Get list of supported audio formats"""
@@ -1,25 +1,49 @@
 """Service for speech recognition using faster-whisper (CTranslate2)"""
 try:
-    from faster_whisper import WhisperModel
+    from faster_whisper import WhisperModel, decode_audio
+    from faster_whisper.vad import get_speech_timestamps
     FASTER_WHISPER_AVAILABLE = True
 except ImportError:
     FASTER_WHISPER_AVAILABLE = False
     WhisperModel = None
+    decode_audio = None
+    get_speech_timestamps = None
 
+try:
+    # Пакетный режим появился в faster-whisper 1.1
+    from faster_whisper import BatchedInferencePipeline
+    from faster_whisper.vad import VadOptions, merge_segments
+    BATCHED_INFERENCE_AVAILABLE = True
+except ImportError:
+    BATCHED_INFERENCE_AVAILABLE = False
+    BatchedInferencePipeline = None
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional, Tuple
 import logging
 
+import numpy as np
+from django.conf import settings
+
 from .speech_recognition_service import SpeechRecognitionService
+from .system_resources import get_task_cpu_quota
+from .model_registry import get_model_registry
+from recordings import spans
 
 logger = logging.getLogger(__name__)
 
+SAMPLE_RATE = 16000
+# Перекрытие при принудительном разрезании непрерывной речи
+CHUNK_OVERLAP_SECONDS = 2.0
+# Длина окна Whisper - единица пакетной обработки
+WINDOW_SECONDS = 30
+
 
 class FasterWhisperService(SpeechRecognitionService):
     """Service for speech recognition using faster-whisper (much faster than openai-whisper)"""
     
-    _models = {}  # Cache для моделей
-    
     def __init__(self, device: str = "cpu", compute_type: str = "int8"):
         """
         Initialize FasterWhisperService
@@ -36,11 +60,28 @@ class FasterWhisperService(SpeechRecognitionService):
         self.device = device
         self.compute_type = compute_type
     
-    def load_model(self, model_size: str = 'base'):
-        """Load Whisper model (with caching)"""
-        cache_key = f"{model_size}_{self.device}_{self.compute_type}"
+    def load_model(self, model_size: str = 'base', cpu_threads: int = None, num_workers: int = 1):
+        """
+        Load Whisper model (with caching in the shared model registry)
         
-        if cache_key not in self._models:
+        Args:
+            model_size: Model size/name
+            cpu_threads: Number of CTranslate2 threads per worker (None = auto, не более 4)
+            num_workers: Number of parallel transcribe() calls the model can serve
+        """
+        base_key = f"faster-whisper:{model_size}_{self.device}_{self.compute_type}"
+        cache_key = base_key
+        if cpu_threads or num_workers > 1:
+            cache_key += f"_{cpu_threads}x{num_workers}"
+        
+        registry = get_model_registry()
+        if cache_key not in registry:
+            # cpu_threads и num_workers задаются при загрузке, поэтому у последовательного
+            # режима и режима по частям разные экземпляры; в памяти держим только один -
+            # второй вариант тех же весов вытесняется перед загрузкой
+            registry.evict_variants(base_key, keep=cache_key)
+        
+        def loader():
             try:
                 logger.info(f"Загрузка модели faster-whisper: {model_size} (device={self.device}, compute_type={self.compute_type})")
                 
@@ -53,66 +94,106 @@ class FasterWhisperService(SpeechRecognitionService):
                 
                 # Для CPU оптимизируем использование потоков
                 if self.device == 'cpu':
-                    import os
                     # Используем все доступные CPU ядра, но не более 4 для оптимального баланса
-                    cpu_count = min(os.cpu_count() or 2, 4)
+                    cpu_count = cpu_threads or min(get_task_cpu_quota(), 4)
                     model_kwargs['cpu_threads'] = cpu_count
-                    model_kwargs['num_workers'] = 1  # Для CPU лучше использовать 1 worker
+                    model_kwargs['num_workers'] = num_workers  # >1 только для параллельного режима
                     logger.info(f"Использование {cpu_count} CPU потоков для обработки")
                 
                 model = WhisperModel(**model_kwargs)
-                self._models[cache_key] = model
                 logger.info(f"Модель {model_size} успешно загружена")
+                return model
             except Exception as e:
                 logger.error(f"Ошибка при загрузке модели {model_size}: {e}")
                 raise Exception(f"Ошибка при загрузке модели faster-whisper: {e}")
         
-        return self._models[cache_key]
+        return registry.get(cache_key, loader, engine='faster-whisper')
+    
+    def _get_transcribe_params(self, language: str) -> Dict:
+        """Build decoding parameters shared by sequential and chunked modes"""
+        # faster-whisper использует другой API
+        # Оптимизация для CPU: уменьшаем beam_size для ускорения
+        # beam_size=1 (greedy decoding) - самый быстрый, но может быть немного менее точным
+        # beam_size=2-3 - баланс между скоростью и качеством
+        beam_size = 1 if self.device == 'cpu' else 5
+        
+        # Параметры для transcribe
+        transcribe_params = {
+            'language': language if language else None,
+            'beam_size': beam_size,
+            'vad_filter': True,  # Фильтр голосовой активности - ускоряет обработку, пропуская тишину
+        }
+        
+        # Для CPU также используем дополнительные параметры оптимизации
+        if self.device == 'cpu':
+            transcribe_params['vad_parameters'] = dict(
+                min_silence_duration_ms=100,  # Минимальная длительность тишины
+                threshold=0.5,  # Порог для определения тишины
+            )
+            # Дополнительные параметры для ускорения
+            transcribe_params['patience'] = 1.0  # По умолчанию 1.0
+            transcribe_params['condition_on_previous_text'] = False  # Отключаем условие на предыдущий текст - ускоряет обработку
+            transcribe_params['compression_ratio_threshold'] = 2.4  # Порог компрессии для определения повторов
+            transcribe_params['log_prob_threshold'] = -1.0  # Порог вероятности для отсеивания некачественных результатов
+        
+        return transcribe_params
     
-    def transcribe_file(self, audio_path: Path, model_size: str = 'base', language: str = 'ru') -> Dict:
-        """Transcribe audio file"""
+    def transcribe_file(self, audio_path: Path, model_size: str = 'base', language: str = 'ru',
+                        progress_callback: Optional[Callable] = None, checkpoint=None, audio=None) -> Dict:
+        """
+        Transcribe audio file
+        
+        checkpoint: см. SpeechRecognitionService.transcribe_file - декодирование
+        продолжается с checkpoint.resume_from, возвращаются только новые сегменты.
+        audio: декодированный файл из кеша PCM - PyAV не вызывается, срезы без копирования.
+        """
         try:
-            model = self.load_model(model_size)
+            resume_from = checkpoint.resume_from if checkpoint else 0.0
+            if audio is None and (self._should_use_chunked_mode() or resume_from):
+                with spans.span('convert'):
+                    audio = decode_audio(str(audio_path), sampling_rate=SAMPLE_RATE)
+            if audio is not None:
+                if resume_from:
+                    # Уже распознанное начало отбрасываем, метки сдвигаем обратно на resume_from
+                    audio = audio[int(resume_from * SAMPLE_RATE):]
+                    logger.info(f"Продолжение распознавания {audio_path} с {resume_from:.1f} сек")
+                duration = len(audio) / SAMPLE_RATE
+                min_duration = getattr(settings, 'FASTER_WHISPER_CHUNKED_MIN_DURATION', 600)
+                if self._should_use_chunked_mode() and duration >= min_duration:
+                    return self._transcribe_chunked(
+                        audio, model_size, language, progress_callback, checkpoint, resume_from
+                    )
+                # Короткий файл: уже декодирован, передаем массив напрямую
+                audio_input = audio
+            else:
+                audio_input = str(audio_path)
+            
+            with spans.span('model_load'):
+                model = self.load_model(model_size)
             
             logger.info(f"Начало распознавания (faster-whisper): {audio_path}, модель: {model_size}")
             
-            # faster-whisper использует другой API
-            # Оптимизация для CPU: уменьшаем beam_size для ускорения
-            # beam_size=1 (greedy decoding) - самый быстрый, но может быть немного менее точным
-            # beam_size=2-3 - баланс между скоростью и качеством
-            beam_size = 1 if self.device == 'cpu' else 5
-            
-            # Параметры для transcribe
-            transcribe_params = {
-                'language': language if language else None,
-                'beam_size': beam_size,
-                'vad_filter': True,  # Фильтр голосовой активности - ускоряет обработку, пропуская тишину
-            }
+            transcribe_params = self._get_transcribe_params(language)
+            segments, info = model.transcribe(audio_input, **transcribe_params)
+            total_duration = resume_from + info.duration
+            if progress_callback:
+                progress_callback(resume_from, total_duration)
             
-            # Для CPU также используем дополнительные параметры оптимизации
-            if self.device == 'cpu':
-                transcribe_params['vad_parameters'] = dict(
-                    min_silence_duration_ms=100,  # Минимальная длительность тишины
-                    threshold=0.5,  # Порог для определения тишины
-                )
-                # Дополнительные параметры для ускорения
-                transcribe_params['patience'] = 1.0  # По умолчанию 1.0
-                transcribe_params['condition_on_previous_text'] = False  # Отключаем условие на предыдущий текст - ускоряет обработку
-                transcribe_params['compression_ratio_threshold'] = 2.4  # Порог компрессии для определения повторов
-                transcribe_params['log_prob_threshold'] = -1.0  # Порог вероятности для отсеивания некачественных результатов
-            
-            segments, info = model.transcribe(str(audio_path), **transcribe_params)
-            
-            # Собрать текст из сегментов
+            # Собрать текст из сегментов (декодирование ленивое - прогресс по концу сегмента)
             text_parts = []
             segments_list = []
             for segment in segments:
                 text_parts.append(segment.text)
-                segments_list.append({
-                    'start': segment.start,
-                    'end': segment.end,
+                segment_dict = {
+                    'start': segment.start + resume_from,
+                    'end': segment.end + resume_from,
                     'text': segment.text
-                })
+                }
+                segments_list.append(segment_dict)
+                if checkpoint:
+                    checkpoint.commit([segment_dict], segment_dict['end'])
+                if progress_callback:
+                    progress_callback(segment_dict['end'], total_duration)
             
             text = " ".join(text_parts).strip()
             language_detected = info.language if hasattr(info, 'language') else language
@@ -128,6 +209,245 @@ class FasterWhisperService(SpeechRecognitionService):
             logger.error(f"Ошибка при распознавании: {e}")
             raise Exception(f"Ошибка при распознавании (faster-whisper): {e}")
     
+    def _should_use_chunked_mode(self) -> bool:
+        """Chunked mode makes sense only on CPU with more than one available core"""
+        if not getattr(settings, 'FASTER_WHISPER_CHUNKED', True):
+            return False
+        return self.device == 'cpu' and get_task_cpu_quota() > 1
+    
+    def _plan_chunks(self, audio, target_seconds: Optional[float] = None) -> List[Tuple[int, int]]:
+        """
+        Split audio into chunks at VAD silence boundaries
+        
+        Returns:
+            List of (start_sample, end_sample). Чанки режутся посередине паузы между
+            фрагментами речи; если фрагмент речи длиннее максимального размера чанка,
+            он режется принудительно с перекрытием CHUNK_OVERLAP_SECONDS.
+        """
+        total = len(audio)
+        if target_seconds is None:
+            target_seconds = getattr(settings, 'FASTER_WHISPER_CHUNK_SECONDS', 300)
+        target = int(target_seconds * SAMPLE_RATE)
+        overlap = int(CHUNK_OVERLAP_SECONDS * SAMPLE_RATE)
+        
+        speech = get_speech_timestamps(audio, min_silence_duration_ms=500)
+        if not speech:
+            return [(0, total)]
+        
+        chunks = []
+        chunk_start = 0
+        for current, following in zip(speech, speech[1:] + [None]):
+            # Слишком длинная непрерывная речь - режем с перекрытием
+            while current['end'] - chunk_start > target + overlap:
+                cut = chunk_start + target
+                chunks.append((chunk_start, min(total, cut + overlap)))
+                chunk_start = cut
+            
+            if following is None:
+                break
+            
+            if following['end'] - chunk_start > target:
+                # Граница - середина паузы между фрагментами речи
+                cut = (current['end'] + following['start']) // 2
+                if cut > chunk_start:
+                    chunks.append((chunk_start, cut))
+                    chunk_start = cut
+        
+        chunks.append((chunk_start, total))
+        return chunks
+    
+    def _transcribe_chunked(self, audio, model_size: str, language: str,
+                            progress_callback: Optional[Callable] = None,
+                            checkpoint=None, time_offset: float = 0.0) -> Dict:
+        """
+        Transcribe chunks concurrently and stitch segments back together
+        
+        time_offset - позиция audio в исходном файле (продолжение с чекпоинта).
+        Чекпоинт фиксируется по порядку чанков: чанк попадает в него, когда
+        распознаны все предыдущие.
+        """
+        # Квота CPU одной задачи (с учетом --concurrency воркера), а не всего контейнера
+        cpu_quota = get_task_cpu_quota()
+        # Части не длиннее 1/quota записи - работа есть у каждого потока
+        target_seconds = min(
+            getattr(settings, 'FASTER_WHISPER_CHUNK_SECONDS', 300),
+            max(WINDOW_SECONDS, len(audio) / SAMPLE_RATE / cpu_quota),
+        )
+        chunks = self._plan_chunks(audio, target_seconds)
+        workers = max(1, min(len(chunks), cpu_quota))
+        
+        # Один экземпляр модели на процесс с num_workers = квота CTranslate2 (параметры
+        # не зависят от файла, поэтому экземпляр переиспользуется): transcribe() отпускает
+        # GIL, потоки работают параллельно, а веса модели не дублируются в памяти
+        with spans.span('model_load'):
+            model = self.load_model(model_size, cpu_threads=1, num_workers=cpu_quota)
+        transcribe_params = self._get_transcribe_params(language)
+        
+        logger.info(
+            f"Начало распознавания (faster-whisper, по частям): {len(audio) / SAMPLE_RATE:.1f} сек, "
+            f"модель: {model_size}, частей: {len(chunks)}, потоков: {workers}"
+        )
+        
+        total_duration = time_offset + len(audio) / SAMPLE_RATE
+        chunk_progress = [0.0] * len(chunks)
+        progress_lock = threading.Lock()
+        if progress_callback:
+            progress_callback(time_offset, total_duration)
+        
+        def transcribe_chunk(index, bounds):
+            start, end = bounds
+            offset = time_offset + start / SAMPLE_RATE
+            segments, info = model.transcribe(audio[start:end], **transcribe_params)
+            # Генератор сегментов нужно исчерпать внутри потока - декодирование ленивое
+            chunk_segments = []
+            for segment in segments:
+                chunk_segments.append({
+                    'start': segment.start + offset,
+                    'end': segment.end + offset,
+                    'text': segment.text,
+                })
+                if progress_callback:
+                    with progress_lock:
+                        chunk_progress[index] = segment.end
+                        progress_callback(time_offset + sum(chunk_progress), total_duration)
+            return chunk_segments, getattr(info, 'language', None)
+        
+        segments_list = []
+        results = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(transcribe_chunk, index, bounds) for index, bounds in enumerate(chunks)]
+            # Результаты забираем по порядку чанков - так склейка и чекпоинт идут последовательно
+            for (start, end), future in zip(chunks, futures):
+                chunk_segments, chunk_language = future.result()
+                results.append((chunk_segments, chunk_language))
+                last_end = segments_list[-1]['end'] if segments_list else 0.0
+                new_segments = [
+                    segment for segment in chunk_segments
+                    # Сегменты из зоны перекрытия уже есть в предыдущем чанке
+                    if (segment['start'] + segment['end']) / 2 >= last_end
+                ]
+                segments_list.extend(new_segments)
+                if checkpoint:
+                    # Перекрытие следующего чанка начинается раньше end - фиксируем по последнему сегменту
+                    committed = segments_list[-1]['end'] if segments_list else time_offset
+                    if end >= len(audio):
+                        committed = total_duration
+                    checkpoint.commit(new_segments, committed)
+        
+        text = " ".join(segment['text'] for segment in segments_list).strip()
+        language_detected = next((lang for _, lang in results if lang), language)
+        
+        logger.info(f"Распознавание завершено: {len(text)} символов")
+        
+        return {
+            'text': text,
+            'language': language_detected,
+            'segments': segments_list,
+        }
+    
+    def transcribe_batch(self, audio_paths: List[Path], model_size: str = 'base', language: str = 'ru',
+                         batch_size: int = 8, progress_callback: Optional[Callable] = None,
+                         audios: Optional[List] = None) -> List[Dict]:
+        """
+        Transcribe several files in shared batched encoder/decoder calls
+        
+        Окна по 30 секунд (границы по VAD) всех файлов собираются в один список
+        и декодируются пакетами через BatchedInferencePipeline, поэтому короткие
+        записи разных пользователей заполняют один пакет. Все файлы должны иметь
+        одну модель и один язык. audios - уже декодированные файлы (кеш PCM),
+        None в списке - файл декодируется здесь.
+        
+        Returns:
+            Список результатов в том же порядке и формате, что transcribe_file()
+        """
+        if not BATCHED_INFERENCE_AVAILABLE:
+            raise Exception("Пакетный режим требует faster-whisper>=1.1")
+        
+        try:
+            with spans.span('model_load'):
+                model = self.load_model(model_size)
+            pipeline = BatchedInferencePipeline(model=model)
+            vad_options = VadOptions(max_speech_duration_s=WINDOW_SECONDS, min_silence_duration_ms=160)
+            
+            # Склеиваем аудио в одну временную шкалу; окна не пересекают границы файлов
+            timeline = []
+            clip_timestamps = []
+            bounds = []
+            offset = 0
+            for index, audio_path in enumerate(audio_paths):
+                audio = audios[index] if audios else None
+                if audio is None:
+                    with spans.span('convert'):
+                        audio = decode_audio(str(audio_path), sampling_rate=SAMPLE_RATE)
+                windows = merge_segments(get_speech_timestamps(audio, vad_options), vad_options)
+                for window in windows:
+                    shifted = dict(window, start=window['start'] + offset, end=window['end'] + offset)
+                    if 'segments' in window:
+                        shifted['segments'] = [(start + offset, end + offset) for start, end in window['segments']]
+                    clip_timestamps.append(shifted)
+                bounds.append((offset / SAMPLE_RATE, (offset + len(audio)) / SAMPLE_RATE))
+                timeline.append(audio)
+                offset += len(audio)
+            
+            results = [{'text': '', 'language': language, 'segments': []} for _ in audio_paths]
+            if not clip_timestamps:
+                return results
+            
+            logger.info(
+                f"Начало пакетного распознавания (faster-whisper): файлов: {len(audio_paths)}, "
+                f"окон: {len(clip_timestamps)}, batch_size: {batch_size}, модель: {model_size}"
+            )
+            
+            params = self._get_transcribe_params(language)
+            segments, info = pipeline.transcribe(
+                np.concatenate(timeline),
+                language=params['language'],
+                beam_size=params['beam_size'],
+                vad_filter=False,
+                clip_timestamps=clip_timestamps,
+                batch_size=batch_size,
+            )
+            del timeline
+            if progress_callback:
+                progress_callback(0.0, offset / SAMPLE_RATE)
+            
+            index = 0
+            for segment in segments:
+                if progress_callback:
+                    # Прогресс общий для всего пакета - по склеенной временной шкале
+                    progress_callback(segment.end, offset / SAMPLE_RATE)
+                # Сегменты идут по возрастанию времени - находим файл по смещению
+                while index < len(bounds) - 1 and segment.start >= bounds[index][1]:
+                    index += 1
+                file_start = bounds[index][0]
+                results[index]['segments'].append({
+                    'start': segment.start - file_start,
+                    'end': min(segment.end, bounds[index][1]) - file_start,
+                    'text': segment.text,
+                })
+            
+            language_detected = getattr(info, 'language', None) or language
+            for result in results:
+                result['text'] = " ".join(segment['text'] for segment in result['segments']).strip()
+                result['language'] = language_detected
+            
+            logger.info(f"Пакетное распознавание завершено: {sum(len(r['text']) for r in results)} символов")
+            return results
+        except Exception as e:
+            logger.error(f"Ошибка при пакетном распознавании: {e}")
+            raise Exception(f"Ошибка при пакетном распознавании (faster-whisper): {e}")
+    
+    def get_cache_signature(self) -> Dict:
+        """Get decoding parameters that affect the result"""
+        signature = self._get_transcribe_params(None)
+        signature.pop('language', None)
+        signature.update({
+            'service': self.get_service_name(),
+            'device': self.device,
+            'compute_type': self.compute_type,
+        })
+        return signature
+    
     def get_available_models(self) -> List[str]:
         """Get list of available Whisper models"""
         return ['tiny', 'tiny.en', 'base', 'base.en', 'small', 'small.en', 'medium', 'medium.en', 'large-v1', 'large-v2', 'large-v3', 'large']
@@ -0,0 +1,282 @@
+"""Process-wide registry of loaded recognition models with memory-budgeted LRU eviction"""
+import gc
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+
+from recordings import metrics
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+def get_rss_bytes() -> int:
+    """Resident set size of the current process (0 if /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def get_peak_rss_bytes() -> int:
+    """Peak resident set size of the current process, VmHWM (0 if /proc is unavailable)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def reset_peak_rss() -> bool:
+    """Reset VmHWM to the current RSS (Linux 4.0+), False если ядро не позволяет"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def get_path_size(path) -> int:
+    """Total size of model files on disk, используется как оценка, если RSS не изменился"""
+    path = Path(path)
+    try:
+        if path.is_file():
+            return path.stat().st_size
+        return sum(p.stat().st_size for p in path.rglob('*') if p.is_file())
+    except OSError:
+        return 0
+
+
+class ModelRegistry:
+    """
+    LRU cache of loaded models shared by all recognition engines
+
+    Ключ включает движок ('faster-whisper:base_cpu_int8', 'vosk:<path>'),
+    размер модели определяется по приросту RSS процесса при загрузке.
+    Когда суммарный размер превышает бюджет, вытесняются давно не
+    использованные модели (текущую модель не вытесняем никогда).
+    """
+
+    def __init__(self, budget_bytes: int = 0):
+        self.budget_bytes = budget_bytes  # 0 = без ограничения
+        self._entries = OrderedDict()  # key -> {'model', 'engine', 'size', ...}
+        self._known_sizes = {}  # key -> size, сохраняется после вытеснения
+        self._lock = threading.RLock()
+        self._key_locks = {}  # key -> Lock загрузки этого ключа
+        self.stats = {
+            'hits': 0,
+            'loads': 0,
+            'load_errors': 0,
+            'evictions': 0,
+            'load_seconds_total': 0.0,
+        }
+
+    def get(self, key: str, loader: Callable, engine: str = '', size_hint: int = 0):
+        """
+        Return cached model or load it with loader()
+
+        Args:
+            key: Unique model key (включая параметры, влияющие на загрузку)
+            loader: Callable without arguments that loads the model
+            engine: Engine name for stats and logs
+            size_hint: Expected size in bytes (например, размер файлов модели)
+        """
+        with self._lock:
+            model = self._get_loaded(key)
+            if model is not None:
+                return model
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Загрузка идет без общей блокировки: модели, которые уже в памяти, и загрузка
+        # других ключей не ждут многоминутную загрузку; ждут только вызовы того же ключа
+        with key_lock:
+            with self._lock:
+                model = self._get_loaded(key)
+                if model is not None:
+                    return model
+                # Освобождаем место заранее, если размер модели известен по прошлой загрузке
+                expected = self._known_sizes.get(key, size_hint)
+                self._evict_to_fit(expected)
+
+            rss_before = get_rss_bytes()
+            started = time.perf_counter()
+            try:
+                model = loader()
+            except Exception:
+                with self._lock:
+                    self.stats['load_errors'] += 1
+                metrics.MODEL_REGISTRY_EVENTS.labels(engine=engine, event='load_error').inc()
+                raise
+            load_seconds = time.perf_counter() - started
+            # При одновременной загрузке другого ключа прирост RSS включает и его - оценка сверху
+            size = max(get_rss_bytes() - rss_before, size_hint, 0)
+
+            with self._lock:
+                self._entries[key] = {
+                    'model': model,
+                    'engine': engine,
+                    'size': size,
+                    'load_seconds': load_seconds,
+                    'loaded_at': time.time(),
+                    'last_used': time.time(),
+                }
+                self._known_sizes[key] = size
+                self.stats['loads'] += 1
+                self.stats['load_seconds_total'] += load_seconds
+                metrics.MODEL_REGISTRY_EVENTS.labels(engine=engine, event='load').inc()
+                metrics.MODEL_LOAD_SECONDS.labels(engine=engine).observe(load_seconds)
+                logger.info(
+                    f"Модель {key} загружена за {load_seconds:.1f} сек, "
+                    f"~{size / MB:.0f} MB (всего в памяти {self.resident_bytes / MB:.0f} MB)"
+                )
+
+                self._evict_to_fit(0, keep=key)
+                metrics.MODEL_RESIDENT_BYTES.set(self.resident_bytes)
+            return model
+
+    def _get_loaded(self, key: str):
+        """Cached model marked as recently used, None если не загружена (под self._lock)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        entry['last_used'] = time.time()
+        self.stats['hits'] += 1
+        metrics.MODEL_REGISTRY_EVENTS.labels(engine=entry['engine'], event='hit').inc()
+        return entry['model']
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(entry['size'] for entry in self._entries.values())
+
+    def _evict_to_fit(self, incoming: int, keep: Optional[str] = None):
+        """Evict least recently used models until incoming fits into the budget"""
+        if not self.budget_bytes:
+            return
+        evicted = False
+        for key in list(self._entries):
+            if self.resident_bytes + incoming <= self.budget_bytes:
+                break
+            if key == keep:
+                continue
+            self._evict(key)
+            evicted = True
+        if evicted:
+            # Возвращаем память аллокатору сразу, а не при следующем цикле GC
+            gc.collect()
+
+    def _evict(self, key: str):
+        entry = self._entries.pop(key)
+        self.stats['evictions'] += 1
+        metrics.MODEL_REGISTRY_EVENTS.labels(engine=entry['engine'], event='evict').inc()
+        metrics.MODEL_RESIDENT_BYTES.set(self.resident_bytes)
+        logger.info(f"Модель {key} вытеснена из памяти (~{entry['size'] / MB:.0f} MB)")
+
+    def evict(self, key: str) -> bool:
+        """Drop model from the registry, True if it was loaded"""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._evict(key)
+        gc.collect()
+        return True
+
+    def evict_variants(self, base_key: str, keep: Optional[str] = None) -> int:
+        """Drop models loaded under base_key or base_key_<параметры> except keep, returns count"""
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if key != keep and (key == base_key or key.startswith(f'{base_key}_'))
+            ]
+            for key in keys:
+                self._evict(key)
+        if keys:
+            gc.collect()
+        return len(keys)
+
+    def clear(self):
+        """Drop all models"""
+        with self._lock:
+            for key in list(self._entries):
+                self._evict(key)
+        gc.collect()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def get_stats(self) -> Dict:
+        """Counters and currently resident models (для логов и мониторинга)"""
+        with self._lock:
+            return {
+                **self.stats,
+                'budget_mb': round(self.budget_bytes / MB, 1),
+                'resident_mb': round(self.resident_bytes / MB, 1),
+                'models': [
+                    {
+                        'key': key,
+                        'engine': entry['engine'],
+                        'size_mb': round(entry['size'] / MB, 1),
+                        'load_seconds': round(entry['load_seconds'], 2),
+                        'idle_seconds': round(time.time() - entry['last_used'], 1),
+                    }
+                    for key, entry in self._entries.items()
+                ],
+            }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Get process-wide model registry"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            budget_mb = getattr(settings, 'MODEL_REGISTRY_MEMORY_BUDGET_MB', 0)
+            _registry = ModelRegistry(budget_bytes=int(budget_mb * MB))
+        return _registry
+
+
+def preload_models(specs=None):
+    """
+    Load configured hot set of models
+
+    Args:
+        specs: Список 'движок:модель' (по умолчанию MODEL_REGISTRY_PRELOAD),
+               например ['faster-whisper:base', 'vosk:small-ru-0.22']
+    """
+    from .service_factory import SpeechRecognitionServiceFactory
+
+    if specs is None:
+        specs = getattr(settings, 'MODEL_REGISTRY_PRELOAD', [])
+
+    for spec in specs:
+        engine, _, model_name = spec.partition(':')
+        try:
+            if engine == 'vosk':
+                from .vosk_service import VoskService
+                service = VoskService(model_id=model_name) if model_name else VoskService()
+                service.load_model()
+            else:
+                service = SpeechRecognitionServiceFactory.get_service(engine)
+                service.load_model(model_name or getattr(settings, 'DEFAULT_WHISPER_MODEL', 'base'))
+        except Exception as e:
+            # Ошибка предзагрузки не должна мешать запуску воркера
+            logger.error(f"Не удалось предзагрузить модель {spec}: {e}")
+
+    if specs:
+        stats = get_model_registry().get_stats()
+        logger.info(f"Предзагружено моделей: {len(stats['models'])}, {stats['resident_mb']} MB")
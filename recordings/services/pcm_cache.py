@@ -0,0 +1,168 @@
+"""
+Decoded audio cache shared by all recognition engines
+
+Файл записи один раз декодируется ffmpeg в 16 kHz моно float32 и хранится
+сырым массивом в PCM_CACHE_DIR под именем по SHA-256 содержимого. Движки
+получают np.memmap этого файла: openai-whisper и faster-whisper читают его
+без копирования, Vosk - порциями, переводя в s16le. Повторное распознавание
+другой моделью или движком не декодирует файл заново. Старые файлы
+удаляются по времени последнего использования, когда кеш превышает
+PCM_CACHE_MAX_SIZE_MB.
+"""
+import hashlib
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from django.conf import settings
+
+from recordings import metrics
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+DTYPE = np.float32
+SUFFIX = '.f32'
+# Недописанный временный файл старше этого возраста - остаток упавшего процесса
+STALE_TEMP_SECONDS = 3600
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'PCM_CACHE_ENABLED', True)
+
+
+def get_cache_dir() -> Path:
+    return Path(getattr(settings, 'PCM_CACHE_DIR', Path(settings.BASE_DIR) / 'pcm_cache'))
+
+
+def _fallback_key(audio_path: Path) -> str:
+    # Без хеша содержимого ключ - путь, размер и время изменения файла
+    stat = audio_path.stat()
+    payload = f'{audio_path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}'
+    return 'path-' + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def decode(audio_path: Path, target: Path):
+    """Decode audio file into raw 16 kHz mono float32 file target"""
+    cmd = [
+        'ffmpeg', '-nostdin', '-loglevel', 'error', '-threads', '0',
+        '-i', str(audio_path),
+        '-ac', '1',
+        '-ar', str(SAMPLE_RATE),
+        '-f', 'f32le',
+        '-y', str(target),
+    ]
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        raise Exception("ffmpeg не найден. Установите ffmpeg для работы с аудио")
+    except subprocess.CalledProcessError as e:
+        raise Exception(f"Ошибка декодирования {audio_path}: {e.stderr.decode('utf-8', 'replace').strip()}")
+
+
+def open_pcm(path: Path) -> np.ndarray:
+    """Map cached PCM file read-only (страницы читаются с диска по мере обращения)"""
+    if path.stat().st_size == 0:
+        return np.zeros(0, dtype=DTYPE)
+    return np.memmap(path, dtype=DTYPE, mode='r')
+
+
+def decode_temporary(audio_path: Path) -> np.ndarray:
+    """
+    Decode audio file into a temporary PCM file outside the cache
+
+    Для движков, которым нужен массив (параллельный Vosk), когда кеш выключен.
+    Файл удаляется сразу после отображения в память - страницы остаются
+    доступны, пока жив массив, а место на диске освобождается вместе с ним.
+    """
+    fd, temp_name = tempfile.mkstemp(dir=getattr(settings, 'FILE_UPLOAD_TEMP_DIR', None), suffix=SUFFIX)
+    os.close(fd)
+    try:
+        decode(audio_path, Path(temp_name))
+        return open_pcm(Path(temp_name))
+    finally:
+        Path(temp_name).unlink(missing_ok=True)
+
+
+def get_pcm(audio_path: Path, audio_sha256: Optional[str] = None) -> Optional[np.ndarray]:
+    """
+    Decoded PCM of the audio file: из кеша или после декодирования
+
+    Returns:
+        Массив float32 16 kHz моно или None, если кеш выключен или декодирование
+        не удалось - тогда движок декодирует файл сам, как раньше.
+    """
+    if not is_enabled():
+        return None
+    try:
+        cache_dir = get_cache_dir()
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        key = audio_sha256 or _fallback_key(audio_path)
+        path = cache_dir / f'{key}{SUFFIX}'
+        if path.exists():
+            # Время изменения - метка LRU для вытеснения
+            os.utime(path)
+            logger.debug(f"PCM {audio_path.name} взят из кеша")
+            metrics.CACHE_REQUESTS.labels(cache='pcm', result='hit').inc()
+            return open_pcm(path)
+
+        metrics.CACHE_REQUESTS.labels(cache='pcm', result='miss').inc()
+        started = time.perf_counter()
+        fd, temp_name = tempfile.mkstemp(dir=cache_dir, prefix=f'.{key}.', suffix='.tmp')
+        os.close(fd)
+        try:
+            decode(audio_path, Path(temp_name))
+            # Атомарная замена: параллельный воркер увидит либо весь файл, либо никакого
+            os.replace(temp_name, path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+        logger.info(
+            f"PCM {audio_path.name} декодирован за {time.perf_counter() - started:.1f} сек, "
+            f"{path.stat().st_size / (1024 * 1024):.1f} MB"
+        )
+        evict()
+        return open_pcm(path)
+    except Exception as e:
+        metrics.CACHE_REQUESTS.labels(cache='pcm', result='error').inc()
+        logger.warning(f"Кеш PCM недоступен для {audio_path}, движок декодирует файл сам: {e}")
+        return None
+
+
+def evict(max_size_mb: Optional[int] = None) -> int:
+    """Delete least recently used PCM files above the size limit, возвращает число удаленных"""
+    if max_size_mb is None:
+        max_size_mb = getattr(settings, 'PCM_CACHE_MAX_SIZE_MB', 5120)
+    cache_dir = get_cache_dir()
+    now = time.time()
+    entries = []
+    for path in cache_dir.iterdir():
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if path.name.endswith('.tmp'):
+            if now - stat.st_mtime > STALE_TEMP_SECONDS:
+                path.unlink(missing_ok=True)
+            continue
+        if path.suffix == SUFFIX:
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    limit = max_size_mb * 1024 * 1024
+    removed = 0
+    # Открытые memmap удаленного файла остаются рабочими до закрытия
+    for _, size, path in sorted(entries):
+        if total <= limit:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    if removed:
+        logger.info(f"Кеш PCM: удалено {removed} файлов, занято {total / (1024 * 1024):.0f} MB")
+    return removed
@@ -1,14 +1,18 @@
 """Base interface for speech recognition services"""
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
 
 
 class SpeechRecognitionService(ABC):
     """Abstract base class for speech recognition services"""
     
+    # False - checkpoint в transcribe_file игнорируется, продолжить с середины нельзя
+    supports_checkpoints = True
+    
     @abstractmethod
-    def transcribe_file(self, audio_path: Path, model_size: str = 'base', language: str = 'ru') -> Dict:
+    def transcribe_file(self, audio_path: Path, model_size: str = 'base', language: str = 'ru',
+                        progress_callback: Optional[Callable] = None, checkpoint=None, audio=None) -> Dict:
         """
         Transcribe audio file
         
@@ -16,6 +20,15 @@ class SpeechRecognitionService(ABC):
             audio_path: Path to audio file
             model_size: Model size/name
             language: Language code (default: 'ru')
+            progress_callback: Called as progress_callback(processed_seconds[, total_seconds]),
+                первый вызов с 0 - после загрузки модели, перед декодированием
+            checkpoint: Optional recordings.checkpoints.Checkpointer - сервис продолжает
+                с checkpoint.resume_from, вызывает checkpoint.commit(segments, processed_seconds)
+                для окончательно распознанного аудио и возвращает только новые сегменты.
+                Сервисы без поддержки продолжения игнорируют его (resume_from должен быть 0)
+            audio: Optional декодированный файл - np.ndarray float32 16 kHz моно
+                (recordings.services.pcm_cache). Передается без копирования вместо
+                декодирования audio_path; путь тогда нужен только для журнала
         
         Returns:
             Dictionary with keys:
@@ -34,4 +47,13 @@ class SpeechRecognitionService(ABC):
     def get_service_name(self) -> str:
         """Get human-readable service name"""
         pass
+    
+    def get_cache_signature(self) -> Dict:
+        """
+        Get decoding parameters that affect the result (часть ключа кеша распознавания)
+        
+        Сервисы с настраиваемым декодированием должны переопределить метод,
+        иначе смена параметров будет отдавать устаревшие результаты из кеша.
+        """
+        return {'service': self.get_service_name()}
 
@@ -0,0 +1,75 @@
+"""Helpers for detecting resources available to the worker process"""
+import os
+import math
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Число процессов пула Celery (--concurrency), между которыми делится квота CPU
+_worker_concurrency = 1
+
+
+def _read_cgroup_cpu_limit():
+    """Read CPU limit from cgroup (v2 или v1), None если лимит не задан"""
+    # cgroup v2: "max 100000" или "200000 100000"
+    cpu_max = Path('/sys/fs/cgroup/cpu.max')
+    try:
+        if cpu_max.exists():
+            quota, period = cpu_max.read_text().split()[:2]
+            if quota != 'max' and int(period) > 0:
+                return int(quota) / int(period)
+            return None
+    except (OSError, ValueError) as e:
+        logger.debug(f"Не удалось прочитать {cpu_max}: {e}")
+
+    # cgroup v1
+    quota_file = Path('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+    period_file = Path('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    try:
+        if quota_file.exists() and period_file.exists():
+            quota = int(quota_file.read_text().strip())
+            period = int(period_file.read_text().strip())
+            if quota > 0 and period > 0:
+                return quota / period
+    except (OSError, ValueError) as e:
+        logger.debug(f"Не удалось прочитать cgroup v1 квоту CPU: {e}")
+
+    return None
+
+
+def get_cpu_quota() -> int:
+    """
+    Get number of CPU cores the current process may actually use
+
+    Учитывает affinity процесса и квоту cgroup (лимит `cpus` в docker-compose),
+    поэтому внутри контейнера возвращает не количество ядер хоста, а доступную квоту.
+    """
+    try:
+        available = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        available = os.cpu_count() or 1
+
+    limit = _read_cgroup_cpu_limit()
+    if limit:
+        # Дробную квоту (например, 1.5) округляем вверх, но не меньше 1
+        available = min(available, max(1, math.ceil(limit)))
+
+    return max(1, available)
+
+
+def set_worker_concurrency(concurrency: int):
+    """Remember the Celery pool size (задается в главном процессе до fork дочерних)"""
+    global _worker_concurrency
+    _worker_concurrency = max(1, int(concurrency or 1))
+
+
+def get_task_cpu_quota() -> int:
+    """
+    Get number of CPU cores one task may use
+
+    Квота контейнера делится между процессами пула воркера: при --concurrency=2
+    и cpus 2.0 каждой задаче достается одно ядро, иначе пулы потоков двух задач
+    делили бы одни и те же ядра.
+    """
+    return max(1, get_cpu_quota() // _worker_concurrency)
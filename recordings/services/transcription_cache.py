@@ -0,0 +1,117 @@
+"""Content-addressed cache of transcription results"""
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'TRANSCRIPTION_CACHE_ENABLED', True)
+
+
+def build_cache_key(audio_sha256: str, recognition_service: str, model_name: str,
+                    language: str, signature: Optional[Dict] = None) -> str:
+    """
+    Build cache key from audio hash and everything that affects the result
+
+    signature - параметры декодирования сервиса (get_cache_signature()),
+    TRANSCRIPTION_CACHE_VERSION позволяет сбросить кеш целиком.
+    """
+    payload = json.dumps({
+        'audio': audio_sha256,
+        'service': recognition_service,
+        'model': model_name or '',
+        'language': language or '',
+        'signature': signature or {},
+        'version': getattr(settings, 'TRANSCRIPTION_CACHE_VERSION', 1),
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_cached_result(key: str) -> Optional[Dict]:
+    """Return cached result in transcribe_file() format or None"""
+    from ..models import TranscriptionCacheEntry
+
+    entry = (
+        TranscriptionCacheEntry.objects
+        .filter(key=key)
+        .values('text', 'segments', 'language')
+        .first()
+    )
+    if entry is None:
+        return None
+
+    # Обновляем LRU-метку одним UPDATE без загрузки строки
+    TranscriptionCacheEntry.objects.filter(key=key).update(
+        hits=F('hits') + 1,
+        last_used_at=timezone.now(),
+    )
+    return {
+        'text': entry['text'],
+        'language': entry['language'],
+        'segments': entry['segments'],
+    }
+
+
+def store_result(key: str, audio_sha256: str, recognition_service: str, model_name: str,
+                 language: str, result: Dict):
+    """Save result for future identical requests"""
+    from ..models import TranscriptionCacheEntry
+
+    try:
+        TranscriptionCacheEntry.objects.update_or_create(
+            key=key,
+            defaults={
+                'audio_sha256': audio_sha256,
+                'recognition_service': recognition_service,
+                'model_name': model_name or '',
+                'language': language or '',
+                'text': result.get('text') or '',
+                'segments': result.get('segments'),
+                'last_used_at': timezone.now(),
+            },
+        )
+    except Exception as e:
+        # Кеш - оптимизация, ошибка записи в него не должна ронять задачу
+        logger.warning(f"Не удалось сохранить результат в кеш распознавания: {e}")
+
+
+def evict(max_entries: Optional[int] = None, max_age_days: Optional[int] = None) -> int:
+    """
+    Evict least recently used entries
+
+    Удаляет записи, не использовавшиеся дольше max_age_days, затем самые
+    старые по last_used_at сверх max_entries. Возвращает число удаленных.
+    """
+    from ..models import TranscriptionCacheEntry
+
+    if max_entries is None:
+        max_entries = getattr(settings, 'TRANSCRIPTION_CACHE_MAX_ENTRIES', 10000)
+    if max_age_days is None:
+        max_age_days = getattr(settings, 'TRANSCRIPTION_CACHE_MAX_AGE_DAYS', 30)
+
+    deleted = 0
+    if max_age_days:
+        cutoff = timezone.now() - timedelta(days=max_age_days)
+        deleted += TranscriptionCacheEntry.objects.filter(last_used_at__lt=cutoff).delete()[0]
+
+    if max_entries:
+        boundary = (
+            TranscriptionCacheEntry.objects
+            .order_by('-last_used_at')
+            .values_list('last_used_at', flat=True)[max_entries:max_entries + 1]
+        )
+        boundary = list(boundary)
+        if boundary:
+            deleted += TranscriptionCacheEntry.objects.filter(last_used_at__lte=boundary[0]).delete()[0]
+
+    if deleted:
+        logger.info(f"Кеш распознавания: удалено {deleted} записей")
+    return deleted
@@ -1,30 +1,47 @@
 """Service for speech recognition using Vosk (offline, fast recognition)"""
 try:
     from vosk import Model, KaldiRecognizer
-    import json
     VOSK_AVAILABLE = True
 except ImportError:
     VOSK_AVAILABLE = False
     Model = None
     KaldiRecognizer = None
 
+from collections import deque
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from contextlib import closing
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import json
 import logging
 import wave
 import subprocess
+import threading
 import os
 
+import numpy as np
+from django.conf import settings
+
 from .speech_recognition_service import SpeechRecognitionService
+from .system_resources import get_task_cpu_quota
+from .model_registry import get_model_registry, get_path_size
+from . import pcm_cache
+from recordings import spans
 
 logger = logging.getLogger(__name__)
 
+SAMPLE_RATE = 16000
+PCM_CHUNK_BYTES = 8000  # 4000 фреймов s16 = 0.25 секунды
+# Поиск пауз для параллельного режима: энергия по кадрам 10 мс,
+# сглаженная окном 0.3 с (минимум сглаженной энергии - середина самой тихой паузы)
+ENERGY_FRAME = SAMPLE_RATE // 100
+ENERGY_SMOOTH_FRAMES = 30
+ENERGY_BLOCK_FRAMES = 60000  # кадров за проход (10 минут) - memmap кеша PCM читается порциями
+
 
 class VoskService(SpeechRecognitionService):
     """Service for speech recognition using Vosk (offline, fast)"""
     
-    _models = {}  # Cache для моделей
-    
     def __init__(self, model_id: str = None, model_path: str = None):
         """
         Initialize VoskService
@@ -85,7 +102,7 @@ class VoskService(SpeechRecognitionService):
     
     def load_model(self):
         """
-        Load Vosk model (with caching)
+        Load Vosk model (with caching in the shared model registry)
         
         Note: Vosk uses its own model files, not Whisper model sizes.
         Models must be downloaded separately from https://alphacephei.com/vosk/models
@@ -93,7 +110,7 @@ class VoskService(SpeechRecognitionService):
         # Используем model_id для кеширования если доступен
         cache_key = f"{self.model_id}_{self.model_path}" if self.model_id else f"{self.model_path}"
         
-        if cache_key not in self._models:
+        def loader():
             try:
                 if not os.path.exists(self.model_path):
                     raise FileNotFoundError(
@@ -103,183 +120,237 @@ class VoskService(SpeechRecognitionService):
                 
                 logger.info(f"Загрузка модели Vosk: {self.model_path}")
                 model = Model(self.model_path)
-                self._models[cache_key] = model
                 logger.info(f"Модель Vosk успешно загружена")
+                return model
             except Exception as e:
                 logger.error(f"Ошибка при загрузке модели Vosk: {e}")
                 raise Exception(f"Ошибка при загрузке модели Vosk: {e}")
         
-        return self._models[cache_key]
+        # Vosk загружает граф почти целиком в память - размер на диске хорошая оценка
+        return get_model_registry().get(
+            f"vosk:{cache_key}", loader, engine='vosk', size_hint=get_path_size(self.model_path)
+        )
+    
+    def create_recognizer(self, model=None, sample_rate: int = 16000):
+        """Create KaldiRecognizer configured for word timestamps"""
+        if model is None:
+            model = self.load_model()
+        rec = KaldiRecognizer(model, sample_rate)
+        
+        # Оптимизация для качества и скорости
+        rec.SetWords(True)  # Включить информацию о словах для временных меток
+        # SetPartialWords можно использовать для частичных результатов, но это замедляет обработку
+        # rec.SetPartialWords(True)  # Отключено для скорости
+        
+        # Попытка установить максимальное количество альтернатив для улучшения качества
+        # SetMaxAlternatives(0) = использовать лучший результат (быстрее, оптимальный баланс)
+        try:
+            if hasattr(rec, 'SetMaxAlternatives'):
+                rec.SetMaxAlternatives(0)  # 0 = лучший результат, быстрее
+                logger.debug("SetMaxAlternatives установлен для оптимизации")
+        except Exception:
+            pass  # Метод может быть недоступен в некоторых версиях Vosk
+        
+        return rec
+    
+    def _is_native_wav(self, audio_path: Path) -> bool:
+        """Check whether file is already 16 kHz mono 16-bit WAV (можно читать без ffmpeg)"""
+        if audio_path.suffix.lower() != '.wav':
+            return False
+        try:
+            with wave.open(str(audio_path), "rb") as wf:
+                return (
+                    wf.getframerate() == SAMPLE_RATE
+                    and wf.getnchannels() == 1
+                    and wf.getsampwidth() == 2
+                )
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать WAV файл, будет использован ffmpeg: {e}")
+            return False
     
-    def _convert_to_wav(self, audio_path: Path, sample_rate: int = 16000) -> Path:
+    def _iter_pcm(self, audio_path: Path, chunk_bytes: int = PCM_CHUNK_BYTES,
+                  start_seconds: float = 0.0) -> Iterator[bytes]:
         """
-        Convert audio file to WAV format with 16kHz sample rate
-        Оптимизировано для качества и скорости распознавания Vosk
+        Yield raw s16le 16 kHz mono PCM chunks of the audio file starting at start_seconds
+        
+        ffmpeg пишет PCM в pipe, распознаватель читает его порциями по chunk_bytes,
+        поэтому распознавание начинается сразу, пока ffmpeg еще декодирует файл.
+        Промежуточный WAV на диск не пишется. Если задачу прервут, ffmpeg
+        завершится (kill в finally или SIGPIPE при закрытии pipe) - мусора не остается.
         """
-        output_path = audio_path.parent / f"{audio_path.stem}_converted.wav"
+        if self._is_native_wav(audio_path):
+            with wave.open(str(audio_path), "rb") as wf:
+                if start_seconds:
+                    wf.setpos(min(wf.getnframes(), int(start_seconds * SAMPLE_RATE)))
+                frames = chunk_bytes // 2
+                while True:
+                    data = wf.readframes(frames)
+                    if not data:
+                        return
+                    yield data
+        
+        # Используем ffmpeg для декодирования с оптимизацией для распознавания речи
+        # -ar 16000: частота дискретизации 16kHz (оптимально для Vosk)
+        # -ac 1: моно (стерео не нужно для распознавания речи)
+        # -f s16le: сырой 16-bit PCM в stdout (без заголовка WAV)
+        # -af 'highpass=f=80,lowpass=f=8000,volume=1.2': фильтры для улучшения качества речи
+        #    highpass убирает низкочастотные шумы (< 80Hz)
+        #    lowpass убирает высокочастотные шумы (> 8kHz, не важны для речи)
+        #    volume=1.2: легкое увеличение громкости для лучшего распознавания
+        cmd = [
+            'ffmpeg', '-nostdin', '-loglevel', 'error',
+            # -ss перед -i: быстрый переход к позиции продолжения без декодирования начала
+            '-ss', f'{start_seconds:.3f}',
+            '-i', str(audio_path),
+            '-ar', str(SAMPLE_RATE),
+            '-ac', '1',  # Моно
+            '-af', 'highpass=f=80,lowpass=f=8000,volume=1.2',  # Фильтры и нормализация
+            '-f', 's16le',
+            'pipe:1',
+        ]
         
         try:
-            # Используем ffmpeg для конвертации с оптимизацией для распознавания речи
-            # -ar 16000: частота дискретизации 16kHz (оптимально для Vosk)
-            # -ac 1: моно (стерео не нужно для распознавания речи)
-            # -sample_fmt s16: 16-bit PCM (оптимальный формат для Vosk)
-            # -af 'highpass=f=80,lowpass=f=8000,volume=1.2': фильтры для улучшения качества речи
-            #    highpass убирает низкочастотные шумы (< 80Hz)
-            #    lowpass убирает высокочастотные шумы (> 8kHz, не важны для речи)
-            #    volume=1.2: легкое увеличение громкости для лучшего распознавания
-            cmd = [
-                'ffmpeg', '-i', str(audio_path),
-                '-ar', str(sample_rate),
-                '-ac', '1',  # Моно
-                '-sample_fmt', 's16',  # 16-bit PCM
-                '-af', 'highpass=f=80,lowpass=f=8000,volume=1.2',  # Фильтры и нормализация
-                '-y',  # Перезаписать если существует
-                str(output_path)
-            ]
-            
-            result = subprocess.run(
+            process = subprocess.Popen(
                 cmd,
-                capture_output=True,
-                text=True,
-                timeout=300
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                bufsize=chunk_bytes,
             )
-            
-            if result.returncode != 0:
-                raise Exception(f"Ошибка конвертации аудио: {result.stderr}")
-            
-            return output_path
-        except subprocess.TimeoutExpired:
-            raise Exception("Конвертация аудио превысила лимит времени")
         except FileNotFoundError:
             raise Exception("ffmpeg не найден. Установите ffmpeg для работы с аудио")
+        
+        # stderr читаем в отдельном потоке, чтобы переполненный pipe не заблокировал ffmpeg
+        stderr_tail = deque(maxlen=20)
+        stderr_reader = threading.Thread(
+            target=lambda: stderr_tail.extend(
+                line.decode('utf-8', errors='replace').rstrip() for line in process.stderr
+            ),
+            daemon=True,
+        )
+        stderr_reader.start()
+        
+        try:
+            while True:
+                data = process.stdout.read(chunk_bytes)
+                if not data:
+                    break
+                yield data
+            
+            process.wait()
+            stderr_reader.join(timeout=1)
+            if process.returncode != 0:
+                raise Exception(f"Ошибка декодирования аудио: {' '.join(stderr_tail)}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
     
-    def transcribe_file(self, audio_path: Path, model_size: str = 'base', language: str = 'ru') -> Dict:
+    @staticmethod
+    def _iter_array_pcm(audio, chunk_bytes: int = PCM_CHUNK_BYTES,
+                        start_seconds: float = 0.0) -> Iterator[bytes]:
+        """
+        Yield s16le chunks of decoded float32 16 kHz audio starting at start_seconds
+        
+        Обработка как у ffmpeg в _iter_pcm: ФВЧ 80 Hz второго порядка (состояние
+        фильтра переносится между порциями) и усиление 1.2; lowpass 8 kHz при
+        частоте 16 kHz ничего не меняет. Массив читается порциями, копия всего
+        файла не создается.
+        """
+        from scipy.signal import butter, sosfilt, sosfilt_zi
+        
+        sos = butter(2, 80, btype='highpass', fs=SAMPLE_RATE, output='sos')
+        state = None
+        frames = chunk_bytes // 2
+        for start in range(int(start_seconds * SAMPLE_RATE), len(audio), frames):
+            block = np.asarray(audio[start:start + frames], dtype=np.float32)
+            if state is None:
+                state = sosfilt_zi(sos) * block[0]
+            block, state = sosfilt(sos, block, zi=state)
+            yield (np.clip(block * 1.2, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+    
+    def transcribe_file(self, audio_path: Path, model_size: str = 'base', language: str = 'ru',
+                        progress_callback: Optional[Callable] = None, checkpoint=None, audio=None) -> Dict:
         """
         Transcribe audio file using Vosk
         
         Note: model_size parameter is ignored for Vosk, as Vosk uses its own model files.
         The model is determined by the model_path set during initialization.
+        С checkpoint поток PCM начинается с checkpoint.resume_from, а каждый
+        финальный результат распознавателя фиксируется в чекпоинте.
+        С audio (кеш PCM) ffmpeg не запускается - PCM берется из массива;
+        длинный файл распознается по частям параллельно (_transcribe_parallel),
+        без кеша массив для этого декодируется во временный файл.
         """
         try:
             # Vosk doesn't use model_size parameter - it uses the model_path set during initialization
-            model = self.load_model()
-            
-            logger.info(f"Начало распознавания (Vosk): {audio_path}, модель: {self.model_path} (model_size параметр '{model_size}' игнорируется для Vosk)")
-            
-            # Vosk работает только с WAV файлами в формате 16kHz, моно
-            # Конвертируем если нужно
-            wav_path = audio_path
-            converted = False
+            with spans.span('model_load'):
+                model = self.load_model()
             
-            if audio_path.suffix.lower() != '.wav':
-                logger.info(f"Конвертация аудио файла в WAV формат...")
-                wav_path = self._convert_to_wav(audio_path)
-                converted = True
+            resume_from = checkpoint.resume_from if checkpoint else 0.0
+            if audio is None and self._parallel_available():
+                # Кеш PCM выключен или недоступен: части читаются из массива,
+                # поэтому декодируем во временный файл (короткий файл тоже читается из него)
+                try:
+                    with spans.span('convert'):
+                        audio = pcm_cache.decode_temporary(audio_path)
+                except Exception as e:
+                    logger.warning(f"Не удалось декодировать {audio_path} для параллельного режима: {e}")
+            if audio is not None and self._should_use_parallel_mode(len(audio) / SAMPLE_RATE - resume_from):
+                if resume_from:
+                    logger.info(f"Продолжение распознавания {audio_path} с {resume_from:.1f} сек")
+                return self._transcribe_parallel(
+                    model, audio[int(resume_from * SAMPLE_RATE):], language,
+                    progress_callback, checkpoint, resume_from,
+                )
             
-            # Проверяем формат WAV файла
-            try:
-                wf = wave.open(str(wav_path), "rb")
-                sample_rate = wf.getframerate()
-                channels = wf.getnchannels()
-                wf.close()
-                
-                # Если не 16kHz моно, конвертируем
-                if sample_rate != 16000 or channels != 1:
-                    logger.info(f"Конвертация WAV файла: {sample_rate}Hz, {channels} каналов -> 16kHz моно")
-                    wav_path = self._convert_to_wav(wav_path, sample_rate=16000)
-                    converted = True
-            except Exception as e:
-                logger.warning(f"Не удалось прочитать WAV файл, пробуем конвертировать: {e}")
-                wav_path = self._convert_to_wav(audio_path)
-                converted = True
+            logger.info(f"Начало распознавания (Vosk): {audio_path}, модель: {self.model_path} (model_size параметр '{model_size}' игнорируется для Vosk)")
             
             # Инициализируем распознаватель с оптимизированными параметрами
-            # Vosk работает с 16kHz моно WAV
-            rec = KaldiRecognizer(model, 16000)
-            
-            # Оптимизация для качества и скорости
-            rec.SetWords(True)  # Включить информацию о словах для временных меток
-            # SetPartialWords можно использовать для частичных результатов, но это замедляет обработку
-            # rec.SetPartialWords(True)  # Отключено для скорости
-            
-            # Попытка установить максимальное количество альтернатив для улучшения качества
-            # SetMaxAlternatives(0) = использовать лучший результат (быстрее, оптимальный баланс)
-            try:
-                if hasattr(rec, 'SetMaxAlternatives'):
-                    rec.SetMaxAlternatives(0)  # 0 = лучший результат, быстрее
-                    logger.debug("SetMaxAlternatives установлен для оптимизации")
-            except Exception:
-                pass  # Метод может быть недоступен в некоторых версиях Vosk
-            
-            # Читаем и обрабатываем аудио
-            # Оптимизированный размер буфера: 8000 байт (4000 фреймов * 2 байта на сэмпл)
-            # Больший буфер может ускорить обработку, но требует больше памяти
-            # 4000 фреймов = 0.25 секунды при 16kHz - оптимальный баланс
-            wf = wave.open(str(wav_path), "rb")
-            buffer_size = 4000  # Количество фреймов за раз (оптимально для скорости)
+            # Vosk работает с PCM 16kHz моно
+            rec = self.create_recognizer(model)
             
             text_parts = []
             segments = []
+            processed_bytes = 0
+            if resume_from:
+                logger.info(f"Продолжение распознавания {audio_path} с {resume_from:.1f} сек")
+            if progress_callback:
+                progress_callback(resume_from)
             
-            while True:
-                data = wf.readframes(buffer_size)
-                if len(data) == 0:
-                    break
-                
-                if rec.AcceptWaveform(data):
-                    # AcceptWaveform вернул True - получили финальный фрагмент
-                    result_str = rec.Result()
-                    result = json.loads(result_str)
-                    # Пробуем получить текст из 'text' или собрать из 'result'
-                    text = None
-                    if result.get('text'):
-                        text = result['text'].strip()
-                    elif result.get('result') and len(result['result']) > 0:
-                        # Собираем текст из слов
-                        words = [word.get('word', '') for word in result['result'] if word.get('word')]
-                        text = ' '.join(words).strip()
-                    
-                    if text:
-                        text_parts.append(text)
-                        logger.debug(f"Добавлен текст из AcceptWaveform: '{text}'")
-                        # Сегмент с временными метками
-                        if result.get('result') and len(result['result']) > 0:
-                            segments.append({
-                                'start': result['result'][0].get('start', 0),
-                                'end': result['result'][-1].get('end', 0),
-                                'text': text
-                            })
+            # Читаем и обрабатываем аудио потоком из ffmpeg
+            # Оптимизированный размер буфера: 8000 байт (4000 фреймов * 2 байта на сэмпл)
+            # 4000 фреймов = 0.25 секунды при 16kHz - оптимальный баланс
+            # closing() гарантирует остановку ffmpeg при ошибке распознавания
+            if audio is not None:
+                pcm_source = self._iter_array_pcm(audio, start_seconds=resume_from)
+            else:
+                pcm_source = self._iter_pcm(audio_path, start_seconds=resume_from)
+            with closing(pcm_source) as pcm_stream:
+                for data in pcm_stream:
+                    processed_bytes += len(data)
+                    position = resume_from + processed_bytes / (SAMPLE_RATE * 2)
+                    if rec.AcceptWaveform(data):
+                        # AcceptWaveform вернул True - получили финальный фрагмент
+                        text, segment = self.parse_result(rec.Result(), offset=resume_from)
+                        if text:
+                            text_parts.append(text)
+                            logger.debug(f"Добавлен текст из AcceptWaveform: '{text}'")
+                            if segment:
+                                segments.append(segment)
+                        if checkpoint:
+                            # Все аудио до текущей позиции распознано окончательно
+                            checkpoint.commit([segment] if text and segment else [], position)
+                    if progress_callback:
+                        progress_callback(position)
             
             # Получаем финальный результат - это важно, так как последний фрагмент может быть только в FinalResult
-            final_result_str = rec.FinalResult()
-            final_result = json.loads(final_result_str)
-            # Пробуем получить текст из 'text' или собрать из 'result'
-            final_text = None
-            if final_result.get('text'):
-                final_text = final_result['text'].strip()
-            elif final_result.get('result') and len(final_result['result']) > 0:
-                # Собираем текст из слов
-                words = [word.get('word', '') for word in final_result['result'] if word.get('word')]
-                final_text = ' '.join(words).strip()
-            
+            final_text, final_segment = self.parse_result(rec.FinalResult(), offset=resume_from)
             if final_text:
                 text_parts.append(final_text)
                 logger.debug(f"Добавлен текст из FinalResult: '{final_text}'")
-                if final_result.get('result') and len(final_result['result']) > 0:
-                    segments.append({
-                        'start': final_result['result'][0].get('start', 0),
-                        'end': final_result['result'][-1].get('end', 0),
-                        'text': final_text
-                    })
-            
-            wf.close()
-            
-            # Удаляем временный файл если был создан
-            if converted and wav_path != audio_path and wav_path.exists():
-                try:
-                    wav_path.unlink()
-                except Exception as e:
-                    logger.warning(f"Не удалось удалить временный файл {wav_path}: {e}")
+                if final_segment:
+                    segments.append(final_segment)
             
             text = ' '.join(text_parts).strip()
             
@@ -294,6 +365,207 @@ class VoskService(SpeechRecognitionService):
             logger.error(f"Ошибка при распознавании (Vosk): {e}")
             raise Exception(f"Ошибка при распознавании (Vosk): {e}")
     
+    @staticmethod
+    def _parallel_available() -> bool:
+        """Parallel mode is enabled and the task has more than one core"""
+        return getattr(settings, 'VOSK_PARALLEL', True) and get_task_cpu_quota() > 1
+    
+    def _should_use_parallel_mode(self, duration: float) -> bool:
+        """Parallel mode makes sense for long files with more than one available core"""
+        if duration < getattr(settings, 'VOSK_PARALLEL_MIN_DURATION', 300):
+            return False
+        return self._parallel_available()
+    
+    @staticmethod
+    def _frame_energy(audio) -> np.ndarray:
+        """Mean square of every ENERGY_FRAME-sample frame (векторно, блоками)"""
+        frames = len(audio) // ENERGY_FRAME
+        energy = np.empty(frames, dtype=np.float32)
+        for first in range(0, frames, ENERGY_BLOCK_FRAMES):
+            count = min(ENERGY_BLOCK_FRAMES, frames - first)
+            block = np.asarray(
+                audio[first * ENERGY_FRAME:(first + count) * ENERGY_FRAME], dtype=np.float32
+            ).reshape(count, ENERGY_FRAME)
+            energy[first:first + count] = np.einsum('ij,ij->i', block, block) / ENERGY_FRAME
+        return energy
+    
+    def _plan_chunks(self, audio) -> List[Tuple[int, int]]:
+        """
+        Split audio into chunks of about VOSK_CHUNK_SECONDS at silence
+        
+        Returns:
+            List of (start_sample, end_sample). Граница ищется в окне ±четверть
+            целевого размера вокруг него: берется кадр с минимальной сглаженной
+            энергией, то есть середина самой тихой паузы. Перекрытия нет - Kaldi
+            начинает каждую часть с чистого состояния, как после паузы.
+        """
+        total = len(audio)
+        target = int(getattr(settings, 'VOSK_CHUNK_SECONDS', 120) * SAMPLE_RATE)
+        if total <= target * 3 // 2:
+            return [(0, total)]
+        
+        energy = self._frame_energy(audio)
+        smoothed = np.convolve(energy, np.ones(ENERGY_SMOOTH_FRAMES, dtype=np.float32), mode='same')
+        search = target // 4 // ENERGY_FRAME
+        
+        chunks = []
+        chunk_start = 0
+        while total - chunk_start > target * 3 // 2:
+            center = (chunk_start + target) // ENERGY_FRAME
+            low, high = center - search, min(len(smoothed), center + search)
+            cut = (low + int(np.argmin(smoothed[low:high]))) * ENERGY_FRAME
+            chunks.append((chunk_start, cut))
+            chunk_start = cut
+        chunks.append((chunk_start, total))
+        return chunks
+    
+    def _transcribe_parallel(self, model, audio, language: str,
+                             progress_callback: Optional[Callable] = None,
+                             checkpoint=None, time_offset: float = 0.0) -> Dict:
+        """
+        Transcribe chunks concurrently with one recognizer per chunk
+        
+        Model общая (из реестра моделей) и потокобезопасна, у каждой части свой
+        KaldiRecognizer; AcceptWaveform отпускает GIL, поэтому потоки занимают
+        разные ядра, а граф модели в памяти один. Потоков не больше доли квоты
+        CPU на одну задачу воркера. time_offset - позиция audio
+        в исходном файле (продолжение с чекпоинта). Чекпоинт фиксируется по
+        порядку частей: часть попадает в него, когда распознаны все предыдущие.
+        """
+        chunks = self._plan_chunks(audio)
+        workers = max(1, min(len(chunks), get_task_cpu_quota()))
+        
+        logger.info(
+            f"Начало распознавания (Vosk, по частям): {len(audio) / SAMPLE_RATE:.1f} сек, "
+            f"модель: {self.model_path}, частей: {len(chunks)}, потоков: {workers}"
+        )
+        
+        total_duration = time_offset + len(audio) / SAMPLE_RATE
+        chunk_progress = [0.0] * len(chunks)
+        progress_lock = threading.Lock()
+        stopped = threading.Event()
+        if progress_callback:
+            progress_callback(time_offset, total_duration)
+        
+        def decode_chunk(index, bounds):
+            """Texts and segments of one part, None если остановлена из-за ошибки другой части"""
+            if stopped.is_set():
+                return None
+            start, end = bounds
+            offset = time_offset + start / SAMPLE_RATE
+            rec = self.create_recognizer(model)
+            chunk_texts = []
+            chunk_segments = []
+            processed_bytes = 0
+            # Срез memmap без копирования; ФВЧ начинает с состояния по первому сэмплу части
+            for data in self._iter_array_pcm(audio[start:end]):
+                if stopped.is_set():
+                    return None
+                processed_bytes += len(data)
+                if rec.AcceptWaveform(data):
+                    text, segment = self.parse_result(rec.Result(), offset=offset)
+                    if text:
+                        chunk_texts.append(text)
+                        if segment:
+                            chunk_segments.append(segment)
+                if progress_callback:
+                    with progress_lock:
+                        chunk_progress[index] = processed_bytes / (SAMPLE_RATE * 2)
+                        progress_callback(time_offset + sum(chunk_progress), total_duration)
+            text, segment = self.parse_result(rec.FinalResult(), offset=offset)
+            if text:
+                chunk_texts.append(text)
+                if segment:
+                    chunk_segments.append(segment)
+            return chunk_texts, chunk_segments
+        
+        def transcribe_chunk(index, bounds):
+            try:
+                return decode_chunk(index, bounds)
+            except BaseException:
+                # Остальные части останавливаются на следующей порции PCM, не дожидаясь,
+                # пока основной поток дойдет до этой части
+                stopped.set()
+                raise
+        
+        text_parts = []
+        segments = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(transcribe_chunk, index, bounds) for index, bounds in enumerate(chunks)]
+            try:
+                # Результаты забираем по порядку частей - так склейка и чекпоинт идут последовательно
+                for (start, end), future in zip(chunks, futures):
+                    result = future.result()
+                    if result is None:
+                        # Часть прервана ошибкой более поздней части - поднимаем эту ошибку
+                        wait(futures, return_when=FIRST_EXCEPTION)
+                        raise next(f.exception() for f in futures if f.done() and not f.cancelled() and f.exception())
+                    chunk_texts, chunk_segments = result
+                    text_parts.extend(chunk_texts)
+                    segments.extend(chunk_segments)
+                    if checkpoint:
+                        checkpoint.commit(chunk_segments, time_offset + end / SAMPLE_RATE)
+            except BaseException:
+                # Ошибка - не ждем остальные части: еще не начатые отменяются, начатые
+                # останавливаются по stopped, распознанное до ошибки уже в чекпоинте
+                stopped.set()
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+        
+        text = ' '.join(text_parts).strip()
+        
+        logger.info(f"Распознавание завершено: {len(text)} символов")
+        
+        return {
+            'text': text,
+            'language': language,
+            'segments': segments if segments else None,
+        }
+    
+    @staticmethod
+    def parse_result(result_str: str, offset: float = 0.0) -> Tuple[Optional[str], Optional[Dict]]:
+        """
+        Parse JSON returned by KaldiRecognizer.Result()/FinalResult()
+        
+        Args:
+            result_str: JSON-строка результата Vosk
+            offset: Сдвиг временных меток в секундах (для частей файла)
+        
+        Returns:
+            (text, segment) - текст фрагмента и сегмент с временными метками (или None)
+        """
+        result = json.loads(result_str)
+        words = result.get('result') or []
+        # Пробуем получить текст из 'text' или собрать из 'result'
+        text = None
+        if result.get('text'):
+            text = result['text'].strip()
+        elif words:
+            # Собираем текст из слов
+            text = ' '.join(word.get('word', '') for word in words if word.get('word')).strip()
+        
+        segment = None
+        if text and words:
+            # Сегмент с временными метками
+            segment = {
+                'start': words[0].get('start', 0) + offset,
+                'end': words[-1].get('end', 0) + offset,
+                'text': text,
+                # Метки слов компактно: [start, end, слово]
+                'words': [
+                    [round(word.get('start', 0) + offset, 2), round(word.get('end', 0) + offset, 2), word.get('word', '')]
+                    for word in words
+                ],
+            }
+        return text or None, segment
+    
+    def get_cache_signature(self) -> Dict:
+        """Get decoding parameters that affect the result (модель определяется путем)"""
+        return {
+            'service': self.get_service_name(),
+            'model_path': self.model_path,
+        }
+    
     def get_available_models(self) -> List[str]:
         """
         Get list of available Vosk model identifiers
@@ -0,0 +1,166 @@
+"""Live (streaming) speech recognition with Vosk partial results"""
+import json
+import logging
+import threading
+import wave
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from .vosk_service import VoskService
+
+logger = logging.getLogger(__name__)
+
+STREAM_SAMPLE_RATE = 16000
+STREAM_SAMPLE_WIDTH = 2  # s16le
+
+
+class VoskRecognizerPool:
+    """
+    Pool of KaldiRecognizer instances shared by live sessions
+
+    Модель Vosk загружается один раз (кеш VoskService), распознаватели
+    переиспользуются через Reset(). Количество одновременных сессий
+    ограничено VOSK_STREAM_MAX_SESSIONS, чтобы живые записи не отнимали
+    все ядра у веб-процесса.
+    """
+
+    def __init__(self, max_sessions: int):
+        self._semaphore = threading.BoundedSemaphore(max_sessions)
+        self._idle = {}  # model_id -> [KaldiRecognizer]
+        self._lock = threading.Lock()
+
+    def acquire(self, service: VoskService):
+        """Take a recognizer for the service's model, None if the pool is exhausted"""
+        if not self._semaphore.acquire(blocking=False):
+            return None
+        try:
+            with self._lock:
+                idle = self._idle.get(service.model_path)
+                if idle:
+                    return idle.pop()
+            return service.create_recognizer(sample_rate=STREAM_SAMPLE_RATE)
+        except Exception:
+            self._semaphore.release()
+            raise
+
+    def release(self, service: VoskService, recognizer):
+        """Return recognizer to the pool after resetting its state"""
+        try:
+            recognizer.Reset()
+            with self._lock:
+                self._idle.setdefault(service.model_path, []).append(recognizer)
+        except Exception as e:
+            logger.warning(f"Не удалось вернуть распознаватель в пул: {e}")
+        finally:
+            self._semaphore.release()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_recognizer_pool() -> VoskRecognizerPool:
+    """Get process-wide recognizer pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = VoskRecognizerPool(getattr(settings, 'VOSK_STREAM_MAX_SESSIONS', 4))
+        return _pool
+
+
+class LiveTranscriptionSession:
+    """
+    One live recording: feeds PCM to a pooled recognizer and writes it to a WAV file
+
+    Все методы блокирующие и должны вызываться из одного потока за раз
+    (ASGI обработчик вызывает их через sync_to_async).
+    """
+
+    def __init__(self, model_id: Optional[str], output_path: Path):
+        self.service = VoskService(model_id=model_id) if model_id else VoskService()
+        self.model_id = model_id
+        self.output_path = output_path
+        self.recognizer = None
+        self.wav = None
+        self.samples = 0
+        self.text_parts: List[str] = []
+        self.segments: List[Dict] = []
+        self._last_partial = ''
+
+    def start(self) -> bool:
+        """Acquire recognizer and open output file, False if no free slots"""
+        self.recognizer = get_recognizer_pool().acquire(self.service)
+        if self.recognizer is None:
+            return False
+
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.wav = wave.open(str(self.output_path), 'wb')
+        self.wav.setnchannels(1)
+        self.wav.setsampwidth(STREAM_SAMPLE_WIDTH)
+        self.wav.setframerate(STREAM_SAMPLE_RATE)
+        return True
+
+    @property
+    def duration(self) -> float:
+        return self.samples / STREAM_SAMPLE_RATE
+
+    def accept(self, pcm: bytes) -> Optional[Dict]:
+        """
+        Feed s16le 16 kHz mono frame
+
+        Returns:
+            Событие для клиента ('partial' или 'final') или None, если ничего не изменилось
+        """
+        # Неполный сэмпл отбрасываем - клиент всегда шлет целые Int16
+        if len(pcm) % STREAM_SAMPLE_WIDTH:
+            pcm = pcm[:-(len(pcm) % STREAM_SAMPLE_WIDTH)]
+        if not pcm:
+            return None
+
+        self.wav.writeframesraw(pcm)
+        self.samples += len(pcm) // STREAM_SAMPLE_WIDTH
+
+        if self.recognizer.AcceptWaveform(pcm):
+            self._last_partial = ''
+            text, segment = VoskService.parse_result(self.recognizer.Result())
+            if not text:
+                return None
+            self.text_parts.append(text)
+            if segment:
+                self.segments.append(segment)
+            return {'type': 'final', 'text': text, 'segment': segment}
+
+        partial = json.loads(self.recognizer.PartialResult()).get('partial', '')
+        if partial == self._last_partial:
+            return None
+        self._last_partial = partial
+        return {'type': 'partial', 'text': partial}
+
+    def finish(self) -> Dict:
+        """Flush recognizer, close WAV and return transcription result"""
+        try:
+            if self.recognizer is not None:
+                text, segment = VoskService.parse_result(self.recognizer.FinalResult())
+                if text:
+                    self.text_parts.append(text)
+                    if segment:
+                        self.segments.append(segment)
+        finally:
+            self.close()
+
+        return {
+            'text': ' '.join(self.text_parts).strip(),
+            'segments': self.segments,
+            'duration': self.duration,
+        }
+
+    def close(self):
+        """Release pooled recognizer and file handle (idempotent)"""
+        if self.recognizer is not None:
+            get_recognizer_pool().release(self.service, self.recognizer)
+            self.recognizer = None
+        if self.wav is not None:
+            self.wav.close()
+            self.wav = None
@@ -0,0 +1,148 @@
+"""
+Multi-resolution waveform peaks of a recording
+
+Пики (минимум и максимум амплитуды на отрезок) считаются один раз при
+проверке загруженного файла и хранятся рядом с аудио в файле <аудио>.peaks.
+Плеер страницы записи рисует по ним волну сразу, не скачивая и не декодируя
+аудио. Уровни: WAVEFORM_SAMPLES_PER_PEAK отсчетов на пик у самого подробного,
+каждый следующий в WAVEFORM_LEVEL_FACTOR раз грубее, пока пиков не станет
+меньше WAVEFORM_MIN_PEAKS.
+
+Формат (little-endian):
+    заголовок   magic 'PEAK', версия u16, число уровней u16, sample rate u32, число отсчетов u64
+    уровни      отсчетов на пик u32, число пиков u32 - для каждого уровня, от подробного к грубому
+    данные      пары int8 (min, max) в долях 1/127 полной шкалы, уровни подряд
+"""
+import logging
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from recordings.services import pcm_cache
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'PEAK'
+VERSION = 1
+SUFFIX = '.peaks'
+HEADER = struct.Struct('<4sHHIQ')
+LEVEL = struct.Struct('<II')
+# Отсчетов за один проход: память ограничена и для многочасовых записей (memmap читается частями)
+BLOCK_PEAKS = 16384
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'WAVEFORM_ENABLED', True)
+
+
+def get_path(audio_path: Path) -> Path:
+    return Path(f'{audio_path}{SUFFIX}')
+
+
+def _quantize(values: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(values * 127), -127, 127).astype(np.int8)
+
+
+def _base_level(audio: np.ndarray, samples_per_peak: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Min/max of every samples_per_peak samples, блоками по BLOCK_PEAKS пиков"""
+    count = -(-len(audio) // samples_per_peak)
+    mins = np.empty(count, dtype=np.int8)
+    maxs = np.empty(count, dtype=np.int8)
+    block = BLOCK_PEAKS * samples_per_peak
+    for start in range(0, len(audio), block):
+        chunk = np.asarray(audio[start:start + block], dtype=np.float32)
+        full = len(chunk) // samples_per_peak
+        index = start // samples_per_peak
+        if full:
+            frames = chunk[:full * samples_per_peak].reshape(full, samples_per_peak)
+            mins[index:index + full] = _quantize(frames.min(axis=1))
+            maxs[index:index + full] = _quantize(frames.max(axis=1))
+        if len(chunk) > full * samples_per_peak:
+            # Неполный последний отрезок записи
+            tail = chunk[full * samples_per_peak:]
+            mins[index + full] = _quantize(tail.min())
+            maxs[index + full] = _quantize(tail.max())
+    return mins, maxs
+
+
+def _coarsen(mins: np.ndarray, maxs: np.ndarray, factor: int) -> Tuple[np.ndarray, np.ndarray]:
+    pad = -len(mins) % factor
+    if pad:
+        # Дополнение не влияет на min/max последней группы
+        mins = np.concatenate([mins, np.full(pad, 127, dtype=np.int8)])
+        maxs = np.concatenate([maxs, np.full(pad, -127, dtype=np.int8)])
+    return mins.reshape(-1, factor).min(axis=1), maxs.reshape(-1, factor).max(axis=1)
+
+
+def compute_levels(audio: np.ndarray) -> List[Tuple[int, np.ndarray, np.ndarray]]:
+    """Peak levels [(samples_per_peak, mins, maxs)] от подробного к грубому"""
+    samples_per_peak = getattr(settings, 'WAVEFORM_SAMPLES_PER_PEAK', 512)
+    factor = getattr(settings, 'WAVEFORM_LEVEL_FACTOR', 4)
+    min_peaks = getattr(settings, 'WAVEFORM_MIN_PEAKS', 2048)
+
+    mins, maxs = _base_level(audio, samples_per_peak)
+    levels = [(samples_per_peak, mins, maxs)]
+    while len(mins) > min_peaks:
+        mins, maxs = _coarsen(mins, maxs, factor)
+        samples_per_peak *= factor
+        levels.append((samples_per_peak, mins, maxs))
+    return levels
+
+
+def write(target: Path, levels, sample_rate: int, sample_count: int):
+    """Write peaks file atomically (параллельный запрос увидит либо весь файл, либо никакого)"""
+    fd, temp_name = tempfile.mkstemp(dir=target.parent, prefix=f'.{target.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(levels), sample_rate, sample_count))
+            for samples_per_peak, mins, _ in levels:
+                f.write(LEVEL.pack(samples_per_peak, len(mins)))
+            for _, mins, maxs in levels:
+                f.write(np.column_stack([mins, maxs]).tobytes())
+        os.replace(temp_name, target)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+
+
+def _read_audio(audio_path: Path) -> Tuple[np.ndarray, int]:
+    """Mono float32 samples of the file через soundfile (без кеша PCM)"""
+    import soundfile as sf
+
+    with sf.SoundFile(str(audio_path)) as f:
+        data = f.read(dtype='float32', always_2d=True)
+        return data.mean(axis=1), f.samplerate
+
+
+def generate(audio_path: Path, audio: Optional[np.ndarray] = None) -> Optional[Path]:
+    """
+    Compute and store peaks of the audio file
+
+    Args:
+        audio: уже декодированный PCM из кеша (16 kHz моно); без него файл
+            читается soundfile - WebM/Opus так не читаются, и волны не будет.
+
+    Returns:
+        Путь к файлу пиков или None, если аудио прочитать не удалось.
+    """
+    audio_path = Path(audio_path)
+    sample_rate = pcm_cache.SAMPLE_RATE
+    try:
+        if audio is None:
+            audio, sample_rate = _read_audio(audio_path)
+        levels = compute_levels(audio)
+        target = get_path(audio_path)
+        write(target, levels, sample_rate, len(audio))
+    except Exception as e:
+        logger.warning(f"Не удалось построить волну для {audio_path}: {e}")
+        return None
+    logger.info(
+        f"Волна {audio_path.name}: {len(levels)} уровней, {len(levels[0][1])} пиков, "
+        f"{target.stat().st_size / 1024:.0f} KB"
+    )
+    return target
@@ -3,10 +3,12 @@ import whisper
 import numpy as np
 import torch
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Callable, Optional, Dict, List
 import logging
 
 from .speech_recognition_service import SpeechRecognitionService
+from .model_registry import get_model_registry
+from recordings import spans
 
 logger = logging.getLogger(__name__)
 
@@ -14,33 +16,38 @@ logger = logging.getLogger(__name__)
 class WhisperService(SpeechRecognitionService):
     """Service for speech recognition using Whisper"""
     
-    _models = {}  # Cache для моделей
+    supports_checkpoints = False
     
     def __init__(self):
         self.device = "cpu"  # Используем CPU для избежания проблем с CUDA
     
     def load_model(self, model_size: str = 'base'):
-        """Load Whisper model (with caching)"""
-        if model_size not in self._models:
+        """Load Whisper model (with caching in the shared model registry)"""
+        def loader():
             try:
                 logger.info(f"Загрузка модели Whisper: {model_size}")
                 model = whisper.load_model(model_size, device=self.device)
-                self._models[model_size] = model
                 logger.info(f"Модель {model_size} успешно загружена")
+                return model
             except Exception as e:
                 logger.error(f"Ошибка при загрузке модели {model_size}: {e}")
                 raise Exception(f"Ошибка при загрузке модели Whisper: {e}")
         
-        return self._models[model_size]
+        return get_model_registry().get(f"whisper:{model_size}_{self.device}", loader, engine='whisper')
     
-    def transcribe_file(self, audio_path: Path, model_size: str = 'base', language: str = 'ru') -> dict:
-        """Transcribe audio file"""
+    def transcribe_file(self, audio_path: Path, model_size: str = 'base', language: str = 'ru',
+                        progress_callback: Optional[Callable] = None, checkpoint=None, audio=None) -> dict:
+        """Transcribe audio file (openai-whisper не отдает промежуточный прогресс и не поддерживает чекпоинты)"""
         try:
-            model = self.load_model(model_size)
+            with spans.span('model_load'):
+                model = self.load_model(model_size)
+            if progress_callback:
+                progress_callback(0.0)
             
             logger.info(f"Начало распознавания: {audio_path}, модель: {model_size}")
+            # Декодированный массив из кеша PCM: whisper не запускает ffmpeg повторно
             result = model.transcribe(
-                str(audio_path),
+                audio if audio is not None else str(audio_path),
                 language=language,
                 task="transcribe"
             )
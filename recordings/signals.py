@@ -0,0 +1,35 @@
+"""Signal handlers for recordings app"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import dashboard, events
+from .auth_backends import forget_cached_user
+from .models import Recording
+
+
+@receiver(post_save, sender=Recording)
+@receiver(post_delete, sender=Recording)
+def recording_changed(sender, instance, **kwargs):
+    """
+    Any change of a recording (в том числе смена статуса задачей) сбрасывает
+    снимок дашборда и уведомляет открытые дашборды пользователя
+    """
+    user_id, recording_id = instance.user_id, instance.pk
+    status = None if kwargs.get('signal') is post_delete else instance.status
+
+    def notify():
+        dashboard.invalidate(user_id)
+        events.publish_recording_changed(user_id, recording_id, status)
+
+    # После коммита: иначе параллельный запрос успеет закешировать еще старые данные
+    transaction.on_commit(notify)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Changed password or flags must be visible to the next request at once"""
+    user_id = instance.pk
+    transaction.on_commit(lambda: forget_cached_user(user_id))
@@ -0,0 +1,71 @@
+"""
+Timing spans of one transcription attempt
+
+Задача распознавания создает SpanRecorder и делает его текущим на время попытки;
+задача и сервисы движков размечают стадии через spans.span('model_load') и т.п.
+Без активного SpanRecorder (benchmark, живое распознавание) span ничего не делает.
+Вложенные стадии вычитаются из внешней: время 'decode' не включает загрузку
+модели, которую сервис выполнил внутри transcribe_file. Каждая стадия также
+попадает в гистограмму transcription_stage_seconds.
+
+Стадии: convert (ffmpeg в PCM), model_load, decode (распознавание моделью), persist (сохранение в БД).
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from . import metrics
+
+STAGES = ('convert', 'model_load', 'decode', 'persist')
+
+_current = contextvars.ContextVar('transcription_spans', default=None)
+
+
+class SpanRecorder:
+    """Accumulated own time of each stage (секунды, без вложенных стадий)"""
+
+    def __init__(self, engine: str = ''):
+        self.engine = engine
+        self.stages: Dict[str, float] = {}
+        self._nested = []  # время вложенных стадий для каждой открытой
+        self._token = None
+
+    @contextmanager
+    def span(self, name: str):
+        started = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            own = elapsed - self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+            self.stages[name] = self.stages.get(name, 0.0) + own
+            metrics.TRANSCRIPTION_STAGE_SECONDS.labels(stage=name, engine=self.engine).observe(own)
+
+    def start(self):
+        """Make recorder current for spans.span() until stop()"""
+        self._token = _current.set(self)
+        return self
+
+    def stop(self):
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+
+
+def current() -> Optional[SpanRecorder]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str):
+    """Time a stage of the current transcription attempt (без попытки - no-op)"""
+    recorder = _current.get()
+    if recorder is None:
+        yield
+        return
+    with recorder.span(name):
+        yield
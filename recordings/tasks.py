@@ -1,21 +1,514 @@
 """Background tasks for recordings"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
 from celery import shared_task
+from celery.result import AsyncResult
 from celery.exceptions import Retry, MaxRetriesExceededError
 import logging
+import os
+import socket
+import time
+from datetime import datetime, timezone as dt_timezone
 from pathlib import Path
 
-from .models import Recording
+from .models import Recording, TranscriptSegment, TranscriptionRun
 from .services.service_factory import SpeechRecognitionServiceFactory
 from .services.audio_service import AudioService
+from .services import pcm_cache, transcription_cache, waveform
+from .services.model_registry import get_peak_rss_bytes, reset_peak_rss
+from . import metrics, scheduler, spans
+from .progress import ProgressReporter
+from .checkpoints import Checkpointer, UploadPrefixCheckpointer, build_signature
+from .search import get_search_config
 
 logger = logging.getLogger(__name__)
 
 
+def _claim_key(recording_id):
+    return f'transcribe-claim:{recording_id}'
+
+
+def _claim_recording(recording_id, owner_id) -> bool:
+    """
+    Atomically claim recording for processing by task owner_id
+
+    Захват повторно проходит для того же владельца (retry или повторная доставка
+    после потери воркера), но не для другой задачи - так запись, забранная
+    в пакет, не будет распознана второй раз собственной задачей.
+    """
+    timeout = getattr(settings, 'TRANSCRIPTION_CLAIM_TIMEOUT', 7200)
+    if cache.add(_claim_key(recording_id), owner_id, timeout):
+        return True
+    return cache.get(_claim_key(recording_id)) == owner_id
+
+
+def _release_recording(recording_id, owner_id):
+    if cache.get(_claim_key(recording_id)) == owner_id:
+        cache.delete(_claim_key(recording_id))
+
+
+def clear_recording_claim(recording_id):
+    """Drop claim unconditionally (при отмене обработки пользователем)"""
+    cache.delete(_claim_key(recording_id))
+
+
+def get_transcription_queue(recording) -> str:
+    """
+    Celery queue for recording's transcription task
+
+    Vosk и маленькие модели Whisper идут в очередь быстрых задач, остальные -
+    в очередь тяжелых, чтобы короткие записи не ждали за часовым large.
+    Длинные записи Vosk идут в VOSK_PARALLEL_QUEUE (по умолчанию тяжелая очередь):
+    ее воркер выполняет одну задачу и отдает ей все ядра для распознавания по частям.
+    """
+    fast_queue = getattr(settings, 'TRANSCRIPTION_QUEUE_FAST', 'fast')
+    heavy_queue = getattr(settings, 'TRANSCRIPTION_QUEUE_HEAVY', 'heavy')
+    if recording.recognition_service == 'vosk':
+        if (getattr(settings, 'VOSK_PARALLEL', True)
+                and (recording.duration or 0) >= getattr(settings, 'VOSK_PARALLEL_MIN_DURATION', 300)):
+            return getattr(settings, 'VOSK_PARALLEL_QUEUE', heavy_queue)
+        return fast_queue
+    fast_models = getattr(settings, 'TRANSCRIPTION_FAST_WHISPER_MODELS', ['tiny', 'base'])
+    return fast_queue if (recording.whisper_model or 'base') in fast_models else heavy_queue
+
+
+def enqueue_transcription(recording):
+    """
+    Queue recording for transcription
+
+    С планировщиком задача сначала ждет в очереди с приоритетом по оценке
+    стоимости (recordings/scheduler.py), иначе сразу отправляется в Celery.
+    """
+    queue = get_transcription_queue(recording)
+    if scheduler.is_enabled():
+        return AsyncResult(scheduler.schedule(recording, queue))
+    task = transcribe_recording_task.apply_async(args=[recording.id], queue=queue)
+    logger.info(f"Задача распознавания записи {recording.id} отправлена в очередь {queue}")
+    return task
+
+
+def enqueue_ingest(recording):
+    """
+    Queue validation and probing of a just uploaded recording
+
+    Очередь ввода-вывода обслуживает отдельный воркер, поэтому проверка файлов
+    не ждет за распознаванием. Если брокер недоступен, запись проверяется
+    сразу в вызывающем процессе, как до появления очереди.
+    """
+    queue = getattr(settings, 'INGEST_QUEUE', 'io')
+    try:
+        ingest_recording_task.apply_async(args=[recording.id], queue=queue)
+    except Exception as e:
+        logger.warning(f"Очередь {queue} недоступна, запись {recording.id} проверяется в запросе: {e}")
+        ingest_recording_task(recording.id)
+
+
+def _get_recognition_service(recording):
+    """Create recognition service for recording settings"""
+    # Для Vosk создаем сервис с model_id, для других - без параметров
+    if recording.recognition_service == 'vosk':
+        from .services.vosk_service import VoskService
+        if recording.vosk_model:
+            return VoskService(model_id=recording.vosk_model)
+        return VoskService()  # Использует модель по умолчанию
+    return SpeechRecognitionServiceFactory.get_service(
+        recording.recognition_service or 'faster-whisper',
+        device='cpu'
+    )
+
+
+def _get_model_name(recording):
+    if recording.recognition_service == 'vosk':
+        return recording.vosk_model or ''
+    return recording.whisper_model or 'base'
+
+
+def _get_cache_key(recording, recognition_service, language):
+    """Build result cache key, None если кеш выключен"""
+    if not transcription_cache.is_enabled():
+        return None
+    if not recording.audio_sha256:
+        # Записи, загруженные до появления кеша: хеш считается один раз и сохраняется
+        try:
+            recording.audio_sha256 = AudioService.compute_sha256(Path(recording.audio_file.path))
+            Recording.objects.filter(pk=recording.pk).update(audio_sha256=recording.audio_sha256)
+        except OSError as e:
+            logger.warning(f"Не удалось вычислить хеш записи {recording.pk}: {e}")
+            return None
+    return transcription_cache.build_cache_key(
+        recording.audio_sha256,
+        recording.recognition_service,
+        _get_model_name(recording),
+        language,
+        recognition_service.get_cache_signature(),
+    )
+
+
+def _save_result(recording, result, cache_key=None, language=None):
+    """Store transcription result with its segments and mark recording completed"""
+    segments = TranscriptSegment.from_result(recording, result.get('segments'))
+    with transaction.atomic():
+        # Повторное распознавание заменяет сегменты целиком
+        TranscriptSegment.objects.filter(recording=recording).delete()
+        TranscriptSegment.objects.bulk_create(segments, batch_size=1000)
+        recording.transcription = result['text']
+        # Поисковый вектор пересчитает триггер БД в конфигурации языка записи
+        recording.search_config = get_search_config(language)
+        recording.status = 'completed'
+        recording.processed_at = timezone.now()
+        recording.save()
+    
+    if cache_key:
+        transcription_cache.store_result(
+            cache_key,
+            recording.audio_sha256,
+            recording.recognition_service,
+            _get_model_name(recording),
+            language,
+            result,
+        )
+
+
+def _batch_key(owner_id):
+    return f'transcribe-batch:{owner_id}'
+
+
+def _claim_batch_peers(recording, owner_id, language):
+    """
+    Claim other queued recordings that can share one batched decode
+
+    Подходят записи в статусе processing с той же моделью faster-whisper
+    и тем же языком, чья собственная задача еще не начала работу.
+    С планировщиком пиры берутся из его очереди в порядке приоритета и с тем же
+    лимитом на пользователя и убираются из нее. Суммарная длительность пакета
+    ограничена FASTER_WHISPER_BATCH_MAX_DURATION.
+    """
+    max_items = getattr(settings, 'FASTER_WHISPER_BATCH_MAX_RECORDINGS', 1)
+    if max_items <= 1:
+        return []
+
+    max_duration = getattr(settings, 'FASTER_WHISPER_BATCH_MAX_DURATION', 1800)
+    total_duration = recording.duration or 0
+    candidates = (
+        Recording.objects
+        .filter(
+            status='processing',
+            recognition_service='faster-whisper',
+            whisper_model=recording.whisper_model,
+            user__settings__language=language,
+            duration__isnull=False,
+        )
+        .exclude(pk=recording.pk)
+    )
+    peers = []
+
+    def accept(candidate):
+        nonlocal total_duration
+        if candidate is None or total_duration + candidate.duration > max_duration:
+            return False
+        if not _claim_recording(candidate.pk, owner_id):
+            return False
+        peers.append(candidate)
+        total_duration += candidate.duration
+        return True
+
+    if scheduler.is_enabled():
+        queue = get_transcription_queue(recording)
+        eligible = {str(candidate.pk): candidate for candidate in candidates.filter(pk__in=scheduler.pending_ids(queue))}
+        scheduler.take_peers(queue, max_items - 1, lambda member: accept(eligible.get(member.split(':', 1)[0])))
+    else:
+        # Без планировщика задачи пиров уже в Celery и завершатся, увидев чужой захват
+        for candidate in candidates.order_by('created_at')[:max_items * 2]:
+            if len(peers) + 1 >= max_items:
+                break
+            accept(candidate)
+
+    if peers:
+        # Повторно доставленная задача лидера вернет в очередь пиров, захваченных до потери воркера
+        cache.set(_batch_key(owner_id), [peer.pk for peer in peers], getattr(settings, 'TRANSCRIPTION_CLAIM_TIMEOUT', 7200))
+    return peers
+
+
+def _release_batch_peers(owner_id, peer_ids):
+    """
+    Release peers claimed by task owner_id and requeue those left unprocessed
+
+    С планировщиком собственные задачи пиров не отправляются, поэтому пир,
+    оставшийся в processing (ошибка лидера, потерянный воркер), ставится в очередь заново.
+    """
+    for peer in Recording.objects.filter(pk__in=peer_ids):
+        if cache.get(_claim_key(peer.pk)) not in (None, owner_id):
+            continue
+        cache.delete(_claim_key(peer.pk))
+        if peer.status == 'processing' and scheduler.is_enabled():
+            try:
+                enqueue_transcription(peer)
+                logger.info(f"Запись {peer.pk} возвращена в очередь из пакета задачи {owner_id}")
+            except Exception as e:
+                logger.error(f"Не удалось вернуть запись {peer.pk} в очередь: {e}")
+    cache.delete(_batch_key(owner_id))
+
+
+def _transcribe_batch(recognition_service, recording, peers, model_size, language, progress=None):
+    """
+    Transcribe leader recording together with claimed peers
+
+    Результаты пиров сохраняются здесь, результат лидера возвращается вызывающему.
+    Если пакетный режим не удался, записи распознаются по одной.
+    """
+    batch = [recording] + peers
+    batch_size = getattr(settings, 'FASTER_WHISPER_BATCH_SIZE', 8)
+    with spans.span('convert'):
+        audios = [pcm_cache.get_pcm(Path(item.audio_file.path), item.audio_sha256) for item in batch]
+    try:
+        results = recognition_service.transcribe_batch(
+            [Path(item.audio_file.path) for item in batch],
+            model_size=model_size,
+            language=language,
+            batch_size=batch_size,
+            progress_callback=progress,
+            audios=audios,
+        )
+    except Exception as e:
+        logger.warning(f"Пакетное распознавание не удалось, переход к обработке по одной: {e}")
+        results = [None] * len(batch)
+
+    for peer, result, audio in zip(peers, results[1:], audios[1:]):
+        try:
+            if result is None:
+                result = recognition_service.transcribe_file(
+                    Path(peer.audio_file.path), model_size=model_size, language=language, audio=audio
+                )
+            with spans.span('persist'):
+                _save_result(peer, result, _get_cache_key(peer, recognition_service, language), language)
+            logger.info(f"Запись {peer.pk} успешно обработана в составе пакета задачи записи {recording.pk}")
+        except Exception as e:
+            logger.error(f"Ошибка при обработке записи {peer.pk} в пакете: {e}", exc_info=True)
+            peer.status = 'failed'
+            peer.error_message = f"Ошибка при пакетной обработке: {str(e)}"
+            peer.save()
+
+    if results[0] is None:
+        return recognition_service.transcribe_file(
+            Path(recording.audio_file.path), model_size=model_size, language=language, audio=audios[0]
+        )
+    return results[0]
+
+
+@shared_task(ignore_result=True)
+def evict_transcription_cache_task():
+    """Periodic LRU eviction of the transcription result cache"""
+    return transcription_cache.evict()
+
+
+@shared_task(ignore_result=True)
+def cleanup_upload_sessions_task():
+    """Delete abandoned chunked uploads with their files and finished upload sessions"""
+    from datetime import timedelta
+    from .models import UploadSession
+    from .uploads import delete_session
+    
+    cutoff = timezone.now() - timedelta(hours=getattr(settings, 'UPLOAD_SESSION_EXPIRE_HOURS', 24))
+    removed = 0
+    for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator():
+        delete_session(session)
+        removed += 1
+    if removed:
+        logger.info(f"Удалено устаревших сессий загрузки: {removed}")
+    return removed
+
+
+@shared_task(ignore_result=True)
+def ingest_recording_task(recording_id):
+    """
+    Validate, probe and hash an uploaded recording, then start auto transcription
+
+    Запрос загрузки только сохраняет файл и ставит запись в статус ingesting.
+    Здесь файл проверяется, длительность читается из заголовков, досчитывается
+    хеш (если его не посчитал обработчик загрузки), файл декодируется в кеш
+    PCM - задача распознавания начнет сразу с готового аудио - и по нему
+    строятся пики волны для плеера.
+    """
+    from .models import UserSettings
+    
+    recording = Recording.objects.select_related('user').filter(pk=recording_id, status='ingesting').first()
+    if recording is None:
+        # Запись удалена или уже проверена (повторная доставка задачи)
+        return
+    
+    audio_path = Path(recording.audio_file.path)
+    started = time.perf_counter()
+    try:
+        if not AudioService.is_valid_audio_file(audio_path):
+            raise ValueError('Некорректный аудио файл')
+        audio_info = AudioService.get_audio_info(audio_path)
+        # Длительность из заголовков файла точнее таймера браузера; значение из формы - если файл ее не содержит
+        if audio_info.get('duration'):
+            recording.duration = audio_info['duration']
+        if not recording.audio_sha256:
+            recording.audio_sha256 = AudioService.compute_sha256(audio_path)
+    except Exception as e:
+        logger.error(f"❌ Ошибка проверки аудио файла записи {recording_id}: {e}", exc_info=not isinstance(e, ValueError))
+        recording.status = 'failed'
+        recording.error_message = str(e) if isinstance(e, ValueError) else f'Ошибка обработки файла: {e}'
+        recording.save(update_fields=['status', 'error_message', 'updated_at'])
+        metrics.INGEST_SECONDS.labels(outcome='invalid' if isinstance(e, ValueError) else 'error').observe(
+            time.perf_counter() - started
+        )
+        return
+    
+    metrics.UPLOAD_SIZE_BYTES.observe(audio_path.stat().st_size)
+    if recording.duration:
+        metrics.UPLOAD_DURATION_SECONDS.observe(recording.duration)
+    user_settings, _ = UserSettings.objects.get_or_create(user=recording.user)
+    audio = None
+    if waveform.is_enabled() or (user_settings.auto_transcribe and getattr(settings, 'INGEST_PREDECODE_PCM', True)):
+        audio = pcm_cache.get_pcm(audio_path, recording.audio_sha256)
+    
+    recording.status = 'processing' if user_settings.auto_transcribe else 'uploaded'
+    recording.save(update_fields=['duration', 'audio_sha256', 'status', 'updated_at'])
+    metrics.INGEST_SECONDS.labels(outcome='ok').observe(time.perf_counter() - started)
+    logger.info(f"✅ Запись {recording_id} проверена: duration={recording.duration}, status={recording.status}")
+    
+    if user_settings.auto_transcribe:
+        task = enqueue_transcription(recording)
+        recording.celery_task_id = task.id
+        recording.save(update_fields=['celery_task_id', 'updated_at'])
+        logger.info(f"Запущено автоматическое распознавание для записи {recording_id}")
+    
+    # Волна не задерживает распознавание: задача уже в очереди и читает тот же кеш PCM
+    if waveform.is_enabled():
+        waveform.generate(audio_path, audio)
+
+
+@shared_task(ignore_result=True)
+def transcribe_upload_prefix_task(upload_id):
+    """
+    Transcribe the already received part of a streaming upload
+
+    Сегменты до границы принятых данных (минус UPLOAD_STREAM_PREFIX_MARGIN)
+    сохраняются в сессии загрузки; после остановки записи итоговая задача
+    продолжает с них, и ожидание текста сводится к распознаванию хвоста.
+    """
+    from django.core.files.storage import default_storage
+    from .models import UploadSession, UserSettings
+    from . import uploads
+    
+    try:
+        session = UploadSession.objects.select_related('user').filter(pk=upload_id, recording__isnull=True).first()
+        if session is None or session.length is not None:
+            # Загрузка уже завершена - остаток распознает итоговая задача
+            return
+        user_settings, _ = UserSettings.objects.get_or_create(user=session.user)
+        recording = uploads.build_recording(session, user_settings)
+        recognition_service = _get_recognition_service(recording)
+        if not recognition_service.supports_checkpoints:
+            return
+        
+        language = user_settings.language
+        limit = (recording.duration or 0) - uploads.get_prefix_margin()
+        checkpoint = UploadPrefixCheckpointer(
+            session,
+            build_signature(recording.recognition_service, _get_model_name(recording), language),
+            limit,
+        )
+        if limit <= checkpoint.resume_from:
+            return
+        
+        model_size = recording.whisper_model or 'base' if recording.recognition_service != 'vosk' else 'base'
+        logger.info(f"Распознавание начала загрузки {upload_id}: {checkpoint.resume_from:.1f}-{limit:.1f} сек")
+        try:
+            recognition_service.transcribe_file(
+                Path(default_storage.path(session.file_name)),
+                model_size=model_size,
+                language=language,
+                checkpoint=checkpoint,
+            )
+        except Exception as e:
+            # Недописанный последний кластер контейнера - сегменты до него уже зафиксированы
+            logger.info(f"Распознавание начала загрузки {upload_id} остановлено: {e}")
+        checkpoint.flush()
+    except Exception as e:
+        logger.warning(f"Не удалось распознать начало загрузки {upload_id}: {e}", exc_info=True)
+    finally:
+        uploads.release_prefix_claim(upload_id)
+
+
+@shared_task(ignore_result=True)
+def dispatch_scheduled_transcriptions_task():
+    """Periodic dispatch of pending transcriptions (страховка от потерянных слотов)"""
+    if scheduler.is_enabled():
+        return scheduler.dispatch_all()
+
+
+def _start_run(task, recording, engine, model_name):
+    """Create TranscriptionRun of this task attempt, None если записать не удалось"""
+    published_at = metrics.get_published_at(task.request)
+    try:
+        return TranscriptionRun.objects.create(
+            recording=recording,
+            task_id=task.request.id or '',
+            attempt=(task.request.retries or 0) + 1,
+            recognition_service=engine,
+            model_name=model_name,
+            enqueued_at=datetime.fromtimestamp(published_at, tz=dt_timezone.utc) if published_at else None,
+            hostname=task.request.hostname or socket.gethostname(),
+            pid=os.getpid(),
+        )
+    except Exception as e:
+        logger.warning(f"Не удалось создать запись о запуске распознавания {recording.pk}: {e}")
+        return None
+
+
+def _finish_run(run, recorder, status, audio_seconds=None, batch_size=1, error=''):
+    """Store stage timings of the attempt; ошибка записи не влияет на результат задачи"""
+    if run is None:
+        return
+    decode_seconds = recorder.stages.get('decode')
+    run.status = status
+    run.finished_at = timezone.now()
+    run.convert_seconds = recorder.stages.get('convert')
+    run.model_load_seconds = recorder.stages.get('model_load')
+    run.decode_seconds = decode_seconds
+    run.persist_seconds = recorder.stages.get('persist')
+    run.batch_size = batch_size
+    run.audio_duration = audio_seconds
+    run.real_time_factor = decode_seconds / audio_seconds if decode_seconds and audio_seconds else None
+    run.peak_rss_bytes = get_peak_rss_bytes() or None
+    run.error_message = error
+    try:
+        run.save()
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить запуск распознавания {run.pk}: {e}")
+
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
 def transcribe_recording_task(self, recording_id):
     """Transcribe recording in background"""
+    if not _claim_recording(recording_id, self.request.id):
+        logger.info(f"Запись {recording_id} уже обрабатывается другой задачей (пакетная обработка)")
+        return
+
+    peers = []
+    progress = None
+    checkpoint = None
+    retrying = False
+    engine = model_name = ''
+    run = None
+    recorder = spans.SpanRecorder().start()
+    queue_wait = metrics.get_queue_wait(self.request)
+    if queue_wait is not None:
+        metrics.TRANSCRIPTION_QUEUE_WAIT_SECONDS.labels(
+            queue=(self.request.delivery_info or {}).get('routing_key', '')
+        ).observe(queue_wait)
     try:
+        # Пиры, захваченные этой задачей до потери воркера, возвращаются в очередь
+        stale_peers = cache.get(_batch_key(self.request.id))
+        if stale_peers:
+            _release_batch_peers(self.request.id, stale_peers)
+        
         recording = Recording.objects.get(pk=recording_id)
         
         if recording.status == 'completed':
@@ -26,35 +519,82 @@ def transcribe_recording_task(self, recording_id):
         recording.celery_task_id = self.request.id
         recording.save()
         
+        # Время стадий попытки сохраняется в TranscriptionRun, пиковая память - с этого момента
+        engine = recording.recognition_service or 'faster-whisper'
+        model_name = _get_model_name(recording)
+        recorder.engine = engine
+        run = _start_run(self, recording, engine, model_name)
+        reset_peak_rss()
+        
         # Получить путь к файлу
         audio_path = Path(recording.audio_file.path)
         
         # Создать сервис распознавания речи
-        # Для Vosk создаем сервис с model_id, для других - без параметров
-        if recording.recognition_service == 'vosk':
-            from .services.vosk_service import VoskService
-            if recording.vosk_model:
-                recognition_service = VoskService(model_id=recording.vosk_model)
-            else:
-                recognition_service = VoskService()  # Использует модель по умолчанию
-        else:
-            recognition_service = SpeechRecognitionServiceFactory.get_service(
-                recording.recognition_service or 'faster-whisper',
-                device='cpu'
-            )
+        recognition_service = _get_recognition_service(recording)
+        model_size = recording.whisper_model or 'base' if recording.recognition_service != 'vosk' else 'base'
+        language = recording.user.settings.language
+        
+        # Повторная загрузка того же файла с теми же настройками - результат из кеша
+        cache_key = _get_cache_key(recording, recognition_service, language)
+        cached_result = transcription_cache.get_cached_result(cache_key) if cache_key else None
+        if cache_key:
+            metrics.CACHE_REQUESTS.labels(cache='transcription', result='miss' if cached_result is None else 'hit').inc()
+        if cached_result is not None:
+            with spans.span('persist'):
+                _save_result(recording, cached_result, language=language)
+            metrics.TRANSCRIPTION_TASKS.labels(engine=engine, model=model_name, outcome='cached').inc()
+            _finish_run(run, recorder, 'cached')
+            logger.info(f"Запись {recording_id} обработана из кеша распознавания")
+            return
+        
+        # Сегменты, распознанные до retry или потери воркера, не декодируются повторно
+        checkpoint = Checkpointer(
+            recording,
+            build_signature(recording.recognition_service, _get_model_name(recording), language),
+        )
+        
+        # Для faster-whisper забираем в пакет другие ожидающие записи с той же моделью
+        # (продолжение с чекпоинта идет отдельно - пакетный режим не умеет начинать с середины)
+        if hasattr(recognition_service, 'transcribe_batch') and not checkpoint.is_resumed:
+            peers = _claim_batch_peers(recording, self.request.id, language)
         
-        # Распознать речь
-        result = recognition_service.transcribe_file(
-            audio_path,
-            model_size=recording.whisper_model or 'base' if recording.recognition_service != 'vosk' else 'base',
-            language=recording.user.settings.language
+        # Прогресс публикуется в кеш для API статуса (для пакета - общий для всех его записей)
+        batch = [recording] + peers
+        progress = ProgressReporter(
+            [item.pk for item in batch],
+            sum(item.duration or 0 for item in batch) or None,
+            user_ids=[item.user_id for item in batch],
         )
         
+        # Распознать речь (в стадию decode не входят вложенные convert и model_load - их размечают пакет и сервисы)
+        if peers:
+            with spans.span('decode'):
+                result = _transcribe_batch(recognition_service, recording, peers, model_size, language, progress)
+            audio_seconds = sum(item.duration or 0 for item in batch)
+        else:
+            # Файл декодируется один раз для всех движков, моделей и повторных запусков
+            with spans.span('convert'):
+                audio = pcm_cache.get_pcm(audio_path, recording.audio_sha256)
+            with spans.span('decode'):
+                result = recognition_service.transcribe_file(
+                    audio_path,
+                    model_size=model_size,
+                    language=language,
+                    progress_callback=progress,
+                    checkpoint=checkpoint,
+                    audio=audio,
+                )
+            # После продолжения с чекпоинта распознан только остаток записи
+            audio_seconds = (recording.duration or 0) - checkpoint.resumed_from
+            result = checkpoint.merge(result)
+        metrics.observe_transcription(engine, model_name, audio_seconds, recorder.stages.get('decode', 0.0))
+        
         # Сохранить результат
-        recording.transcription = result['text']
-        recording.status = 'completed'
-        recording.processed_at = timezone.now()
-        recording.save()
+        with spans.span('persist'):
+            _save_result(recording, result, cache_key, language)
+        checkpoint.delete()
+        metrics.TRANSCRIPTION_TASKS.labels(engine=engine, model=model_name, outcome='completed').inc(len(batch))
+        _finish_run(run, recorder, 'completed', audio_seconds, len(batch))
         
         logger.info(f"Запись {recording_id} успешно обработана")
         
@@ -62,10 +602,21 @@ def transcribe_recording_task(self, recording_id):
         logger.error(f"Запись {recording_id} не найдена")
     except Exception as e:
         logger.error(f"Ошибка при обработке записи {recording_id}: {e}", exc_info=True)
+        metrics.TRANSCRIPTION_FAILURES.labels(engine=engine, reason=type(e).__name__).inc()
+        if checkpoint is not None:
+            # Повтор продолжит с последнего распознанного сегмента
+            checkpoint.flush()
         # Попробовать повторить задачу
         try:
+            # Повтор сохраняет слот планировщика за записью
+            retrying = self.request.retries < self.max_retries
+            metrics.TRANSCRIPTION_TASKS.labels(
+                engine=engine, model=model_name, outcome='retry' if retrying else 'failed'
+            ).inc()
+            _finish_run(run, recorder, 'retry' if retrying else 'failed', batch_size=len(peers) + 1, error=str(e))
             raise self.retry(exc=e, countdown=60)
         except MaxRetriesExceededError:
+            retrying = False
             # Если достигнут максимум попыток, отметить запись как failed
             try:
                 recording = Recording.objects.get(pk=recording_id)
@@ -75,3 +626,13 @@ def transcribe_recording_task(self, recording_id):
                 logger.error(f"Запись {recording_id} не удалось обработать после {self.max_retries} попыток")
             except Recording.DoesNotExist:
                 logger.error(f"Запись {recording_id} не найдена при финальной обработке ошибки")
+    finally:
+        recorder.stop()
+        if progress is not None:
+            progress.clear()
+        if peers:
+            _release_batch_peers(self.request.id, [peer.pk for peer in peers])
+        _release_recording(recording_id, self.request.id)
+        if not retrying:
+            # Освободившийся слот занимает следующая по приоритету запись
+            scheduler.release(recording_id)
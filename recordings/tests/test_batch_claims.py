@@ -0,0 +1,143 @@
+"""Claims of recordings and selection of batch peers"""
+from unittest import mock, skipIf
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from recordings import scheduler
+from recordings.models import Recording, UserSettings
+
+try:
+    from recordings import tasks
+except ImportError:
+    # Модуль задач импортирует движки распознавания (whisper, torch)
+    tasks = None
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@skipIf(tasks is None, 'движки распознавания не установлены')
+@override_settings(CACHES=LOCMEM_CACHES)
+class ClaimRecordingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_claim_is_exclusive_but_reentrant_for_owner(self):
+        self.assertTrue(tasks._claim_recording(1, 'leader'))
+        self.assertTrue(tasks._claim_recording(1, 'leader'))
+        self.assertFalse(tasks._claim_recording(1, 'other'))
+
+    def test_only_owner_releases_claim(self):
+        tasks._claim_recording(1, 'leader')
+        tasks._release_recording(1, 'other')
+        self.assertFalse(tasks._claim_recording(1, 'other'))
+
+        tasks._release_recording(1, 'leader')
+        self.assertTrue(tasks._claim_recording(1, 'other'))
+
+
+@skipIf(tasks is None, 'движки распознавания не установлены')
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    FASTER_WHISPER_BATCH_MAX_RECORDINGS=4,
+    FASTER_WHISPER_BATCH_MAX_DURATION=600,
+    TRANSCRIPTION_SCHEDULER_MAX_PER_USER=1,
+)
+class BatchPeersTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create(username=f'user{index}') for index in range(3)]
+        for user in self.users:
+            UserSettings.objects.get_or_create(user=user)
+        self.leader = self._recording(self.users[0])
+        self.language = self.users[0].settings.language
+        self.pending = []
+
+    def _recording(self, user, duration=60, whisper_model='base', status='processing'):
+        return Recording.objects.create(
+            user=user, audio_file='audio/a.wav', duration=duration, status=status,
+            recognition_service='faster-whisper', whisper_model=whisper_model,
+        )
+
+    def _queue(self, *recordings):
+        self.pending = [(f'{item.pk}:{item.user_id}', float(index)) for index, item in enumerate(recordings)]
+
+    def _take_peers(self, queue, limit, accept):
+        running_users = [str(self.leader.user_id)]
+        selected = scheduler.select_peers(self.pending, running_users, limit, 1, accept)
+        return [int(member.split(':', 1)[0]) for member in selected]
+
+    def _claim_peers(self):
+        with mock.patch.object(scheduler, 'is_enabled', return_value=True), \
+                mock.patch.object(scheduler, 'pending_ids', return_value=[int(m.split(':')[0]) for m, _ in self.pending]), \
+                mock.patch.object(scheduler, 'take_peers', side_effect=self._take_peers):
+            return tasks._claim_batch_peers(self.leader, 'leader', self.language)
+
+    def test_peers_come_from_scheduler_queue_within_user_limit(self):
+        same_user = self._recording(self.users[0])
+        other_user = self._recording(self.users[1])
+        # Задача третьего пользователя в пакет не подходит, но ждет слота
+        waiting = self._recording(self.users[2], whisper_model='small')
+        self._queue(same_user, other_user, waiting)
+
+        peers = self._claim_peers()
+        self.assertEqual([peer.pk for peer in peers], [other_user.pk])
+        self.assertEqual(cache.get(tasks._batch_key('leader')), [other_user.pk])
+
+    def test_peers_over_user_limit_join_when_nobody_else_waits(self):
+        same_user = self._recording(self.users[0])
+        other_user = self._recording(self.users[1])
+        self._queue(same_user, other_user)
+
+        peers = self._claim_peers()
+        self.assertEqual(sorted(peer.pk for peer in peers), [same_user.pk, other_user.pk])
+
+    def test_incompatible_and_claimed_recordings_are_skipped(self):
+        other_model = self._recording(self.users[1], whisper_model='small')
+        too_long = self._recording(self.users[1], duration=600)
+        claimed = self._recording(self.users[2])
+        tasks._claim_recording(claimed.pk, 'someone-else')
+        compatible = self._recording(self.users[1])
+        self._queue(other_model, too_long, claimed, compatible)
+
+        peers = self._claim_peers()
+        self.assertEqual([peer.pk for peer in peers], [compatible.pk])
+
+    @override_settings(FASTER_WHISPER_BATCH_MAX_RECORDINGS=1)
+    def test_batching_disabled(self):
+        self._queue(self._recording(self.users[1]))
+        self.assertEqual(self._claim_peers(), [])
+
+    def test_without_scheduler_peers_are_taken_by_creation_order(self):
+        first = self._recording(self.users[1])
+        second = self._recording(self.users[2])
+        with mock.patch.object(scheduler, 'is_enabled', return_value=False):
+            peers = tasks._claim_batch_peers(self.leader, 'leader', self.language)
+        self.assertEqual([peer.pk for peer in peers], [first.pk, second.pk])
+
+    def test_release_requeues_unprocessed_peers(self):
+        unprocessed = self._recording(self.users[1])
+        completed = self._recording(self.users[2], status='completed')
+        for peer in (unprocessed, completed):
+            tasks._claim_recording(peer.pk, 'leader')
+        cache.set(tasks._batch_key('leader'), [unprocessed.pk, completed.pk])
+
+        with mock.patch.object(scheduler, 'is_enabled', return_value=True), \
+                mock.patch.object(tasks, 'enqueue_transcription') as enqueue:
+            tasks._release_batch_peers('leader', [unprocessed.pk, completed.pk])
+
+        self.assertEqual([call.args[0].pk for call in enqueue.call_args_list], [unprocessed.pk])
+        self.assertTrue(tasks._claim_recording(unprocessed.pk, 'other'))
+        self.assertIsNone(cache.get(tasks._batch_key('leader')))
+
+    def test_release_skips_peers_claimed_by_another_task(self):
+        peer = self._recording(self.users[1])
+        tasks._claim_recording(peer.pk, 'other')
+
+        with mock.patch.object(scheduler, 'is_enabled', return_value=True), \
+                mock.patch.object(tasks, 'enqueue_transcription') as enqueue:
+            tasks._release_batch_peers('leader', [peer.pk])
+
+        enqueue.assert_not_called()
+        self.assertFalse(tasks._claim_recording(peer.pk, 'leader'))
@@ -0,0 +1,105 @@
+"""Incremental checkpoints of transcriptions and streaming uploads"""
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from recordings.checkpoints import Checkpointer, UploadPrefixCheckpointer, build_signature
+from recordings.models import Recording, TranscriptionCheckpoint, UploadSession
+
+
+def _segment(start, end, text='слово'):
+    return {'start': start, 'end': end, 'text': text}
+
+
+@override_settings(TRANSCRIPTION_CHECKPOINT_INTERVAL=0)
+class CheckpointerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+        self.recording = Recording.objects.create(user=self.user, audio_file='audio/1/a.wav', duration=600)
+        self.signature = build_signature('faster-whisper', 'base', 'ru')
+
+    def test_resumes_from_stored_checkpoint(self):
+        Checkpointer(self.recording, self.signature).commit([_segment(0, 10, 'первый')], 12.0)
+
+        checkpoint = Checkpointer(self.recording, self.signature)
+        self.assertTrue(checkpoint.is_resumed)
+        self.assertEqual(checkpoint.resume_from, 12.0)
+        self.assertEqual(checkpoint.segments, [_segment(0, 10, 'первый')])
+
+    def test_other_signature_discards_checkpoint(self):
+        Checkpointer(self.recording, self.signature).commit([_segment(0, 10)], 12.0)
+
+        checkpoint = Checkpointer(self.recording, build_signature('faster-whisper', 'small', 'ru'))
+        self.assertFalse(checkpoint.is_resumed)
+        self.assertFalse(TranscriptionCheckpoint.objects.filter(recording=self.recording).exists())
+
+    @override_settings(TRANSCRIPTION_CHECKPOINT_INTERVAL=3600)
+    def test_commits_are_buffered_until_flush(self):
+        checkpoint = Checkpointer(self.recording, self.signature)
+        checkpoint.commit([_segment(0, 10)], 12.0)
+        self.assertFalse(TranscriptionCheckpoint.objects.filter(recording=self.recording).exists())
+
+        checkpoint.flush()
+        self.assertEqual(TranscriptionCheckpoint.objects.get(recording=self.recording).processed_seconds, 12.0)
+
+    def test_merge_prepends_segments_of_previous_attempts(self):
+        Checkpointer(self.recording, self.signature).commit([_segment(0, 10, 'первый')], 12.0)
+        checkpoint = Checkpointer(self.recording, self.signature)
+
+        merged = checkpoint.merge({'text': 'второй', 'segments': [_segment(12, 20, 'второй')]})
+        self.assertEqual(merged['text'], 'первый второй')
+        self.assertEqual([segment['text'] for segment in merged['segments']], ['первый', 'второй'])
+
+    def test_merge_without_resume_returns_result_unchanged(self):
+        result = {'text': 'текст', 'segments': [_segment(0, 5)]}
+        self.assertIs(Checkpointer(self.recording, self.signature).merge(result), result)
+
+
+class UploadPrefixCheckpointerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+        self.session = UploadSession.objects.create(user=self.user, file_name='audio/1/live.webm')
+        self.signature = build_signature('faster-whisper', 'base', 'ru')
+
+    def test_commits_within_limit_are_stored_immediately(self):
+        checkpoint = UploadPrefixCheckpointer(self.session, self.signature, limit=60.0)
+        checkpoint.commit([_segment(0, 10)], 12.0)
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.prefix_seconds, 12.0)
+        self.assertEqual(self.session.prefix_signature, self.signature)
+        self.assertFalse(checkpoint.closed)
+
+    def test_commit_past_limit_keeps_only_segments_before_it(self):
+        checkpoint = UploadPrefixCheckpointer(self.session, self.signature, limit=30.0)
+        checkpoint.commit([_segment(0, 10), _segment(10, 25), _segment(25, 34)], 40.0)
+
+        self.assertTrue(checkpoint.closed)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.prefix_seconds, 25.0)
+        self.assertEqual([segment['end'] for segment in self.session.prefix_segments], [10, 25])
+
+    def test_closed_checkpoint_ignores_further_commits(self):
+        checkpoint = UploadPrefixCheckpointer(self.session, self.signature, limit=30.0)
+        checkpoint.commit([_segment(0, 35)], 40.0)
+        checkpoint.commit([_segment(0, 10)], 10.0)
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.prefix_seconds, 0)
+        self.assertEqual(self.session.prefix_segments, [])
+
+    def test_resumes_from_session_prefix(self):
+        UploadPrefixCheckpointer(self.session, self.signature, limit=60.0).commit([_segment(0, 10)], 12.0)
+        self.session.refresh_from_db()
+
+        checkpoint = UploadPrefixCheckpointer(self.session, self.signature, limit=90.0)
+        self.assertEqual(checkpoint.resume_from, 12.0)
+        self.assertEqual(len(checkpoint.segments), 1)
+
+    def test_does_not_overwrite_prefix_after_recording_is_created(self):
+        checkpoint = UploadPrefixCheckpointer(self.session, self.signature, limit=60.0)
+        self.session.recording = Recording.objects.create(user=self.user, audio_file='audio/1/live.webm')
+        self.session.save()
+
+        checkpoint.commit([_segment(0, 10)], 12.0)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.prefix_seconds, 0)
@@ -0,0 +1,90 @@
+"""Priority and per-user limits of the transcription scheduler"""
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase, override_settings
+
+from recordings import scheduler
+
+
+class ComputeScoreTests(SimpleTestCase):
+    def test_cost_is_weighted_by_aging(self):
+        self.assertEqual(scheduler.compute_score(100.0, 10.0, aging=5.0), 150.0)
+
+    @override_settings(TRANSCRIPTION_SCHEDULER_AGING=2.0)
+    def test_aging_defaults_to_setting(self):
+        self.assertEqual(scheduler.compute_score(100.0, 10.0), 120.0)
+
+    def test_short_job_overtakes_long_one_submitted_earlier(self):
+        long_job = scheduler.compute_score(0.0, 600.0, aging=5.0)
+        short_job = scheduler.compute_score(60.0, 6.0, aging=5.0)
+        self.assertLess(short_job, long_job)
+
+    def test_long_job_waits_at_most_aging_times_its_cost(self):
+        # Короткая задача, пришедшая позже чем через AGING * стоимость, уже не обгоняет
+        long_job = scheduler.compute_score(0.0, 600.0, aging=5.0)
+        short_job = scheduler.compute_score(3001.0, 0.0, aging=5.0)
+        self.assertLess(long_job, short_job)
+
+    @override_settings(
+        TRANSCRIPTION_REAL_TIME_FACTORS={'vosk': 0.1, 'faster-whisper:base': 0.2},
+        TRANSCRIPTION_SCHEDULER_DEFAULT_DURATION=300,
+    )
+    def test_estimate_cost_uses_engine_factor_and_default_duration(self):
+        vosk = SimpleNamespace(duration=100, recognition_service='vosk', whisper_model='large')
+        unknown_duration = SimpleNamespace(duration=None, recognition_service='faster-whisper', whisper_model=None)
+        self.assertAlmostEqual(scheduler.estimate_cost(vosk), 10.0)
+        self.assertAlmostEqual(scheduler.estimate_cost(unknown_duration), 60.0)
+
+
+class SelectJobsTests(SimpleTestCase):
+    def test_takes_jobs_in_score_order_up_to_capacity(self):
+        pending = [('1:a', 1.0), ('2:b', 2.0), ('3:c', 3.0)]
+        self.assertEqual(scheduler.select_jobs(pending, [], capacity=2, max_per_user=0), ['1:a', '2:b'])
+
+    def test_user_limit_lets_other_users_go_first(self):
+        pending = [('1:a', 1.0), ('2:a', 2.0), ('3:b', 3.0)]
+        self.assertEqual(scheduler.select_jobs(pending, [], capacity=2, max_per_user=1), ['1:a', '3:b'])
+
+    def test_running_jobs_count_towards_user_limit(self):
+        pending = [('2:a', 1.0), ('3:b', 2.0)]
+        self.assertEqual(scheduler.select_jobs(pending, ['a'], capacity=1, max_per_user=1), ['3:b'])
+
+    def test_free_slots_go_to_jobs_over_the_limit(self):
+        pending = [('1:a', 1.0), ('2:a', 2.0), ('3:a', 3.0)]
+        self.assertEqual(scheduler.select_jobs(pending, ['a'], capacity=2, max_per_user=1), ['1:a', '2:a'])
+
+    def test_no_capacity_selects_nothing(self):
+        self.assertEqual(scheduler.select_jobs([('1:a', 1.0)], [], capacity=0, max_per_user=1), [])
+
+
+class SelectPeersTests(SimpleTestCase):
+    def test_peers_respect_user_limit_while_others_wait(self):
+        pending = [('2:a', 1.0), ('3:b', 2.0), ('4:c', 3.0)]
+        selected = scheduler.select_peers(pending, ['a'], limit=1, max_per_user=1, accept=lambda member: True)
+        self.assertEqual(selected, ['3:b'])
+
+    def test_rejected_job_within_limit_blocks_jobs_over_limit(self):
+        # 3:b не подходит в пакет (другая модель), но ждет слота - пакет не удлиняется за его счет
+        pending = [('2:a', 1.0), ('3:b', 2.0)]
+        selected = scheduler.select_peers(pending, ['a'], limit=3, max_per_user=1, accept=lambda member: member != '3:b')
+        self.assertEqual(selected, [])
+
+    def test_jobs_over_limit_join_when_nobody_else_waits(self):
+        pending = [('2:a', 1.0), ('3:a', 2.0)]
+        selected = scheduler.select_peers(pending, ['a'], limit=3, max_per_user=1, accept=lambda member: True)
+        self.assertEqual(selected, ['2:a', '3:a'])
+
+    def test_limit_caps_batch_size(self):
+        pending = [('2:b', 1.0), ('3:c', 2.0), ('4:d', 3.0)]
+        selected = scheduler.select_peers(pending, ['a'], limit=2, max_per_user=1, accept=lambda member: True)
+        self.assertEqual(selected, ['2:b', '3:c'])
+
+    def test_accept_is_called_once_per_selected_peer(self):
+        calls = []
+
+        def accept(member):
+            calls.append(member)
+            return True
+
+        scheduler.select_peers([('2:a', 1.0), ('3:a', 2.0)], ['a'], limit=3, max_per_user=1, accept=accept)
+        self.assertEqual(calls, ['2:a', '3:a'])
@@ -0,0 +1,116 @@
+"""Chunked upload offsets, checksums and header validation"""
+import base64
+import hashlib
+import io
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from recordings import uploads
+
+WAV_HEADER = b'RIFF\x24\x00\x00\x00WAVEfmt '
+
+
+def _checksum(data: bytes) -> str:
+    return 'sha256 ' + base64.b64encode(hashlib.sha256(data).digest()).decode('ascii')
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        self.user = User.objects.create(username='uploader')
+        self.data = WAV_HEADER + bytes(range(256)) * 4
+
+    def _append(self, session, offset, chunk, **kwargs):
+        return uploads.append_chunk(session.pk, self.user, offset, io.BytesIO(chunk), len(chunk), **kwargs)
+
+    def _file_content(self, session):
+        with default_storage.open(session.file_name, 'rb') as f:
+            return f.read()
+
+    def test_chunks_are_appended_until_complete(self):
+        session = uploads.create_session(self.user, len(self.data), {'filename': 'a.wav'})
+        session = self._append(session, 0, self.data[:100])
+        self.assertEqual(session.offset, 100)
+        self.assertFalse(session.is_complete)
+
+        session = self._append(session, 100, self.data[100:])
+        self.assertTrue(session.is_complete)
+        self.assertEqual(self._file_content(session), self.data)
+        self.assertEqual(uploads.get_file_sha256(session), hashlib.sha256(self.data).hexdigest())
+
+    def test_wrong_offset_is_rejected_with_conflict(self):
+        session = uploads.create_session(self.user, len(self.data), {'filename': 'a.wav'})
+        session = self._append(session, 0, self.data[:100])
+
+        with self.assertRaises(uploads.UploadError) as error:
+            self._append(session, 50, self.data[50:150])
+        self.assertEqual(error.exception.status, 409)
+        session.refresh_from_db()
+        self.assertEqual(session.offset, 100)
+
+    def test_checksum_mismatch_keeps_offset(self):
+        session = uploads.create_session(self.user, len(self.data), {'filename': 'a.wav'})
+
+        with self.assertRaises(uploads.UploadError) as error:
+            self._append(session, 0, self.data[:100], checksum_header=_checksum(b'other'))
+        self.assertEqual(error.exception.status, 460)
+        session.refresh_from_db()
+        self.assertEqual(session.offset, 0)
+
+        session = self._append(session, 0, self.data[:100], checksum_header=_checksum(self.data[:100]))
+        self.assertEqual(session.offset, 100)
+
+    def test_first_chunk_must_look_like_audio(self):
+        session = uploads.create_session(self.user, 100, {'filename': 'a.wav'})
+        with self.assertRaises(uploads.UploadError) as error:
+            self._append(session, 0, b'<html>' + b' ' * 94)
+        self.assertEqual(error.exception.status, 415)
+
+    def test_chunk_past_declared_length_is_rejected(self):
+        session = uploads.create_session(self.user, 50, {'filename': 'a.wav'})
+        with self.assertRaises(uploads.UploadError) as error:
+            self._append(session, 0, self.data[:100])
+        self.assertEqual(error.exception.status, 413)
+
+    def test_deferred_length_is_set_by_last_chunk(self):
+        session = uploads.create_session(self.user, None, {'filename': 'live.wav'})
+        session = self._append(session, 0, self.data[:100], duration=3.5)
+        self.assertIsNone(session.length)
+        self.assertEqual(uploads.get_received_duration(session), 3.5)
+
+        session = self._append(session, 100, self.data[100:], upload_length=len(self.data))
+        self.assertTrue(session.is_complete)
+
+    def test_duration_is_ignored_for_partially_received_chunk(self):
+        session = uploads.create_session(self.user, None, {'filename': 'live.wav'})
+        session = uploads.append_chunk(session.pk, self.user, 0, io.BytesIO(self.data[:60]), 100, duration=3.5)
+        self.assertEqual(session.offset, 60)
+        self.assertIsNone(uploads.get_received_duration(session))
+
+    def test_unsupported_extension_is_rejected(self):
+        with self.assertRaises(uploads.UploadError) as error:
+            uploads.create_session(self.user, 100, {'filename': 'notes.txt'})
+        self.assertEqual(error.exception.status, 415)
+
+
+class ParseDurationTests(SimpleTestCase):
+    def test_missing_header(self):
+        self.assertIsNone(uploads.parse_duration(None))
+
+    def test_valid_values(self):
+        self.assertEqual(uploads.parse_duration('12.5'), 12.5)
+        self.assertEqual(uploads.parse_duration('0'), 0.0)
+
+    def test_invalid_values(self):
+        for value in ('abc', '', 'nan', 'inf', '-1'):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                uploads.parse_duration(value)
@@ -0,0 +1,30 @@
+"""Upload handlers for recordings app"""
+import hashlib
+
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class AudioHashUploadHandler(FileUploadHandler):
+    """
+    Compute SHA-256 of uploaded files while chunks stream through to storage
+
+    Обработчик ставится первым в цепочку и возвращает каждый чанк дальше без
+    изменений, поэтому файл сохраняется как обычно, а хеш готов к моменту
+    окончания загрузки - без повторного чтения файла с диска.
+    Результат: request.upload_sha256 = {имя поля: hex digest}.
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, 'upload_sha256'):
+            self.request.upload_sha256 = {}
+        self.request.upload_sha256[self.field_name] = self.hasher.hexdigest()
+        # None - файл создаст следующий обработчик в цепочке
+        return None
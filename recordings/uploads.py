@@ -0,0 +1,413 @@
+"""
+Resumable chunked uploads in the style of the tus protocol (https://tus.io)
+
+    POST   /api/uploads/        Upload-Length (или Upload-Defer-Length: 1), Upload-Metadata -> 201, Location
+    HEAD   /api/uploads/<id>/   -> Upload-Offset, Upload-Length
+    PATCH  /api/uploads/<id>/   Upload-Offset, Upload-Checksum: sha256 <base64>,
+                                Upload-Length (последний чанк потоковой загрузки),
+                                Upload-Duration (секунд аудио в принятых данных)
+    DELETE /api/uploads/<id>/   отмена загрузки
+
+Тело PATCH читается блоками во временный файл и под блокировкой сессии
+дописывается в итоговый файл, поэтому память на загрузку ограничена размером
+блока, а обрыв сети стоит только недокачанного чанка: клиент узнает принятое
+смещение через HEAD и продолжает.
+
+Потоковая загрузка: браузер отправляет куски MediaRecorder (timeslice) по ходу
+записи, размер файла сообщается только с последним чанком. Пока запись идет,
+принятое начало распознается заранее (transcribe_upload_prefix_task).
+"""
+import base64
+import binascii
+import hashlib
+import logging
+import math
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .models import Recording, TranscriptionCheckpoint, UploadSession, audio_upload_path
+from .services.audio_service import AudioService
+
+logger = logging.getLogger(__name__)
+
+TUS_VERSION = '1.0.0'
+READ_BLOCK_SIZE = 64 * 1024
+
+# Сигнатуры начала поддерживаемых контейнеров: (смещение, байты)
+AUDIO_SIGNATURES = [
+    (0, b'RIFF'),                # wav
+    (0, b'ID3'),                 # mp3 с тегами
+    (0, b'\xff\xfb'), (0, b'\xff\xf3'), (0, b'\xff\xf2'),  # mp3 frame sync
+    (0, b'fLaC'),                # flac
+    (0, b'OggS'),                # ogg/opus
+    (0, b'\x1a\x45\xdf\xa3'),    # webm/matroska (EBML)
+    (4, b'ftyp'),                # m4a/mp4
+    (0, b'\x30\x26\xb2\x75'),    # wma (ASF)
+]
+
+
+class UploadError(Exception):
+    """Upload request rejected, status - HTTP код ответа"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_metadata(header: str) -> Dict[str, str]:
+    """Parse Upload-Metadata: "key base64value,key2 base64value2" """
+    metadata = {}
+    for pair in filter(None, (item.strip() for item in (header or '').split(','))):
+        key, _, value = pair.partition(' ')
+        try:
+            metadata[key] = base64.b64decode(value).decode('utf-8') if value else ''
+        except (binascii.Error, UnicodeDecodeError):
+            raise UploadError(f'Некорректное значение метаданных {key}')
+    return metadata
+
+
+def parse_duration(header: Optional[str]) -> Optional[float]:
+    """Parse Upload-Duration (секунды аудио в принятых данных), ValueError для некорректного значения"""
+    if header is None:
+        return None
+    duration = float(header)
+    # float() принимает nan и inf - длительность попадает в запись и в границу префикса
+    if not (math.isfinite(duration) and duration >= 0):
+        raise ValueError(header)
+    return duration
+
+
+def looks_like_audio(header: bytes) -> bool:
+    """Check container signature of the first bytes (файл отклоняется до загрузки остального)"""
+    return any(header[offset:offset + len(magic)] == magic for offset, magic in AUDIO_SIGNATURES)
+
+
+class _FileHashers:
+    """
+    SHA-256 of whole uploads kept between PATCH requests of one process
+
+    Состояние hashlib нельзя сохранить в БД, поэтому хеш досчитывается в памяти
+    процесса, пока чанки приходят в тот же процесс по порядку. Если цепочка
+    прервалась (другой воркер, перезапуск), хеш считается по файлу при завершении.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # upload id -> (offset, hasher)
+        self._lock = threading.Lock()
+
+    def get(self, upload_id, offset: int):
+        with self._lock:
+            if offset == 0:
+                return hashlib.sha256()
+            entry = self._entries.get(upload_id)
+            if entry is None or entry[0] != offset:
+                return None
+            return entry[1].copy()
+
+    def put(self, upload_id, offset: int, hasher):
+        with self._lock:
+            self._entries[upload_id] = (offset, hasher)
+            self._entries.move_to_end(upload_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, upload_id, offset: int) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.pop(upload_id, None)
+        if entry is not None and entry[0] == offset:
+            return entry[1].hexdigest()
+        return None
+
+
+_hashers = _FileHashers()
+
+
+def get_max_upload_size() -> int:
+    return getattr(settings, 'MAX_CHUNKED_UPLOAD_SIZE', getattr(settings, 'MAX_AUDIO_FILE_SIZE', 100 * 1024 * 1024))
+
+
+def _check_length(length: int):
+    max_size = get_max_upload_size()
+    if length <= 0:
+        raise UploadError('Пустой файл')
+    if length > max_size:
+        raise UploadError(f'Размер файла слишком большой. Максимальный размер: {max_size / (1024*1024):.0f} MB', 413)
+
+
+def create_session(user, length: Optional[int], metadata: Dict[str, str]) -> UploadSession:
+    """Reserve final file in storage and create upload session (length=None - размер сообщат позже)"""
+    if length is not None:
+        _check_length(length)
+
+    filename = Path(metadata.get('filename') or 'recording.webm').name
+    if Path(filename).suffix.lower() not in AudioService.get_supported_formats():
+        raise UploadError(f'Неподдерживаемый формат файла: {Path(filename).suffix}', 415)
+
+    # Пустой файл в итоговом месте: чанки дописываются в него, копирования при завершении нет
+    file_name = default_storage.save(audio_upload_path(SimpleNamespace(user=user), filename), ContentFile(b''))
+    session = UploadSession.objects.create(user=user, file_name=file_name, length=length, metadata=metadata)
+    logger.info(f"Начата загрузка {session.id}: user={user.username}, файл={file_name}, размер={length}")
+    return session
+
+
+def _parse_checksum(header: Optional[str]) -> Optional[bytes]:
+    """Upload-Checksum: "sha256 <base64>" (другие алгоритмы не поддерживаются)"""
+    if not header:
+        return None
+    algorithm, _, value = header.strip().partition(' ')
+    if algorithm.lower() != 'sha256':
+        raise UploadError(f'Алгоритм контрольной суммы {algorithm} не поддерживается')
+    try:
+        return base64.b64decode(value)
+    except binascii.Error:
+        raise UploadError('Некорректная контрольная сумма')
+
+
+def _check_chunk(session: UploadSession, offset: int, content_length: int, upload_length: Optional[int]):
+    """Validate offset and sizes of the next chunk against the session"""
+    if offset != session.offset:
+        raise UploadError(f'Ожидалось смещение {session.offset}', 409)
+    if upload_length is not None:
+        if session.length is not None and session.length != upload_length:
+            raise UploadError('Размер загрузки уже задан')
+        _check_length(upload_length)
+    length = session.length if session.length is not None else upload_length
+    if length is None:
+        if offset + content_length > get_max_upload_size():
+            raise UploadError('Размер файла слишком большой', 413)
+    elif offset + content_length > length:
+        raise UploadError('Чанк выходит за объявленный размер файла', 413)
+
+
+def _receive_chunk(stream, content_length: int):
+    """
+    Read request body into a temporary file
+
+    Returns:
+        (file, received, sha256 digest, первые 16 байт)
+    """
+    spooled = tempfile.SpooledTemporaryFile(
+        max_size=READ_BLOCK_SIZE * 16, dir=getattr(settings, 'FILE_UPLOAD_TEMP_DIR', None)
+    )
+    chunk_hasher = hashlib.sha256()
+    received = 0
+    header = b''
+    while received < content_length:
+        block = stream.read(min(READ_BLOCK_SIZE, content_length - received))
+        if not block:
+            break
+        if len(header) < 16:
+            header += block[:16 - len(header)]
+        spooled.write(block)
+        chunk_hasher.update(block)
+        received += len(block)
+    spooled.seek(0)
+    return spooled, received, chunk_hasher.digest(), header
+
+
+def append_chunk(upload_id, user, offset: int, stream, content_length: int,
+                 checksum_header: Optional[str] = None, upload_length: Optional[int] = None,
+                 duration: Optional[float] = None) -> UploadSession:
+    """
+    Append request body to the upload file at offset
+
+    Без контрольной суммы частично полученный чанк (обрыв соединения)
+    сохраняется - клиент продолжит с нового смещения. С контрольной суммой
+    чанк принимается целиком или не принимается вовсе.
+    upload_length задает размер загрузки, начатой без него; duration -
+    длительность аудио в принятых данных (сохраняется в metadata['duration']).
+
+    Тело читается во временный файл до блокировки сессии: медленный клиент не
+    держит транзакцию и строку, под select_for_update только повторная проверка
+    смещения, дописывание с локального диска и обновление offset.
+    """
+    expected_digest = _parse_checksum(checksum_header)
+    max_chunk = getattr(settings, 'UPLOAD_CHUNK_MAX_SIZE', 16 * 1024 * 1024)
+    if content_length > max_chunk:
+        raise UploadError(f'Чанк больше {max_chunk} байт', 413)
+
+    session = UploadSession.objects.filter(pk=upload_id, user=user).first()
+    if session is None:
+        raise UploadError('Загрузка не найдена', 404)
+    if session.is_complete:
+        return session
+    # Неверное смещение отклоняем до чтения тела
+    _check_chunk(session, offset, content_length, upload_length)
+
+    chunk, received, chunk_digest, header = _receive_chunk(stream, content_length)
+    with chunk:
+        if expected_digest is not None and (received != content_length or chunk_digest != expected_digest):
+            raise UploadError('Контрольная сумма чанка не совпадает', 460)
+        if offset == 0 and received and not looks_like_audio(header):
+            raise UploadError('Файл не похож на аудио', 415)
+
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().filter(pk=upload_id, user=user).first()
+            if session is None:
+                raise UploadError('Загрузка не найдена', 404)
+            if session.is_complete:
+                return session
+            # Пока читалось тело, этот же чанк мог принять параллельный запрос
+            _check_chunk(session, offset, content_length, upload_length)
+            if upload_length is not None:
+                session.length = upload_length
+
+            file_hasher = _hashers.get(session.pk, offset)
+            with open(default_storage.path(session.file_name), 'r+b') as f:
+                f.seek(offset)
+                while True:
+                    block = chunk.read(READ_BLOCK_SIZE)
+                    if not block:
+                        break
+                    f.write(block)
+                    if file_hasher is not None:
+                        file_hasher.update(block)
+                f.truncate(offset + received)
+
+            session.offset = offset + received
+            update_fields = ['offset', 'length', 'updated_at']
+            if duration is not None and received == content_length:
+                session.metadata['duration'] = str(duration)
+                update_fields.append('metadata')
+            session.save(update_fields=update_fields)
+            if file_hasher is not None:
+                _hashers.put(session.pk, session.offset, file_hasher)
+    return session
+
+
+def get_file_sha256(session: UploadSession) -> str:
+    """Hash of the complete upload: из памяти процесса или по файлу"""
+    digest = _hashers.pop(session.pk, session.offset)
+    if digest is None:
+        digest = AudioService.compute_sha256(Path(default_storage.path(session.file_name)))
+    return digest
+
+
+def delete_session(session: UploadSession):
+    """Drop unfinished upload together with its file"""
+    if session.recording_id is None and default_storage.exists(session.file_name):
+        default_storage.delete(session.file_name)
+    _hashers.pop(session.pk, -1)
+    session.delete()
+
+
+def apply_model_settings(recording, user_settings, vosk_model=None):
+    """Fill model fields of new recording from request or user defaults"""
+    if recording.recognition_service == 'vosk':
+        # Для Vosk используем vosk_model
+        if vosk_model:
+            recording.vosk_model = vosk_model
+        elif user_settings.default_vosk_model:
+            # Используем модель по умолчанию из настроек
+            recording.vosk_model = user_settings.default_vosk_model
+        recording.whisper_model = None  # Очищаем whisper_model для Vosk
+    else:
+        # Для Whisper/Faster-Whisper используем whisper_model
+        if not recording.whisper_model:
+            recording.whisper_model = user_settings.default_whisper_model
+        recording.vosk_model = None  # Очищаем vosk_model для не-Vosk
+
+
+def build_recording(session: UploadSession, user_settings) -> Recording:
+    """Unsaved Recording for the upload with settings from Upload-Metadata"""
+    from django.utils import timezone
+
+    metadata = session.metadata
+    recognition_service = metadata.get('recognition_service') or user_settings.default_recognition_service or 'faster-whisper'
+    if recognition_service not in dict(Recording.RECOGNITION_SERVICE_CHOICES):
+        raise UploadError(f'Неизвестная библиотека распознавания: {recognition_service}')
+    whisper_model = metadata.get('whisper_model') or None
+    if whisper_model and whisper_model not in dict(Recording.WHISPER_MODEL_CHOICES):
+        raise UploadError(f'Неизвестная модель Whisper: {whisper_model}')
+
+    recording = Recording(
+        user=session.user,
+        title=(metadata.get('title') or '').strip()[:200] or f"Запись {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        audio_file=session.file_name,
+        recognition_service=recognition_service,
+        whisper_model=whisper_model,
+    )
+    apply_model_settings(recording, user_settings, metadata.get('vosk_model'))
+    recording.duration = get_received_duration(session)
+    return recording
+
+
+def get_received_duration(session: UploadSession) -> Optional[float]:
+    try:
+        return float(session.metadata['duration']) if session.metadata.get('duration') else None
+    except ValueError:
+        logger.warning(f"⚠️ Не удалось преобразовать длительность '{session.metadata.get('duration')}'")
+        return None
+
+
+def get_prefix_margin() -> float:
+    """Seconds before the received end that prefix transcription does not commit"""
+    return getattr(settings, 'UPLOAD_STREAM_PREFIX_MARGIN', 5)
+
+
+def _prefix_claim_key(upload_id):
+    return f'upload-prefix:{upload_id}'
+
+
+def schedule_prefix_transcription(session: UploadSession, user_settings) -> bool:
+    """
+    Queue transcription of the received part of a streaming upload
+
+    Задача ставится, когда с прошлого распознанного начала накопилось
+    UPLOAD_STREAM_PREFIX_INTERVAL секунд аудио; одновременно для загрузки
+    работает не больше одной такой задачи.
+    """
+    from .tasks import get_transcription_queue, transcribe_upload_prefix_task
+
+    interval = getattr(settings, 'UPLOAD_STREAM_PREFIX_INTERVAL', 60)
+    if not interval or not user_settings.auto_transcribe or session.length is not None:
+        return False
+    duration = get_received_duration(session) or 0
+    if duration - get_prefix_margin() - session.prefix_seconds < interval:
+        return False
+    timeout = getattr(settings, 'TRANSCRIPTION_CLAIM_TIMEOUT', 7200)
+    if not cache.add(_prefix_claim_key(session.pk), 1, timeout):
+        return False
+    try:
+        queue = get_transcription_queue(build_recording(session, user_settings))
+    except UploadError:
+        release_prefix_claim(session.pk)
+        return False
+    transcribe_upload_prefix_task.apply_async(args=[str(session.pk)], queue=queue)
+    logger.info(f"Распознавание начала загрузки {session.pk} ({duration:.0f} сек) отправлено в очередь {queue}")
+    return True
+
+
+def release_prefix_claim(upload_id):
+    cache.delete(_prefix_claim_key(upload_id))
+
+
+def adopt_prefix_checkpoint(session: UploadSession, recording: Recording):
+    """
+    Move segments of the transcribed prefix into the checkpoint of the new recording
+
+    Итоговая задача распознавания продолжит с prefix_seconds, если движок,
+    модель и язык не изменились (подпись проверяет Checkpointer).
+    """
+    if session.prefix_seconds <= 0:
+        return
+    TranscriptionCheckpoint.objects.update_or_create(
+        recording=recording,
+        defaults={
+            'signature': session.prefix_signature,
+            'processed_seconds': session.prefix_seconds,
+            'segments': session.prefix_segments,
+        },
+    )
+    logger.info(f"Запись {recording.pk}: начало до {session.prefix_seconds:.1f} сек распознано во время записи")
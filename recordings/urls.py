@@ -19,6 +19,8 @@ urlpatterns = [
     path('recordings/upload/', views.upload_recording_view, name='upload_recording'),
     path('recordings/<int:pk>/transcribe/', views.transcribe_recording_view, name='transcribe_recording'),
     path('recordings/<int:pk>/cancel-transcription/', views.cancel_transcription_view, name='cancel_transcription'),
+    path('recordings/<int:pk>/audio/', views.stream_audio_view, name='stream_audio'),
+    path('recordings/<int:pk>/waveform/', views.recording_waveform_view, name='recording_waveform'),
     path('recordings/<int:pk>/download/', views.download_audio_view, name='download_audio'),
     path('recordings/<int:pk>/download-transcription/', views.download_transcription_view, name='download_transcription'),
     path('recordings/<int:pk>/delete/', views.delete_recording_view, name='delete_recording'),
@@ -26,5 +28,11 @@ urlpatterns = [
     # API
     path('api/dashboard-status/', views.dashboard_status_api, name='dashboard_status_api'),
     path('api/recordings/<int:recording_id>/status/', views.recording_status_api, name='recording_status_api'),
+    path('api/recordings/<int:recording_id>/segments/', views.recording_segments_api, name='recording_segments_api'),
+    path('api/uploads/', views.upload_sessions_api, name='upload_sessions_api'),
+    path('api/uploads/<uuid:upload_id>/', views.upload_session_api, name='upload_session_api'),
+    
+    # Мониторинг (путь без слеша - по умолчанию у Prometheus)
+    path('metrics', views.metrics_view, name='metrics'),
 ]
 
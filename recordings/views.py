@@ -4,19 +4,24 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
-from django.http import JsonResponse, FileResponse, Http404
+from django.http import JsonResponse, HttpResponse
 from django.views.decorators.http import require_http_methods
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.core.paginator import Paginator
-from django.db.models import Q
 from django.conf import settings
-import os
+from django.db import transaction
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
 import logging
-from pathlib import Path
 
-from .models import Recording, UserSettings
+from .models import Recording, UploadSession, UserSettings
 from .forms import RecordingForm, UserSettingsForm
-from .services.audio_service import AudioService
-from .tasks import transcribe_recording_task
+from .upload_handlers import AudioHashUploadHandler
+from .tasks import enqueue_ingest, enqueue_transcription, get_transcription_queue, clear_recording_claim
+from . import scheduler
+from .progress import get_progress
+from .search import add_headlines, search_recordings
+from . import dashboard, media, metrics, uploads
 
 logger = logging.getLogger(__name__)
 
@@ -69,16 +74,19 @@ def dashboard_view(request):
     """Main dashboard"""
     user_settings, _ = UserSettings.objects.get_or_create(user=request.user)
     
-    # Статистика
-    total_recordings = Recording.objects.filter(user=request.user).count()
-    completed_recordings = Recording.objects.filter(user=request.user, status='completed').count()
-    processing_recordings = Recording.objects.filter(user=request.user, status__in=['processing', 'uploaded']).count()
+    # Статистика (из кеша, одним запросом при промахе)
+    stats = dashboard.get_snapshot(request.user.id)
+    total_recordings = stats['total_recordings']
+    completed_recordings = stats['completed_recordings']
+    processing_recordings = stats['processing_recordings']
     
     # Последние записи (упорядочить по дате создания)
-    recent_recordings = Recording.objects.filter(user=request.user).order_by('-created_at')[:10]
+    recent_recordings = list(
+        Recording.objects.filter(user=request.user).without_transcription().order_by('-created_at')[:dashboard.RECENT_LIMIT]
+    )
     
     # Логирование для отладки
-    logger.info(f"Дашборд для пользователя {request.user.username}: всего={total_recordings}, завершено={completed_recordings}, обработка={processing_recordings}, недавних={recent_recordings.count()}")
+    logger.info(f"Дашборд для пользователя {request.user.username}: всего={total_recordings}, завершено={completed_recordings}, обработка={processing_recordings}, недавних={len(recent_recordings)}")
     for rec in recent_recordings:
         logger.debug(f"  Запись {rec.id}: {rec.title}, статус={rec.status}, файл={rec.audio_file.name if rec.audio_file else 'нет'}")
     
@@ -99,70 +107,88 @@ def dashboard_view(request):
 
 
 @login_required
+@metrics.timed_api('dashboard_status_api')
 def dashboard_status_api(request):
     """API для получения статуса записей для реактивного обновления"""
-    from django.core import serializers
-    from django.http import JsonResponse
-    
-    # Статистика
-    total_recordings = Recording.objects.filter(user=request.user).count()
-    completed_recordings = Recording.objects.filter(user=request.user, status='completed').count()
-    processing_recordings = Recording.objects.filter(user=request.user, status__in=['processing', 'uploaded']).count()
-    
-    # Последние записи с их статусами
-    recent_recordings = Recording.objects.filter(user=request.user).order_by('-created_at')[:10]
-    
-    recordings_data = []
-    for rec in recent_recordings:
-        recordings_data.append({
-            'id': rec.id,
-            'title': rec.title,
-            'status': rec.status,
-            'status_display': rec.get_status_display(),
-            'created_at': rec.created_at.isoformat(),
-            'processed_at': rec.processed_at.isoformat() if rec.processed_at else None,
-            'has_transcription': bool(rec.transcription),
-        })
-    
-    return JsonResponse({
-        'total_recordings': total_recordings,
-        'completed_recordings': completed_recordings,
-        'processing_recordings': processing_recordings,
-        'recordings': recordings_data,
-    })
+    # Снимок из кеша сбрасывается сигналами при изменении записей пользователя,
+    # поэтому повторный опрос без изменений не обращается к базе
+    return JsonResponse(dashboard.get_snapshot(request.user.id))
 
 
 @login_required
+@metrics.timed_api('recording_status_api')
 def recording_status_api(request, recording_id):
     """API для получения статуса конкретной записи"""
     from django.http import JsonResponse
     
-    recording = get_object_or_404(Recording, pk=recording_id, user=request.user)
+    # Опрашивается каждые несколько секунд - текст транскрипции не загружаем,
+    # клиент получает сегменты отдельно через segments_url
+    recording = get_object_or_404(Recording.objects.without_transcription(), pk=recording_id, user=request.user)
+    queue = get_transcription_queue(recording)
+    # Доля обработанного аудио и оценка оставшегося времени (из кеша, без запросов к БД)
+    progress = get_progress(recording.id) if recording.status == 'processing' else {}
     
     return JsonResponse({
         'id': recording.id,
         'title': recording.title,
         'status': recording.status,
         'status_display': recording.get_status_display(),
-        'transcription': recording.transcription if recording.transcription else '',
         'error_message': recording.error_message if recording.error_message else '',
         'processed_at': recording.processed_at.isoformat() if recording.processed_at else None,
-        'has_transcription': bool(recording.transcription),
+        'has_transcription': recording.has_transcription,
+        'segments_url': reverse('recording_segments_api', args=[recording.id]) if recording.has_transcription else None,
+        'queue': queue,
+        # Место среди ожидающих запуска задач очереди (None - задача уже выполняется или не запланирована)
+        'queue_position': scheduler.get_position(recording.id, queue) if recording.status == 'processing' else None,
+        'progress': progress.get('progress'),
+        'eta_seconds': progress.get('eta_seconds'),
+    })
+
+
+@login_required
+def recording_segments_api(request, recording_id):
+    """
+    API для получения сегментов транскрипции в окне времени
+
+    GET ?start=<сек>&end=<сек> - сегменты, начинающиеся в [start, end).
+    """
+    recording = get_object_or_404(Recording.objects.only('id', 'user'), pk=recording_id, user=request.user)
+    
+    try:
+        start = max(0.0, float(request.GET.get('start', 0)))
+        window = getattr(settings, 'TRANSCRIPT_SEGMENTS_WINDOW', 300)
+        end = float(request.GET.get('end', start + window))
+    except ValueError:
+        return JsonResponse({'error': 'Некорректные параметры start/end'}, status=400)
+    
+    segments = list(
+        recording.segments
+        .filter(start__gte=start, start__lt=end)
+        .values('start', 'end', 'text', 'words')
+    )
+    # Следующее окно начинается с первого сегмента после end (пропускаем паузы без речи)
+    next_start = (
+        recording.segments
+        .filter(start__gte=end)
+        .values_list('start', flat=True)
+        .first()
+    )
+    
+    return JsonResponse({
+        'segments': segments,
+        'next_start': next_start,
     })
 
 
 @login_required
 def recordings_list_view(request):
     """List of all recordings"""
-    recordings = Recording.objects.filter(user=request.user)
+    recordings = Recording.objects.filter(user=request.user).without_transcription()
     
     # Поиск
-    search_query = request.GET.get('search', '')
+    search_query = request.GET.get('search', '').strip()
     if search_query:
-        recordings = recordings.filter(
-            Q(title__icontains=search_query) | 
-            Q(transcription__icontains=search_query)
-        )
+        recordings = search_recordings(recordings, search_query)
     
     # Фильтр по статусу
     status_filter = request.GET.get('status', '')
@@ -174,14 +200,20 @@ def recordings_list_view(request):
     if model_filter:
         recordings = recordings.filter(whisper_model=model_filter)
     
-    # Сортировка
-    sort_by = request.GET.get('sort', '-created_at')
-    recordings = recordings.order_by(sort_by)
+    # Сортировка: при поиске по умолчанию - по релевантности
+    sort_by = request.GET.get('sort', '')
+    if search_query and not sort_by and 'search_rank' in recordings.query.annotations:
+        recordings = recordings.order_by('-search_rank', '-created_at')
+    else:
+        sort_by = sort_by or '-created_at'
+        recordings = recordings.order_by(sort_by)
     
     # Пагинация
     paginator = Paginator(recordings, 12)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    if search_query:
+        add_headlines(page_obj.object_list, search_query)
     
     context = {
         'recordings': page_obj,
@@ -199,19 +231,70 @@ def recordings_list_view(request):
 @login_required
 def recording_detail_view(request, pk):
     """Recording detail view"""
-    recording = get_object_or_404(Recording, pk=pk, user=request.user)
+    # Текст целиком не загружаем: транскрипция с сегментами подгружается окнами через API
+    recording = get_object_or_404(Recording.objects.without_transcription(), pk=pk, user=request.user)
     
+    waveform_version = media.get_waveform_version(recording)
     context = {
         'recording': recording,
+        'has_segments': recording.segments.exists(),
+        'segments_window': getattr(settings, 'TRANSCRIPT_SEGMENTS_WINDOW', 300),
+        'waveform_url': (
+            f"{reverse('recording_waveform', args=[recording.pk])}?v={waveform_version}" if waveform_version else None
+        ),
+        # Время стадий распознавания - только персоналу (служебные данные воркеров)
+        'runs': recording.runs.all()[:10] if request.user.is_staff else None,
     }
     
     return render(request, 'recordings/recording_detail.html', context)
 
 
+def _finish_upload(request, recording, user_settings):
+    """Hand saved recording over to the ingest task and build upload response"""
+    # Проверка файла, длительность, хеш и запуск распознавания - в задаче очереди ввода-вывода:
+    # ответ отправляется, как только файл сохранен, независимо от его размера и формата
+    transaction.on_commit(lambda: enqueue_ingest(recording))
+    
+    if user_settings.auto_transcribe:
+        success_message = 'Запись загружена. Распознавание начнется после проверки файла.'
+    else:
+        success_message = 'Запись успешно загружена.'
+    
+    logger.info(f"✅ Запись {recording.id} ПРИНЯТА: user={recording.user.username}, title={recording.title}, file={recording.audio_file.name}, передана на проверку")
+    
+    # Если это AJAX запрос, вернуть JSON
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        from django.urls import reverse
+        response_data = {
+            'success': True,
+            'message': success_message,
+            'recording_id': recording.id,
+            'recording_title': recording.title,
+            'auto_transcribe': user_settings.auto_transcribe
+        }
+        # Если автоматическое распознавание выключено, добавляем redirect_url
+        if not user_settings.auto_transcribe:
+            response_data['redirect_url'] = reverse('recording_detail', args=[recording.pk])
+        return JsonResponse(response_data)
+    
+    messages.success(request, success_message)
+    return redirect('recording_detail', pk=recording.pk)
+
+
+@csrf_exempt
 @login_required
 @require_http_methods(["POST"])
 def upload_recording_view(request):
     """Upload new recording"""
+    # Обработчик хеширования нужно добавить до первого обращения к request.POST/FILES,
+    # поэтому CSRF проверяется уже во вложенной view (см. документацию Django по upload handlers)
+    request.upload_handlers.insert(0, AudioHashUploadHandler(request))
+    return _upload_recording(request)
+
+
+@csrf_protect
+def _upload_recording(request):
+    """Validate and save uploaded recording"""
     # Проверка размера файла
     if 'audio_file' in request.FILES:
         audio_file = request.FILES['audio_file']
@@ -239,6 +322,8 @@ def upload_recording_view(request):
     if form.is_valid():
         recording = form.save(commit=False)
         recording.user = request.user
+        # Хеш содержимого посчитан во время загрузки (ключ кеша распознавания)
+        recording.audio_sha256 = getattr(request, 'upload_sha256', {}).get('audio_file')
         
         # Если название не указано, сгенерировать автоматически
         if not recording.title or recording.title.strip() == '':
@@ -250,20 +335,7 @@ def upload_recording_view(request):
             recording.recognition_service = user_settings.default_recognition_service or 'faster-whisper'
         
         # Получить модель из формы
-        if recording.recognition_service == 'vosk':
-            # Для Vosk используем vosk_model
-            vosk_model = request.POST.get('vosk_model') or request.GET.get('vosk_model')
-            if vosk_model:
-                recording.vosk_model = vosk_model
-            elif user_settings.default_vosk_model:
-                # Используем модель по умолчанию из настроек
-                recording.vosk_model = user_settings.default_vosk_model
-            recording.whisper_model = None  # Очищаем whisper_model для Vosk
-        else:
-            # Для Whisper/Faster-Whisper используем whisper_model
-            if not recording.whisper_model:
-                recording.whisper_model = user_settings.default_whisper_model
-            recording.vosk_model = None  # Очищаем vosk_model для не-Vosk
+        uploads.apply_model_settings(recording, user_settings, request.POST.get('vosk_model') or request.GET.get('vosk_model'))
         
         # Получить длительность из формы, если передана
         duration_from_form = request.POST.get('duration')
@@ -276,77 +348,12 @@ def upload_recording_view(request):
         else:
             logger.warning("⚠️ Длительность не передана в форме")
         
-        # Сохранить запись в БД сначала (чтобы получить путь к файлу)
-        # Это важно - файл должен быть сохранен на диск перед проверкой
+        # Файл сохраняется на диск вместе с записью, проверяет его задача ingest
+        recording.status = 'ingesting'
         recording.save()
         logger.info(f"✅ Запись {recording.id} СОЗДАНА в БД: user={request.user.username}, title={recording.title}, file={recording.audio_file.name}")
         
-        # Проверить файл и получить информацию
-        audio_service = AudioService()
-        try:
-            # Проверить валидность файла
-            if not audio_service.is_valid_audio_file(Path(recording.audio_file.path)):
-                # Удалить запись если файл невалидный
-                recording.delete()
-                error_msg = 'Некорректный аудио файл'
-                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                    return JsonResponse({'success': False, 'error': error_msg}, status=400)
-                messages.error(request, error_msg)
-                return redirect('recordings_list')
-            
-            # Получить информацию об аудио
-            audio_info = audio_service.get_audio_info(Path(recording.audio_file.path))
-            
-            # Использовать длительность из формы, если передана (для webm файлов это более надежно)
-            # Если длительность не была передана из формы, попытаться получить из файла
-            if not recording.duration or recording.duration == 0:
-                file_duration = audio_info.get('duration')
-                if file_duration:
-                    recording.duration = file_duration
-            
-            # Обновить запись с информацией об аудио
-            recording.save()
-            logger.info(f"✅ Запись {recording.id} УСПЕШНО СОХРАНЕНА в БД: title={recording.title}, file={recording.audio_file.name}, size={recording.get_file_size()}MB, duration={recording.duration}")
-        except Exception as e:
-            # Удалить запись при ошибке
-            recording.delete()
-            error_msg = f'Ошибка обработки файла: {str(e)}'
-            logger.error(f"❌ Ошибка обработки аудио файла: {e}", exc_info=True)
-            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                return JsonResponse({'success': False, 'error': error_msg}, status=400)
-            messages.error(request, error_msg)
-            return redirect('recordings_list')
-        
-        # Автоматическое распознавание если включено
-        if user_settings.auto_transcribe:
-            task = transcribe_recording_task.delay(recording.id)
-            recording.status = 'processing'
-            recording.celery_task_id = task.id
-            recording.save()
-            success_message = 'Запись загружена. Распознавание начато.'
-            logger.info(f"Запущено автоматическое распознавание для записи {recording.id}")
-        else:
-            success_message = 'Запись успешно загружена.'
-        
-        logger.info(f"✅✅✅ Запись {recording.id} ПОЛНОСТЬЮ ГОТОВА: user={recording.user.username}, title={recording.title}, status={recording.status}, file={recording.audio_file.name}")
-        
-        # Если это AJAX запрос, вернуть JSON
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            from django.urls import reverse
-            response_data = {
-                'success': True,
-                'message': success_message,
-                'recording_id': recording.id,
-                'recording_title': recording.title,
-                'auto_transcribe': user_settings.auto_transcribe
-            }
-            # Если автоматическое распознавание выключено, добавляем redirect_url
-            if not user_settings.auto_transcribe:
-                response_data['redirect_url'] = reverse('recording_detail', args=[recording.pk])
-            return JsonResponse(response_data)
-        
-        messages.success(request, success_message)
-        return redirect('recording_detail', pk=recording.pk)
+        return _finish_upload(request, recording, user_settings)
     else:
         error_message = 'Ошибка при загрузке файла: ' + ', '.join([str(e) for e in form.errors.values()])
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -355,6 +362,123 @@ def upload_recording_view(request):
         return redirect('recordings_list')
 
 
+def _with_upload_headers(response, session):
+    response['Tus-Resumable'] = uploads.TUS_VERSION
+    response['Upload-Offset'] = str(session.offset)
+    if session.length is None:
+        response['Upload-Defer-Length'] = '1'
+    else:
+        response['Upload-Length'] = str(session.length)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def _create_recording_from_upload(upload_id, user, user_settings):
+    """Turn completed upload session into Recording (один раз, даже при повторе последнего чанка)"""
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().select_related('user').get(pk=upload_id, user=user)
+        if session.recording_id is not None:
+            return session.recording, False
+        
+        recording = uploads.build_recording(session, user_settings)
+        recording.status = 'ingesting'
+        # Хеш досчитан по мере приема чанков (или по файлу, если чанки шли в разные процессы)
+        recording.audio_sha256 = uploads.get_file_sha256(session)
+        recording.save()
+        
+        session.recording = recording
+        session.save(update_fields=['recording', 'updated_at'])
+        # Начало, распознанное во время потоковой записи, итоговая задача не декодирует
+        uploads.adopt_prefix_checkpoint(session, recording)
+    logger.info(f"✅ Запись {recording.id} СОЗДАНА из загрузки {session.id}: user={user.username}, file={recording.audio_file.name}")
+    return recording, True
+
+
+@login_required
+@require_http_methods(["POST"])
+def upload_sessions_api(request):
+    """Create resumable upload (tus creation): Upload-Length или Upload-Defer-Length и Upload-Metadata"""
+    # Потоковая загрузка во время записи: размер станет известен с последним чанком
+    deferred = request.headers.get('Upload-Defer-Length') == '1'
+    try:
+        length = None if deferred else int(request.headers.get('Upload-Length', ''))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Не указан Upload-Length'}, status=400)
+    
+    try:
+        metadata = uploads.parse_metadata(request.headers.get('Upload-Metadata', ''))
+        session = uploads.create_session(request.user, length, metadata)
+    except uploads.UploadError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=e.status)
+    
+    response = JsonResponse({
+        'success': True,
+        'upload_id': str(session.id),
+        'chunk_size': getattr(settings, 'UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024),
+    }, status=201)
+    response['Location'] = reverse('upload_session_api', args=[session.id])
+    return _with_upload_headers(response, session)
+
+
+@login_required
+@require_http_methods(["HEAD", "PATCH", "DELETE"])
+def upload_session_api(request, upload_id):
+    """Offset query (HEAD), chunk append (PATCH) and termination (DELETE) of an upload"""
+    if request.method == 'HEAD':
+        session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+        response = _with_upload_headers(HttpResponse(status=200), session)
+        if session.recording_id:
+            response['Upload-Recording-Id'] = str(session.recording_id)
+        return response
+    
+    if request.method == 'DELETE':
+        session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+        uploads.delete_session(session)
+        return HttpResponse(status=204, headers={'Tus-Resumable': uploads.TUS_VERSION})
+    
+    if request.content_type != 'application/offset+octet-stream':
+        return JsonResponse({'success': False, 'error': 'Ожидается application/offset+octet-stream'}, status=415)
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Не указан Upload-Offset'}, status=400)
+    try:
+        upload_length = int(request.headers['Upload-Length']) if 'Upload-Length' in request.headers else None
+        duration = uploads.parse_duration(request.headers.get('Upload-Duration'))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Некорректный Upload-Length или Upload-Duration'}, status=400)
+    
+    try:
+        # Тело читается из потока запроса блоками, request.body не используется
+        session = uploads.append_chunk(
+            upload_id, request.user, offset, request, content_length,
+            request.headers.get('Upload-Checksum'), upload_length, duration,
+        )
+        user_settings, _ = UserSettings.objects.get_or_create(user=request.user)
+        if not session.is_complete:
+            if session.length is None:
+                # Запись еще идет - принятое начало можно распознавать уже сейчас
+                uploads.schedule_prefix_transcription(session, user_settings)
+            return _with_upload_headers(HttpResponse(status=204), session)
+        
+        recording, created = _create_recording_from_upload(upload_id, request.user, user_settings)
+    except uploads.UploadError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=e.status)
+    
+    if not created:
+        # Повтор последнего чанка после потерянного ответа
+        return _with_upload_headers(JsonResponse({
+            'success': True,
+            'message': 'Запись уже загружена.',
+            'recording_id': recording.id,
+            'recording_title': recording.title,
+            'auto_transcribe': user_settings.auto_transcribe,
+            'redirect_url': reverse('recording_detail', args=[recording.pk]),
+        }), session)
+    return _with_upload_headers(_finish_upload(request, recording, user_settings), session)
+
+
 @login_required
 @require_http_methods(["POST"])
 def transcribe_recording_view(request, pk):
@@ -367,6 +491,13 @@ def transcribe_recording_view(request, pk):
         messages.warning(request, 'Распознавание уже выполняется')
         return redirect('recording_detail', pk=recording.pk)
     
+    if recording.status == 'ingesting':
+        # Распознавание запустит задача проверки файла, если оно включено в настройках
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({'success': False, 'error': 'Файл еще проверяется, попробуйте через несколько секунд'}, status=409)
+        messages.warning(request, 'Файл еще проверяется, попробуйте через несколько секунд')
+        return redirect('recording_detail', pk=recording.pk)
+    
     # Получить библиотеку распознавания из запроса (если указана)
     recognition_service = request.POST.get('recognition_service') or request.GET.get('recognition_service')
     if recognition_service:
@@ -388,15 +519,16 @@ def transcribe_recording_view(request, pk):
                 recording.whisper_model = whisper_model
                 logger.info(f"Использована модель {whisper_model} для повторного распознавания записи {recording.id}")
     
-    if recognition_service:
-        recording.save()
-    
-    # Запустить задачу распознавания
-    task = transcribe_recording_task.delay(recording.id)
+    # Статус сохраняется до постановки задачи: из кеша распознавания задача может
+    # завершиться раньше, чем вернется enqueue_transcription (планировщик отправляет
+    # ее сразу), и полное сохранение после этого вернуло бы запись в processing
     recording.status = 'processing'
-    recording.celery_task_id = task.id
     recording.save()
     
+    # Запустить задачу распознавания
+    task = enqueue_transcription(recording)
+    Recording.objects.filter(pk=recording.pk, status='processing').update(celery_task_id=task.id)
+    
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({
             'success': True,
@@ -434,6 +566,12 @@ def cancel_transcription_view(request, pk):
         except Exception as e:
             logger.warning(f"Не удалось отменить задачу {recording.celery_task_id}: {e}")
     
+    # Снять захват записи, иначе ее задача (или пакет, в который она попала)
+    # будет считаться выполняющейся до истечения таймаута
+    clear_recording_claim(recording.id)
+    # Освободить слот планировщика (задача, убитая revoke, сама его не вернет)
+    scheduler.release(recording.id)
+    
     # Изменить статус записи обратно на uploaded
     recording.status = 'uploaded'
     recording.celery_task_id = None
@@ -454,19 +592,21 @@ def cancel_transcription_view(request, pk):
 def download_audio_view(request, pk):
     """Download audio file"""
     recording = get_object_or_404(Recording, pk=pk, user=request.user)
-    
-    if not recording.audio_file:
-        raise Http404("Файл не найден")
-    
-    file_path = recording.audio_file.path
-    if not os.path.exists(file_path):
-        raise Http404("Файл не найден")
-    
-    return FileResponse(
-        open(file_path, 'rb'),
-        as_attachment=True,
-        filename=recording.get_file_name()
-    )
+    return media.serve_recording_audio(request, recording, as_attachment=True)
+
+
+@login_required
+def stream_audio_view(request, pk):
+    """Audio file for the player (Range-запросы при перемотке)"""
+    recording = get_object_or_404(Recording.objects.without_transcription(), pk=pk, user=request.user)
+    return media.serve_recording_audio(request, recording)
+
+
+@login_required
+def recording_waveform_view(request, pk):
+    """Precomputed waveform peaks for the player"""
+    recording = get_object_or_404(Recording.objects.without_transcription(), pk=pk, user=request.user)
+    return media.serve_recording_waveform(request, recording)
 
 
 @login_required
@@ -529,4 +669,17 @@ def settings_view(request):
     return render(request, 'recordings/settings.html', context)
 
 
-
+def metrics_view(request):
+    """
+    Prometheus metrics of the web processes
+
+    Без входа в систему: сборщик метрик передает METRICS_TOKEN в заголовке
+    Authorization: Bearer <токен> (если токен не задан - доступ открыт, снаружи
+    endpoint закрывает nginx).
+    """
+    if not metrics.is_enabled():
+        return HttpResponse(status=404)
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=403)
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE_LATEST)
@@ -1,3 +1,110 @@
+// Живое распознавание через WebSocket (Vosk): PCM 16 kHz отправляется во время записи
+class LiveTranscriptionStream {
+    constructor({ voskModel, title, onPartial, onFinal }) {
+        this.voskModel = voskModel;
+        this.title = title;
+        this.onPartial = onPartial;
+        this.onFinal = onFinal;
+        this.targetSampleRate = 16000;
+        this.socket = null;
+        this.processor = null;
+        this.source = null;
+        this.completion = null;
+    }
+
+    connect() {
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        const params = new URLSearchParams();
+        if (this.voskModel) {
+            params.append('vosk_model', this.voskModel);
+        }
+        if (this.title) {
+            params.append('title', this.title);
+        }
+
+        this.socket = new WebSocket(`${protocol}//${window.location.host}/ws/live-transcription/?${params}`);
+        this.socket.binaryType = 'arraybuffer';
+
+        // Промис завершается, когда сервер сохранит запись (событие completed)
+        this.completion = new Promise((resolve, reject) => {
+            this.socket.onmessage = (event) => {
+                const message = JSON.parse(event.data);
+                if (message.type === 'partial' && this.onPartial) {
+                    this.onPartial(message.text);
+                } else if (message.type === 'final' && this.onFinal) {
+                    this.onFinal(message.text);
+                } else if (message.type === 'completed') {
+                    resolve(message);
+                } else if (message.type === 'error') {
+                    reject(new Error(message.error));
+                }
+            };
+            this.socket.onclose = () => reject(new Error('Соединение с сервером распознавания закрыто'));
+        });
+        // Не даем промису упасть необработанным, если stop() так и не вызовут
+        this.completion.catch(() => {});
+
+        return new Promise((resolve, reject) => {
+            this.socket.onopen = () => resolve();
+            this.socket.onerror = () => reject(new Error('Не удалось подключиться к серверу распознавания'));
+        });
+    }
+
+    attach(audioContext, source) {
+        const ratio = audioContext.sampleRate / this.targetSampleRate;
+        this.source = source;
+        this.processor = audioContext.createScriptProcessor(4096, 1, 1);
+        this.processor.onaudioprocess = (event) => {
+            if (!this.socket || this.socket.readyState !== WebSocket.OPEN) {
+                return;
+            }
+            this.socket.send(this.downsample(event.inputBuffer.getChannelData(0), ratio));
+        };
+        source.connect(this.processor);
+        // Без подключения к destination Chrome не вызывает onaudioprocess
+        this.processor.connect(audioContext.destination);
+    }
+
+    detach() {
+        if (this.processor) {
+            this.processor.onaudioprocess = null;
+            if (this.source) {
+                this.source.disconnect(this.processor);
+            }
+            this.processor.disconnect();
+            this.processor = null;
+        }
+    }
+
+    downsample(input, ratio) {
+        const length = Math.floor(input.length / ratio);
+        const output = new Int16Array(length);
+        for (let i = 0; i < length; i++) {
+            // Усреднение отсчетов окна - простейший фильтр против наложения спектров
+            const start = Math.floor(i * ratio);
+            const end = Math.max(Math.min(Math.floor((i + 1) * ratio), input.length), start + 1);
+            let sum = 0;
+            for (let j = start; j < end; j++) {
+                sum += input[j];
+            }
+            const sample = Math.max(-1, Math.min(1, sum / (end - start)));
+            output[i] = sample < 0 ? sample * 0x8000 : sample * 0x7FFF;
+        }
+        return output.buffer;
+    }
+
+    stop() {
+        this.detach();
+        if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+            this.socket.send(JSON.stringify({ type: 'stop' }));
+        }
+        return this.completion;
+    }
+}
+
+// Интервал кусков MediaRecorder при потоковой загрузке во время записи
+const STREAM_TIMESLICE_MS = 5000;
+
 // Audio Recorder для браузера
 class BrowserAudioRecorder {
     constructor() {
@@ -13,6 +120,8 @@ class BrowserAudioRecorder {
         this.onVolumeUpdate = null;
         this.recordingStartTime = null;
         this.recordingTimer = null;
+        this.liveStream = null;
+        this.streamingUpload = null;
     }
 
     async startRecording() {
@@ -35,6 +144,11 @@ class BrowserAudioRecorder {
             this.microphone = this.audioContext.createMediaStreamSource(this.stream);
             this.microphone.connect(this.analyser);
             
+            // В режиме живого распознавания PCM уходит на сервер параллельно с записью
+            if (this.liveStream) {
+                this.liveStream.attach(this.audioContext, this.microphone);
+            }
+            
             const options = {
                 mimeType: 'audio/webm;codecs=opus'
             };
@@ -50,13 +164,21 @@ class BrowserAudioRecorder {
             this.audioChunks = [];
 
             this.mediaRecorder.ondataavailable = (event) => {
-                if (event.data.size > 0) {
+                if (event.data.size === 0) {
+                    return;
+                }
+                if (this.streamingUpload) {
+                    // Кусок сразу уходит на сервер, в памяти запись не копится
+                    this.streamingUpload.push(event.data, (Date.now() - this.recordingStartTime) / 1000);
+                } else {
                     this.audioChunks.push(event.data);
                 }
             };
 
             this.mediaRecorder.onstop = () => {
-                const audioBlob = new Blob(this.audioChunks, { type: this.mediaRecorder.mimeType });
+                // При потоковой загрузке вся запись уже на сервере, Blob не собирается
+                const audioBlob = this.streamingUpload ? null : new Blob(this.audioChunks, { type: this.mediaRecorder.mimeType });
+                this.audioChunks = [];
                 // Вызвать onRecordingComplete ДО сброса isRecording и recordingStartTime
                 // чтобы getRecordingDuration() могла правильно вычислить длительность
                 this.onRecordingComplete(audioBlob);
@@ -71,7 +193,11 @@ class BrowserAudioRecorder {
                 }
             };
 
-            this.mediaRecorder.start();
+            if (this.streamingUpload) {
+                this.mediaRecorder.start(STREAM_TIMESLICE_MS);
+            } else {
+                this.mediaRecorder.start();
+            }
             this.isRecording = true;
             this.recordingStartTime = Date.now();
             
@@ -193,6 +319,9 @@ class BrowserAudioRecorder {
             // Они нужны для getRecordingDuration() в onRecordingComplete
             this.stopVolumeMonitoring();
             this.stopRecordingTimer();
+            if (this.liveStream) {
+                this.liveStream.detach();
+            }
             this.mediaRecorder.stop();
             // isRecording и recordingStartTime будут сброшены после onRecordingComplete
         }
@@ -335,6 +464,119 @@ function initAudioRecorder() {
         }
     };
 
+    // Параметры распознавания для Upload-Metadata
+    function collectUploadMetadata(fileName) {
+        const metadata = { filename: fileName };
+        
+        const titleInput = document.getElementById('recording-title-input');
+        if (titleInput && titleInput.value.trim()) {
+            metadata.title = titleInput.value.trim();
+        } else {
+            const now = new Date();
+            metadata.title = `Запись ${now.toLocaleDateString('ru-RU')} ${now.toLocaleTimeString('ru-RU')}`;
+        }
+
+        // Добавить библиотеку распознавания
+        const serviceSelect = document.getElementById('recognition-service-select');
+        const whisperModelSelect = document.getElementById('whisper-model-select');
+        const voskModelSelect = document.getElementById('vosk-model-select');
+        
+        let recognitionService = 'faster-whisper'; // Значение по умолчанию
+        
+        if (serviceSelect && serviceSelect.value) {
+            recognitionService = serviceSelect.value;
+        }
+        
+        metadata.recognition_service = recognitionService;
+        
+        // Для Vosk отправляем vosk_model, для других - whisper_model
+        if (recognitionService === 'vosk' && voskModelSelect) {
+            metadata.vosk_model = voskModelSelect.value;
+        } else if (recognitionService !== 'vosk' && whisperModelSelect) {
+            metadata.whisper_model = whisperModelSelect.value;
+        }
+        return metadata;
+    }
+
+    function recordingFileName() {
+        const timestamp = new Date().toISOString().replace(/[:.]/g, '-');
+        return `recording_${timestamp}.webm`;
+    }
+
+    // Ответ сервера о завершенной загрузке
+    function handleUploadResult(result) {
+        const statusText = document.getElementById('recording-status-text');
+        console.log('✅ Ответ сервера получен:', result);
+        
+        if (result.success) {
+            if (statusText) {
+                statusText.textContent = result.message || '✅ Запись успешно загружена!';
+            }
+            statusElement.className = 'recording-status success';
+            
+            // Сбросить переменные
+            recordedBlob = null;
+            recordedDuration = 0;
+            console.log('🧹 Переменные сброшены');
+            
+            // Сбросить состояние формы для новой записи
+            resetRecordingForm();
+            console.log('🧹 Форма сброшена');
+            
+            // Если включено автоматическое распознавание, остаемся на странице
+            // и просто обновляем список записей (dashboard.js уже делает это)
+            if (result.auto_transcribe) {
+                console.log('⏳ Автоматическое распознавание включено, ожидание 2 секунды перед сбросом статуса...');
+                // Обновим статус через 2 секунды обратно на "Готов к записи"
+                setTimeout(() => {
+                    console.log('🔄 Запуск resetRecordingStatus()...');
+                    resetRecordingStatus();
+                }, 2000);
+            } else {
+                console.log('↪️ Автоматическое распознавание выключено, редирект через 1.5 секунды...');
+                // Если автоматическое распознавание выключено, делаем редирект на страницу записи
+                setTimeout(() => {
+                    if (result.redirect_url) {
+                        window.location.href = result.redirect_url;
+                    } else {
+                        window.location.reload();
+                    }
+                }, 1500);
+            }
+        } else {
+            // Ошибка при загрузке - сбросить форму
+            resetRecordingForm();
+            resetRecordingStatus();
+            
+            if (statusText) {
+                statusText.textContent = '❌ Ошибка: ' + (result.error || 'Неизвестная ошибка');
+            }
+            statusElement.className = 'recording-status';
+            
+            // Вернуть кнопки в исходное состояние
+            recordButton.disabled = false;
+            stopButton.disabled = true;
+        }
+    }
+
+    function handleUploadError(error) {
+        console.error('Ошибка при загрузке:', error);
+        
+        // Ошибка при загрузке - сбросить форму
+        resetRecordingForm();
+        resetRecordingStatus();
+        
+        const statusText = document.getElementById('recording-status-text');
+        if (statusText) {
+            statusText.textContent = '❌ Ошибка при загрузке: ' + error.message;
+        }
+        statusElement.className = 'recording-status';
+        
+        // Вернуть кнопки в исходное состояние
+        recordButton.disabled = false;
+        stopButton.disabled = true;
+    }
+
     // Функция загрузки записи
     async function uploadRecording() {
         if (!recordedBlob || recordedBlob.size === 0) {
@@ -355,174 +597,134 @@ function initAudioRecorder() {
         console.log('📤 Начало загрузки записи на сервер...');
 
         try {
-            const formData = new FormData();
-            
-            const timestamp = new Date().toISOString().replace(/[:.]/g, '-');
-            const fileName = `recording_${timestamp}.webm`;
+            const fileName = recordingFileName();
             const audioFile = new File([recordedBlob], fileName, { type: recordedBlob.type });
-            formData.append('audio_file', audioFile);
-            
-            const titleInput = document.getElementById('recording-title-input');
-            if (titleInput && titleInput.value.trim()) {
-                formData.append('title', titleInput.value.trim());
-            } else {
-                const now = new Date();
-                const title = `Запись ${now.toLocaleDateString('ru-RU')} ${now.toLocaleTimeString('ru-RU')}`;
-                formData.append('title', title);
-            }
-            
-            // CSRF токен
-            const csrfToken = document.querySelector('[name=csrfmiddlewaretoken]');
-            if (csrfToken) {
-                formData.append('csrfmiddlewaretoken', csrfToken.value);
-            } else {
-                const cookies = document.cookie.split(';');
-                for (let cookie of cookies) {
-                    const [name, value] = cookie.trim().split('=');
-                    if (name === 'csrftoken') {
-                        formData.append('csrfmiddlewaretoken', value);
-                        break;
-                    }
-                }
-            }
-
-            // Добавить библиотеку распознавания
-            const serviceSelect = document.getElementById('recognition-service-select');
-            const whisperModelSelect = document.getElementById('whisper-model-select');
-            const voskModelSelect = document.getElementById('vosk-model-select');
-            
-            let recognitionService = 'faster-whisper'; // Значение по умолчанию
-            
-            if (serviceSelect && serviceSelect.value) {
-                recognitionService = serviceSelect.value;
-            }
-            
-            formData.append('recognition_service', recognitionService);
-            
-            // Для Vosk отправляем vosk_model, для других - whisper_model
-            if (recognitionService === 'vosk' && voskModelSelect) {
-                formData.append('vosk_model', voskModelSelect.value);
-            } else if (recognitionService !== 'vosk' && whisperModelSelect) {
-                formData.append('whisper_model', whisperModelSelect.value);
-            }
+            const metadata = collectUploadMetadata(fileName);
             
             // Добавить длительность записи (в секундах) из таймера
             if (recordedDuration && recordedDuration > 0) {
-                formData.append('duration', recordedDuration.toString());
+                metadata.duration = recordedDuration.toString();
                 console.log(`✅ Отправка длительности на сервер: ${recordedDuration} секунд`);
             } else {
                 console.warn('⚠️ Длительность не установлена или равна 0, recordedDuration:', recordedDuration);
             }
 
-            const response = await fetch(window.location.origin + '/recordings/upload/', {
-                method: 'POST',
-                body: formData,
-                headers: {
-                    'X-Requested-With': 'XMLHttpRequest'
-                }
-            });
-
-            if (response.ok) {
-                const result = await response.json();
-                console.log('✅ Ответ сервера получен:', result);
-                
-                if (result.success) {
-                    const statusText = document.getElementById('recording-status-text');
+            // Загрузка чанками с продолжением после обрыва сети
+            const upload = new ChunkedUpload(audioFile, metadata, {
+                onProgress: (sent, total) => {
                     if (statusText) {
-                        statusText.textContent = result.message || '✅ Запись успешно загружена!';
-                    }
-                    statusElement.className = 'recording-status success';
-                    
-                    // Сбросить переменные
-                    recordedBlob = null;
-                    recordedDuration = 0;
-                    console.log('🧹 Переменные сброшены');
-                    
-                    // Сбросить состояние формы для новой записи
-                    resetRecordingForm();
-                    console.log('🧹 Форма сброшена');
-                    
-                    // Если включено автоматическое распознавание, остаемся на странице
-                    // и просто обновляем список записей (dashboard.js уже делает это)
-                    if (result.auto_transcribe) {
-                        console.log('⏳ Автоматическое распознавание включено, ожидание 2 секунды перед сбросом статуса...');
-                        // Обновим статус через 2 секунды обратно на "Готов к записи"
-                        setTimeout(() => {
-                            console.log('🔄 Запуск resetRecordingStatus()...');
-                            resetRecordingStatus();
-                        }, 2000);
-                    } else {
-                        console.log('↪️ Автоматическое распознавание выключено, редирект через 1.5 секунды...');
-                        // Если автоматическое распознавание выключено, делаем редирект на страницу записи
-                        setTimeout(() => {
-                            if (result.redirect_url) {
-                                window.location.href = result.redirect_url;
-                            } else {
-                                window.location.reload();
-                            }
-                        }, 1500);
+                        statusText.textContent = `Загрузка записи на сервер... ${Math.round(sent / total * 100)}%`;
                     }
-                } else {
-                    // Ошибка при загрузке - сбросить форму
-                    resetRecordingForm();
-                    resetRecordingStatus();
-                    
-                    const statusText = document.getElementById('recording-status-text');
-                    if (statusText) {
-                        statusText.textContent = '❌ Ошибка: ' + (result.error || 'Неизвестная ошибка');
-                    }
-                    statusElement.className = 'recording-status';
-                    
-                    // Вернуть кнопки в исходное состояние
-                    recordButton.disabled = false;
-                    stopButton.disabled = true;
-                }
-            } else {
-                // Ошибка при загрузке - сбросить форму
-                resetRecordingForm();
-                resetRecordingStatus();
-                
-                try {
-                    const errorData = await response.json();
-                    const statusText = document.getElementById('recording-status-text');
-                    if (statusText) {
-                        statusText.textContent = '❌ Ошибка загрузки: ' + (errorData.error || 'Неизвестная ошибка');
-                    }
-                    statusElement.className = 'recording-status';
-                } catch (e) {
-                    const statusText = document.getElementById('recording-status-text');
-                    if (statusText) {
-                        statusText.textContent = '❌ Ошибка загрузки';
-                    }
-                    statusElement.className = 'recording-status';
-                }
-                
-                // Вернуть кнопки в исходное состояние
-                recordButton.disabled = false;
-                stopButton.disabled = true;
+                },
+            });
+            handleUploadResult(await upload.start());
+        } catch (error) {
+            handleUploadError(error);
+        }
+    }
+
+    // Потоковая загрузка: куски записи уходят на сервер во время записи
+    async function startStreamingUpload() {
+        if (typeof StreamingUpload === 'undefined') {
+            recorder.streamingUpload = null;
+            return;
+        }
+        const upload = new StreamingUpload(collectUploadMetadata(recordingFileName()));
+        try {
+            await upload.open();
+            recorder.streamingUpload = upload;
+        } catch (error) {
+            // Без сессии записываем по-старому и загружаем после остановки
+            console.warn('Потоковая загрузка недоступна, запись будет загружена после остановки:', error);
+            recorder.streamingUpload = null;
+        }
+    }
+
+    // После остановки осталось дослать последний кусок - распознанное начало уже на сервере
+    async function finishStreamingUpload(duration) {
+        const statusText = document.getElementById('recording-status-text');
+        if (statusText) {
+            statusText.textContent = 'Завершение загрузки...';
+        }
+        statusElement.className = 'recording-status uploading';
+        try {
+            handleUploadResult(await recorder.streamingUpload.finish(duration));
+        } catch (error) {
+            handleUploadError(error);
+        } finally {
+            recorder.streamingUpload = null;
+        }
+    }
+
+    // Обработчик начала записи
+    // Живое распознавание доступно только для Vosk
+    function isLiveModeSelected() {
+        const serviceSelect = document.getElementById('recognition-service-select');
+        const liveCheckbox = document.getElementById('live-transcription-checkbox');
+        return serviceSelect && serviceSelect.value === 'vosk' && liveCheckbox && liveCheckbox.checked;
+    }
+
+    async function startLiveStream() {
+        const voskModelSelect = document.getElementById('vosk-model-select');
+        const titleInput = document.getElementById('recording-title-input');
+        const container = document.getElementById('live-transcript-container');
+        const finalElement = document.getElementById('live-transcript-final');
+        const partialElement = document.getElementById('live-transcript-partial');
+
+        if (finalElement) finalElement.textContent = '';
+        if (partialElement) partialElement.textContent = '';
+        if (container) container.style.display = 'block';
+
+        recorder.liveStream = new LiveTranscriptionStream({
+            voskModel: voskModelSelect ? voskModelSelect.value : '',
+            title: titleInput ? titleInput.value.trim() : '',
+            onPartial: (text) => {
+                if (partialElement) partialElement.textContent = text;
+            },
+            onFinal: (text) => {
+                if (finalElement) finalElement.textContent += (finalElement.textContent ? ' ' : '') + text;
+                if (partialElement) partialElement.textContent = '';
+            },
+        });
+        await recorder.liveStream.connect();
+    }
+
+    // Завершение живой записи: сервер уже распознал текст, загрузка не нужна
+    async function finishLiveStream() {
+        const statusText = document.getElementById('recording-status-text');
+        if (statusText) {
+            statusText.textContent = 'Сохранение записи...';
+        }
+        try {
+            const result = await recorder.liveStream.stop();
+            if (statusText) {
+                statusText.textContent = '✅ Запись распознана и сохранена';
             }
+            statusElement.className = 'recording-status success';
+            setTimeout(() => {
+                window.location.href = result.redirect_url;
+            }, 1500);
         } catch (error) {
-            console.error('Ошибка при загрузке:', error);
-            
-            // Ошибка при загрузке - сбросить форму
-            resetRecordingForm();
+            console.error('Ошибка живого распознавания:', error);
             resetRecordingStatus();
-            
-            const statusText = document.getElementById('recording-status-text');
             if (statusText) {
-                statusText.textContent = '❌ Ошибка при загрузке: ' + error.message;
+                statusText.textContent = '❌ Ошибка: ' + error.message;
             }
             statusElement.className = 'recording-status';
-            
-            // Вернуть кнопки в исходное состояние
-            recordButton.disabled = false;
-            stopButton.disabled = true;
+        } finally {
+            recorder.liveStream = null;
         }
     }
 
-    // Обработчик начала записи
     recordButton.addEventListener('click', async () => {
         try {
+            if (isLiveModeSelected()) {
+                await startLiveStream();
+                recorder.streamingUpload = null;
+            } else {
+                recorder.liveStream = null;
+                await startStreamingUpload();
+            }
             await recorder.startRecording();
             recordButton.disabled = true;
             stopButton.disabled = false;
@@ -545,6 +747,14 @@ function initAudioRecorder() {
                 volumeIndicatorContainer.style.display = 'block';
             }
         } catch (error) {
+            if (recorder.liveStream) {
+                recorder.liveStream.stop();
+                recorder.liveStream = null;
+            }
+            if (recorder.streamingUpload) {
+                recorder.streamingUpload.abort();
+                recorder.streamingUpload = null;
+            }
             alert('Ошибка доступа к микрофону: ' + error.message);
             console.error(error);
         }
@@ -595,6 +805,12 @@ function initAudioRecorder() {
             console.error('❌ ОШИБКА: длительность равна 0! recordingStartTime:', recorder.recordingStartTime, 'isRecording:', recorder.isRecording);
         }
         
+        if (recorder.streamingUpload) {
+            // Точная длительность: таймер выше округляет до секунд
+            await finishStreamingUpload((Date.now() - recorder.recordingStartTime) / 1000);
+            return;
+        }
+        
         const audioUrl = URL.createObjectURL(audioBlob);
         
         if (audioPreview) {
@@ -617,6 +833,11 @@ function initAudioRecorder() {
             volumeBars.style.display = 'none';
         }
         
+        if (recorder.liveStream) {
+            await finishLiveStream();
+            return;
+        }
+        
         // Автоматически начать загрузку после небольшой задержки
         setTimeout(async () => {
             await uploadRecording();
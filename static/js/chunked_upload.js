@@ -0,0 +1,284 @@
+/**
+ * Resumable chunked upload to /api/uploads/ (протокол в стиле tus)
+ *
+ * Файл отправляется чанками PATCH-запросами; после обрыва сети загрузка
+ * продолжается с принятого сервером смещения (HEAD), а не с нуля. Адрес
+ * незавершенной загрузки хранится в localStorage, поэтому ее можно продолжить
+ * и после перезагрузки страницы, выбрав тот же файл.
+ */
+class ChunkedUpload {
+    constructor(file, metadata, { onProgress = null, endpoint = '/api/uploads/', maxRetries = 5 } = {}) {
+        this.file = file;
+        this.metadata = metadata;
+        this.onProgress = onProgress;
+        this.endpoint = endpoint;
+        this.maxRetries = maxRetries;
+        this.chunkSize = 8 * 1024 * 1024; // сервер присылает свой размер при создании
+        this.url = null;
+        this.offset = 0;
+    }
+
+    static getCsrfToken() {
+        const csrfInput = document.querySelector('[name=csrfmiddlewaretoken]');
+        if (csrfInput) {
+            return csrfInput.value;
+        }
+        for (const cookie of document.cookie.split(';')) {
+            const [name, value] = cookie.trim().split('=');
+            if (name === 'csrftoken') {
+                return value;
+            }
+        }
+        return '';
+    }
+
+    get storageKey() {
+        return `chunked-upload:${this.file.name}:${this.file.size}:${this.file.lastModified || ''}`;
+    }
+
+    headers(extra = {}) {
+        return {
+            'Tus-Resumable': '1.0.0',
+            'X-CSRFToken': ChunkedUpload.getCsrfToken(),
+            'X-Requested-With': 'XMLHttpRequest',
+            ...extra,
+        };
+    }
+
+    encodeMetadata() {
+        return Object.entries(this.metadata)
+            .filter(([, value]) => value !== undefined && value !== null && value !== '')
+            .map(([key, value]) => `${key} ${btoa(unescape(encodeURIComponent(String(value))))}`)
+            .join(',');
+    }
+
+    async start() {
+        this.url = localStorage.getItem(this.storageKey);
+        if (this.url) {
+            const state = await this.queryOffset().catch(() => null);
+            if (state === null) {
+                this.url = null;
+            } else if (state.recordingId) {
+                // Загрузка завершилась, но ответ на последний чанк был потерян
+                localStorage.removeItem(this.storageKey);
+                return { success: true, recording_id: state.recordingId, redirect_url: `/recordings/${state.recordingId}/` };
+            } else {
+                this.offset = state.offset;
+            }
+        }
+        if (!this.url) {
+            await this.create();
+        }
+
+        let retries = 0;
+        while (true) {
+            try {
+                const result = await this.sendChunk();
+                retries = 0;
+                if (result) {
+                    localStorage.removeItem(this.storageKey);
+                    return result;
+                }
+            } catch (error) {
+                if (error.fatal || retries >= this.maxRetries) {
+                    if (error.fatal) {
+                        localStorage.removeItem(this.storageKey);
+                    }
+                    throw error;
+                }
+                retries += 1;
+                // Пауза с ростом и повторный запрос смещения: часть чанка могла дойти
+                await new Promise(resolve => setTimeout(resolve, Math.min(1000 * 2 ** retries, 30000)));
+                const state = await this.queryOffset().catch(() => null);
+                if (state !== null) {
+                    this.offset = state.offset;
+                }
+            }
+        }
+    }
+
+    async create(lengthHeaders = null) {
+        const response = await fetch(this.endpoint, {
+            method: 'POST',
+            headers: this.headers({
+                ...(lengthHeaders || { 'Upload-Length': String(this.file.size) }),
+                'Upload-Metadata': this.encodeMetadata(),
+            }),
+        });
+        const data = await response.json().catch(() => ({}));
+        if (response.status !== 201) {
+            throw this.fatalError(data.error || `Ошибка создания загрузки (${response.status})`);
+        }
+        this.url = response.headers.get('Location');
+        this.chunkSize = data.chunk_size || this.chunkSize;
+        this.offset = 0;
+        if (this.file) {
+            localStorage.setItem(this.storageKey, this.url);
+        }
+    }
+
+    async queryOffset() {
+        const response = await fetch(this.url, { method: 'HEAD', headers: this.headers() });
+        if (response.status === 404) {
+            return null;
+        }
+        if (!response.ok) {
+            throw new Error(`Ошибка запроса смещения (${response.status})`);
+        }
+        return {
+            offset: parseInt(response.headers.get('Upload-Offset'), 10) || 0,
+            recordingId: response.headers.get('Upload-Recording-Id'),
+        };
+    }
+
+    async checksum(chunk) {
+        // crypto.subtle доступен только в безопасном контексте (https, localhost)
+        if (!window.crypto || !window.crypto.subtle) {
+            return null;
+        }
+        const digest = await window.crypto.subtle.digest('SHA-256', await chunk.arrayBuffer());
+        return btoa(String.fromCharCode(...new Uint8Array(digest)));
+    }
+
+    async sendChunk() {
+        return this.patch(this.file.slice(this.offset, this.offset + this.chunkSize));
+    }
+
+    // PATCH с телом chunk по текущему смещению: null - принят, объект - ответ о завершении загрузки
+    async patch(chunk, extraHeaders = {}) {
+        const extra = {
+            ...extraHeaders,
+            'Content-Type': 'application/offset+octet-stream',
+            'Upload-Offset': String(this.offset),
+        };
+        const checksum = await this.checksum(chunk);
+        if (checksum) {
+            extra['Upload-Checksum'] = `sha256 ${checksum}`;
+        }
+
+        const response = await fetch(this.url, { method: 'PATCH', headers: this.headers(extra), body: chunk });
+        if (response.status === 204) {
+            this.offset = parseInt(response.headers.get('Upload-Offset'), 10);
+            if (this.onProgress && this.file) {
+                this.onProgress(this.offset, this.file.size);
+            }
+            return null;
+        }
+
+        const data = await response.json().catch(() => ({}));
+        if (response.ok) {
+            if (this.onProgress && this.file) {
+                this.onProgress(this.file.size, this.file.size);
+            }
+            return data;
+        }
+        if (response.status === 409 || response.status === 460 || response.status >= 500) {
+            // Смещение разошлось, чанк поврежден или сервер недоступен - повторить
+            throw new Error(data.error || `Ошибка загрузки чанка (${response.status})`);
+        }
+        throw this.fatalError(data.error || `Ошибка загрузки (${response.status})`);
+    }
+
+    fatalError(message) {
+        const error = new Error(message);
+        error.fatal = true;
+        return error;
+    }
+
+    async abort() {
+        if (this.url) {
+            await fetch(this.url, { method: 'DELETE', headers: this.headers() }).catch(() => null);
+            localStorage.removeItem(this.storageKey);
+        }
+    }
+}
+
+
+/**
+ * Upload of a recording that is still going on (Upload-Defer-Length)
+ *
+ * Куски MediaRecorder (timeslice) дописываются на сервер по мере появления,
+ * в памяти остается только неотправленный хвост. Размер файла сообщается
+ * с последним чанком в finish(). Пока запись идет, ошибки сети не фатальны:
+ * хвост копится и отправляется после восстановления связи.
+ */
+class StreamingUpload extends ChunkedUpload {
+    constructor(metadata, options = {}) {
+        super(null, metadata, options);
+        this.buffer = new Blob([]);
+        this.duration = 0;
+        this.ready = null;
+        this.sending = null;
+        this.finished = false;
+        this.result = null;
+        this.error = null;
+    }
+
+    open() {
+        this.ready = this.create({ 'Upload-Defer-Length': '1' });
+        return this.ready;
+    }
+
+    // blob - очередной кусок записи, duration - секунд записано к его концу
+    push(blob, duration) {
+        this.buffer = new Blob([this.buffer, blob], { type: blob.type });
+        this.duration = duration;
+        if (!this.sending && !this.error) {
+            this.sending = this.drain()
+                .catch(error => { this.error = error; })
+                .finally(() => { this.sending = null; });
+        }
+    }
+
+    async finish(duration) {
+        this.duration = duration;
+        this.finished = true;
+        if (this.sending) {
+            await this.sending;
+        }
+        if (this.error) {
+            throw this.error;
+        }
+        if (!this.result) {
+            await this.drain();
+        }
+        return this.result;
+    }
+
+    async drain() {
+        await this.ready;
+        let retries = 0;
+        while (!this.result && (this.buffer.size > 0 || this.finished)) {
+            const body = this.buffer.slice(0, this.chunkSize);
+            const extra = {};
+            if (body.size === this.buffer.size) {
+                // Длительность известна только для всего принятого на сервере аудио
+                extra['Upload-Duration'] = String(this.duration);
+                if (this.finished) {
+                    extra['Upload-Length'] = String(this.offset + body.size);
+                }
+            }
+            try {
+                const sentFrom = this.offset;
+                this.result = await this.patch(body, extra);
+                // Во время запроса в буфер могли добавиться новые куски - отрезаем только принятое
+                this.buffer = this.buffer.slice(this.offset - sentFrom);
+                retries = 0;
+            } catch (error) {
+                if (error.fatal || (this.finished && retries >= this.maxRetries)) {
+                    throw error;
+                }
+                retries += 1;
+                await new Promise(resolve => setTimeout(resolve, Math.min(1000 * 2 ** retries, 30000)));
+                const state = await this.queryOffset().catch(() => null);
+                if (state !== null && state.recordingId) {
+                    // Последний чанк принят, но ответ потерян
+                    this.result = { success: true, recording_id: state.recordingId, redirect_url: `/recordings/${state.recordingId}/` };
+                } else if (state !== null && state.offset > this.offset) {
+                    this.buffer = this.buffer.slice(state.offset - this.offset);
+                    this.offset = state.offset;
+                }
+            }
+        }
+    }
+}
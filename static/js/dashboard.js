@@ -6,15 +6,81 @@ class DashboardUpdater {
         this.isUpdating = false;
         this.lastStats = null;
         this.processingRecordings = new Set();
+        this.recordings = new Map();
+        this.pendingUpdate = false;
+        this.eventSource = null;
+        this.eventsUrl = '/events/dashboard/';
     }
 
     init() {
-        // Начать обновление при загрузке страницы
-        this.startUpdating();
+        // Сервер присылает события об изменениях (SSE), опрос - только если поток недоступен
+        if ('EventSource' in window) {
+            this.connectEvents();
+        } else {
+            this.startUpdating();
+        }
         
         // Остановить обновление при уходе со страницы
         window.addEventListener('beforeunload', () => {
             this.stopUpdating();
+            this.disconnectEvents();
+        });
+
+        // Фоновые вкладки не опрашивают сервер, при возврате - сразу обновляем
+        document.addEventListener('visibilitychange', () => {
+            if (this.eventSource) {
+                return;
+            }
+            if (document.hidden) {
+                this.stopUpdating();
+            } else {
+                this.startUpdating();
+            }
+        });
+    }
+
+    connectEvents() {
+        const source = new EventSource(this.eventsUrl);
+        let opened = false;
+        this.eventSource = source;
+
+        // Поток открыт (в том числе после переподключения) - перечитать пропущенные изменения
+        source.addEventListener('ready', () => {
+            opened = true;
+            this.stopUpdating();
+            this.updateStatus();
+        });
+        source.addEventListener('recording', () => {
+            this.updateStatus();
+        });
+        source.addEventListener('progress', (event) => {
+            this.applyProgress(JSON.parse(event.data));
+        });
+        source.onerror = () => {
+            // Временный обрыв браузер переподключит сам; отказ сервера - переход на опрос
+            if (!opened || source.readyState === EventSource.CLOSED) {
+                this.disconnectEvents();
+                this.startUpdating();
+            }
+        };
+    }
+
+    disconnectEvents() {
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
+    }
+
+    applyProgress(data) {
+        data.ids.forEach(id => {
+            const recordingData = this.recordings.get(id);
+            if (!recordingData) {
+                return;
+            }
+            recordingData.progress = data.progress;
+            recordingData.eta_seconds = data.eta_seconds;
+            this.updateRecordings([recordingData]);
         });
     }
 
@@ -41,7 +107,9 @@ class DashboardUpdater {
 
     async updateStatus() {
         if (this.isUpdating) {
-            return; // Предотвращаем параллельные запросы
+            // Предотвращаем параллельные запросы, но не теряем изменение во время запроса
+            this.pendingUpdate = true;
+            return;
         }
 
         this.isUpdating = true;
@@ -62,10 +130,16 @@ class DashboardUpdater {
             console.error('Ошибка при обновлении статуса:', error);
         } finally {
             this.isUpdating = false;
+            if (this.pendingUpdate) {
+                this.pendingUpdate = false;
+                this.updateStatus();
+            }
         }
     }
 
     processStatusUpdate(data) {
+        this.recordings = new Map(data.recordings.map(recordingData => [recordingData.id, recordingData]));
+
         // Обновить статистику
         this.updateStats(data);
 
@@ -112,12 +186,25 @@ class DashboardUpdater {
                 const statusCell = row.querySelector('.status-badge');
                 if (statusCell) {
                     statusCell.className = `status-badge status-${recordingData.status}`;
-                    statusCell.textContent = recordingData.status_display;
+                    statusCell.textContent = recordingData.status_display + this.formatProgress(recordingData);
                 }
             }
         });
     }
 
+    formatProgress(recordingData) {
+        // "Обработка 42% (~3 мин)" - прогресс публикуется задачей распознавания
+        if (recordingData.status !== 'processing' || recordingData.progress === null || recordingData.progress === undefined) {
+            return '';
+        }
+        let text = ` ${Math.round(recordingData.progress * 100)}%`;
+        if (recordingData.eta_seconds !== null && recordingData.eta_seconds !== undefined) {
+            const eta = recordingData.eta_seconds;
+            text += eta < 60 ? ` (~${eta} сек)` : ` (~${Math.ceil(eta / 60)} мин)`;
+        }
+        return text;
+    }
+
     checkCompletedRecordings(recordings) {
         recordings.forEach(recordingData => {
             const recordingId = recordingData.id;
@@ -128,7 +215,7 @@ class DashboardUpdater {
                 // Запись завершилась - показать уведомление
                 this.showCompletionNotification(recordingData);
                 this.processingRecordings.delete(recordingId);
-            } else if (recordingData.status === 'processing' || recordingData.status === 'uploaded') {
+            } else if (['ingesting', 'processing', 'uploaded'].includes(recordingData.status)) {
                 // Добавить в список обрабатываемых
                 this.processingRecordings.add(recordingId);
             } else if (isCompleted) {
@@ -82,8 +82,8 @@ function initFileUpload() {
             return;
         }
 
-        // Проверка размера (100 MB максимум)
-        const maxSize = 100 * 1024 * 1024; // 100 MB
+        // Проверка размера (загрузка идет чанками, 2 GB максимум)
+        const maxSize = 2 * 1024 * 1024 * 1024; // 2 GB
         if (file.size > maxSize) {
             updateStatus(`Ошибка: файл слишком большой (максимум ${maxSize / (1024*1024)} MB)`, 'error');
             fileUploadButton.disabled = true;
@@ -135,16 +135,14 @@ function initFileUpload() {
         updateStatus('Загрузка файла на сервер...', 'uploading');
 
         try {
-            const formData = new FormData();
-            formData.append('audio_file', file);
+            const metadata = { filename: file.name };
 
             // Добавить название
             if (fileTitleInput && fileTitleInput.value.trim()) {
-                formData.append('title', fileTitleInput.value.trim());
+                metadata.title = fileTitleInput.value.trim();
             } else {
                 const now = new Date();
-                const title = `Запись ${now.toLocaleDateString('ru-RU')} ${now.toLocaleTimeString('ru-RU')}`;
-                formData.append('title', title);
+                metadata.title = `Запись ${now.toLocaleDateString('ru-RU')} ${now.toLocaleTimeString('ru-RU')}`;
             }
 
             // Добавить библиотеку распознавания
@@ -155,75 +153,52 @@ function initFileUpload() {
                 recognitionService = fileServiceSelect.value;
             }
             
-            formData.append('recognition_service', recognitionService);
+            metadata.recognition_service = recognitionService;
             
             // Для Vosk отправляем vosk_model, для других - whisper_model
             if (recognitionService === 'vosk' && fileVoskModelSelect) {
-                formData.append('vosk_model', fileVoskModelSelect.value);
+                metadata.vosk_model = fileVoskModelSelect.value;
             } else if (recognitionService !== 'vosk' && fileModelSelect) {
-                formData.append('whisper_model', fileModelSelect.value);
+                metadata.whisper_model = fileModelSelect.value;
             }
 
-            // CSRF токен
-            const csrfToken = document.querySelector('[name=csrfmiddlewaretoken]');
-            if (csrfToken) {
-                formData.append('csrfmiddlewaretoken', csrfToken.value);
-            } else {
-                const cookies = document.cookie.split(';');
-                for (let cookie of cookies) {
-                    const [name, value] = cookie.trim().split('=');
-                    if (name === 'csrftoken') {
-                        formData.append('csrfmiddlewaretoken', value);
-                        break;
-                    }
-                }
-            }
-
-            const response = await fetch(window.location.origin + '/recordings/upload/', {
-                method: 'POST',
-                body: formData,
-                headers: {
-                    'X-Requested-With': 'XMLHttpRequest'
-                }
+            // Загрузка чанками с продолжением после обрыва сети
+            const upload = new ChunkedUpload(file, metadata, {
+                onProgress: (sent, total) => {
+                    updateStatus(`Загрузка файла на сервер... ${Math.round(sent / total * 100)}%`, 'uploading');
+                },
             });
-
-            if (response.ok) {
-                const result = await response.json();
-                console.log('✅ Ответ сервера получен:', result);
+            const result = await upload.start();
+            console.log('✅ Ответ сервера получен:', result);
+            
+            if (result.success) {
+                updateStatus(result.message || '✅ Файл успешно загружен!', 'success');
+                
+                // Очистить форму
+                resetFileUploadForm();
                 
-                if (result.success) {
-                    updateStatus(result.message || '✅ Файл успешно загружен!', 'success');
-                    
-                    // Очистить форму
-                    resetFileUploadForm();
-                    
-                    // Если включено автоматическое распознавание, остаемся на странице
-                    if (result.auto_transcribe) {
-                        setTimeout(() => {
-                            updateStatus('Выберите файл для загрузки', 'ready');
-                        }, 2000);
-                    } else {
-                        // Если автоматическое распознавание выключено, делаем редирект
-                        setTimeout(() => {
-                            if (result.redirect_url) {
-                                window.location.href = result.redirect_url;
-                            } else {
-                                window.location.reload();
-                            }
-                        }, 1500);
-                    }
+                // Если включено автоматическое распознавание, остаемся на странице
+                if (result.auto_transcribe) {
+                    setTimeout(() => {
+                        updateStatus('Выберите файл для загрузки', 'ready');
+                    }, 2000);
                 } else {
-                    updateStatus('❌ Ошибка: ' + (result.error || 'Неизвестная ошибка'), 'error');
-                    fileUploadButton.disabled = false;
+                    // Если автоматическое распознавание выключено, делаем редирект
+                    setTimeout(() => {
+                        if (result.redirect_url) {
+                            window.location.href = result.redirect_url;
+                        } else {
+                            window.location.reload();
+                        }
+                    }, 1500);
                 }
             } else {
-                const errorData = await response.json().catch(() => ({}));
-                updateStatus('❌ Ошибка загрузки: ' + (errorData.error || 'Неизвестная ошибка'), 'error');
+                updateStatus('❌ Ошибка: ' + (result.error || 'Неизвестная ошибка'), 'error');
                 fileUploadButton.disabled = false;
             }
         } catch (error) {
             console.error('Ошибка при загрузке файла:', error);
-            updateStatus('❌ Ошибка: ' + error.message, 'error');
+            updateStatus('❌ Ошибка загрузки: ' + error.message, 'error');
             fileUploadButton.disabled = false;
         }
     }
@@ -356,6 +356,7 @@ document.addEventListener('DOMContentLoaded', function() {
             
             // Обновить текст статуса
             const statusTexts = {
+                'ingesting': 'Проверка файла',
                 'processing': 'В обработке',
                 'completed': 'Завершено',
                 'uploaded': 'Загружено',
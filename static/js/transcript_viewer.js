@@ -0,0 +1,111 @@
+/**
+ * Transcript viewer: loads segments of a recording window by window
+ * and syncs them with the audio player
+ */
+
+class TranscriptViewer {
+    constructor(container, audio, loadMoreButton) {
+        this.container = container;
+        this.audio = audio;
+        this.loadMoreButton = loadMoreButton;
+        this.url = container.dataset.url;
+        this.windowSeconds = parseFloat(container.dataset.window) || 300;
+        this.nextStart = 0;
+        this.isLoading = false;
+        this.activeSegment = null;
+    }
+
+    init() {
+        this.loadMoreButton?.addEventListener('click', () => this.loadNext());
+
+        if (this.audio) {
+            this.audio.addEventListener('timeupdate', () => this.onTimeUpdate());
+        }
+
+        this.loadNext();
+    }
+
+    async loadNext() {
+        if (this.isLoading || this.nextStart === null) {
+            return;
+        }
+        this.isLoading = true;
+
+        const start = this.nextStart;
+        const end = start + this.windowSeconds;
+        try {
+            const response = await fetch(`${this.url}?start=${start}&end=${end}`, {
+                headers: { 'X-Requested-With': 'XMLHttpRequest' },
+            });
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            const data = await response.json();
+            data.segments.forEach(segment => this.container.appendChild(this.renderSegment(segment)));
+            this.nextStart = data.next_start;
+        } catch (error) {
+            console.error('Ошибка загрузки транскрипции:', error);
+        } finally {
+            this.isLoading = false;
+            if (this.loadMoreButton) {
+                this.loadMoreButton.style.display = this.nextStart === null ? 'none' : '';
+            }
+        }
+    }
+
+    renderSegment(segment) {
+        const element = document.createElement('span');
+        element.className = 'transcript-segment';
+        element.dataset.start = segment.start;
+        element.dataset.end = segment.end;
+        element.title = this.formatTime(segment.start);
+        element.textContent = segment.text + ' ';
+        element.style.cursor = 'pointer';
+        element.addEventListener('click', () => {
+            if (this.audio) {
+                this.audio.currentTime = segment.start;
+                this.audio.play();
+            }
+        });
+        return element;
+    }
+
+    onTimeUpdate() {
+        const time = this.audio.currentTime;
+
+        // Воспроизведение дошло до конца загруженного окна - подгружаем следующее
+        if (this.nextStart !== null && time >= this.nextStart - 5) {
+            this.loadNext();
+        }
+
+        const current = Array.from(this.container.children).find(
+            element => time >= parseFloat(element.dataset.start) && time < parseFloat(element.dataset.end)
+        );
+        if (current !== this.activeSegment) {
+            this.activeSegment?.style.removeProperty('background');
+            if (current) {
+                current.style.background = 'var(--bg-tertiary, rgba(99, 102, 241, 0.15))';
+            }
+            this.activeSegment = current;
+        }
+    }
+
+    formatTime(seconds) {
+        const minutes = Math.floor(seconds / 60);
+        const rest = Math.floor(seconds % 60);
+        return `${minutes}:${rest.toString().padStart(2, '0')}`;
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    const container = document.getElementById('transcript-segments');
+    if (!container) {
+        return;
+    }
+    const viewer = new TranscriptViewer(
+        container,
+        document.getElementById('recording-audio'),
+        document.getElementById('transcript-load-more'),
+    );
+    viewer.init();
+});
@@ -0,0 +1,177 @@
+/**
+ * Waveform of a recording drawn from precomputed peaks (/recordings/<id>/waveform/)
+ *
+ * Файл пиков в десятки раз меньше аудио, поэтому волна появляется сразу,
+ * до загрузки самого файла. Клик и перетаскивание перематывают плеер,
+ * колесо мыши меняет масштаб: для каждого масштаба берется уровень пиков,
+ * подробности которого хватает на ширину canvas.
+ */
+class WaveformPlayer {
+    constructor(container, audio) {
+        this.container = container;
+        this.audio = audio;
+        this.url = container.dataset.url;
+        this.canvas = container.querySelector('canvas');
+        this.context = this.canvas.getContext('2d');
+        this.levels = [];
+        this.duration = 0;
+        this.viewStart = 0;
+        this.viewEnd = 0;
+        this.dragging = false;
+        this.frame = null;
+    }
+
+    async init() {
+        try {
+            const response = await fetch(this.url);
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            this.parse(await response.arrayBuffer());
+        } catch (error) {
+            console.error('Ошибка загрузки волны:', error);
+            this.container.style.display = 'none';
+            return;
+        }
+
+        this.viewEnd = this.duration;
+        this.canvas.addEventListener('mousedown', event => {
+            this.dragging = true;
+            this.seek(event);
+        });
+        window.addEventListener('mousemove', event => this.dragging && this.seek(event));
+        window.addEventListener('mouseup', () => { this.dragging = false; });
+        this.canvas.addEventListener('wheel', event => this.zoom(event), { passive: false });
+        this.audio.addEventListener('timeupdate', () => this.followPlayback());
+        this.audio.addEventListener('seeked', () => this.scheduleDraw());
+        window.addEventListener('resize', () => this.scheduleDraw());
+        this.scheduleDraw();
+    }
+
+    // Формат файла описан в recordings/services/waveform.py
+    parse(buffer) {
+        const view = new DataView(buffer);
+        const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+        if (magic !== 'PEAK' || view.getUint16(4, true) !== 1) {
+            throw new Error('Неизвестный формат волны');
+        }
+        const levelCount = view.getUint16(6, true);
+        const sampleRate = view.getUint32(8, true);
+        const sampleCount = Number(view.getBigUint64(12, true));
+        this.duration = sampleCount / sampleRate;
+
+        let offset = 20 + levelCount * 8;
+        for (let i = 0; i < levelCount; i++) {
+            const samplesPerPeak = view.getUint32(20 + i * 8, true);
+            const count = view.getUint32(24 + i * 8, true);
+            this.levels.push({
+                secondsPerPeak: samplesPerPeak / sampleRate,
+                count,
+                peaks: new Int8Array(buffer, offset, count * 2),
+            });
+            offset += count * 2;
+        }
+    }
+
+    timeAt(event) {
+        const rect = this.canvas.getBoundingClientRect();
+        const ratio = Math.min(Math.max((event.clientX - rect.left) / rect.width, 0), 1);
+        return this.viewStart + ratio * (this.viewEnd - this.viewStart);
+    }
+
+    seek(event) {
+        this.audio.currentTime = this.timeAt(event);
+        this.scheduleDraw();
+    }
+
+    zoom(event) {
+        event.preventDefault();
+        const center = this.timeAt(event);
+        const minSpan = Math.min(this.duration, 5);
+        const span = Math.min(Math.max((this.viewEnd - this.viewStart) * (event.deltaY > 0 ? 1.25 : 0.8), minSpan), this.duration);
+        const ratio = (center - this.viewStart) / (this.viewEnd - this.viewStart);
+        this.viewStart = Math.min(Math.max(center - ratio * span, 0), this.duration - span);
+        this.viewEnd = this.viewStart + span;
+        this.scheduleDraw();
+    }
+
+    // Курсор воспроизведения ушел за видимое окно - окно переезжает следом
+    followPlayback() {
+        const time = this.audio.currentTime;
+        const span = this.viewEnd - this.viewStart;
+        if (!this.dragging && (time < this.viewStart || time > this.viewEnd)) {
+            this.viewStart = Math.min(Math.max(time - span * 0.1, 0), this.duration - span);
+            this.viewEnd = this.viewStart + span;
+        }
+        this.scheduleDraw();
+    }
+
+    scheduleDraw() {
+        if (this.frame === null) {
+            this.frame = requestAnimationFrame(() => {
+                this.frame = null;
+                this.draw();
+            });
+        }
+    }
+
+    // Самый грубый уровень, у которого в окне не меньше пика на пиксель
+    pickLevel(width) {
+        const span = this.viewEnd - this.viewStart;
+        for (let i = this.levels.length - 1; i >= 0; i--) {
+            if (span / this.levels[i].secondsPerPeak >= width) {
+                return this.levels[i];
+            }
+        }
+        return this.levels[0];
+    }
+
+    draw() {
+        const ratio = window.devicePixelRatio || 1;
+        const width = Math.floor(this.canvas.clientWidth * ratio);
+        const height = Math.floor(this.canvas.clientHeight * ratio);
+        if (this.canvas.width !== width || this.canvas.height !== height) {
+            this.canvas.width = width;
+            this.canvas.height = height;
+        }
+        const styles = getComputedStyle(document.documentElement);
+        const played = styles.getPropertyValue('--accent').trim() || '#6366f1';
+        const rest = styles.getPropertyValue('--text-muted').trim() || '#6b7280';
+        const ctx = this.context;
+        ctx.clearRect(0, 0, width, height);
+        if (!this.levels.length || !this.duration || !width) {
+            return;
+        }
+
+        const level = this.pickLevel(width);
+        const span = this.viewEnd - this.viewStart;
+        const playedX = ((this.audio.currentTime - this.viewStart) / span) * width;
+        const middle = height / 2;
+        for (let x = 0; x < width; x++) {
+            const from = Math.floor((this.viewStart + (x / width) * span) / level.secondsPerPeak);
+            const to = Math.max(from + 1, Math.floor((this.viewStart + ((x + 1) / width) * span) / level.secondsPerPeak));
+            let min = 127;
+            let max = -127;
+            for (let i = from; i < to && i < level.count; i++) {
+                min = Math.min(min, level.peaks[i * 2]);
+                max = Math.max(max, level.peaks[i * 2 + 1]);
+            }
+            if (min > max) {
+                continue;
+            }
+            const top = middle - (max / 127) * middle;
+            const bottom = middle - (min / 127) * middle;
+            ctx.fillStyle = x < playedX ? played : rest;
+            ctx.fillRect(x, top, 1, Math.max(bottom - top, 1));
+        }
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    const container = document.getElementById('recording-waveform');
+    const audio = document.getElementById('recording-audio');
+    if (!container || !audio) {
+        return;
+    }
+    new WaveformPlayer(container, audio).init();
+});
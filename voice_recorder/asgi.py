@@ -1,5 +1,8 @@
 """
 ASGI config for voice_recorder project.
+
+HTTP запросы обслуживает Django, WebSocket живого распознавания - recordings.live,
+поток событий дашборда (SSE) - recordings.events.
 """
 
 import os
@@ -8,5 +11,20 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'voice_recorder.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Импорт после инициализации Django (нужны модели)
+from recordings.events import DASHBOARD_EVENTS_PATH, dashboard_events_app  # noqa: E402
+from recordings.live import LIVE_TRANSCRIPTION_PATH, live_transcription_app  # noqa: E402
+
 
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        if scope['path'] == LIVE_TRANSCRIPTION_PATH:
+            return await live_transcription_app(scope, receive, send)
+        await receive()
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+    if scope['type'] == 'http' and scope['path'] == DASHBOARD_EVENTS_PATH:
+        return await dashboard_events_app(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -3,6 +3,9 @@ Celery configuration for voice_recorder project.
 """
 import os
 from celery import Celery
+from celery.signals import (
+    before_task_publish, worker_init, worker_process_init, worker_process_shutdown, worker_ready,
+)
 
 # Set default Django settings module
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'voice_recorder.settings')
@@ -17,6 +20,41 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 
+@worker_init.connect
+def remember_worker_concurrency(sender=None, **kwargs):
+    """Let recognition thread pools share the CPU quota between pool processes"""
+    from recordings.services.system_resources import set_worker_concurrency
+    set_worker_concurrency(getattr(sender, 'concurrency', 1))
+
+
+@worker_process_init.connect
+def preload_recognition_models(**kwargs):
+    """Load the hot set of models (MODEL_REGISTRY_PRELOAD) in every worker child process"""
+    from recordings.services.model_registry import preload_models
+    preload_models()
+
+
+@before_task_publish.connect
+def stamp_publish_time(headers=None, **kwargs):
+    """Send time of the task for queue wait metrics"""
+    from recordings.metrics import stamp_publish_time
+    stamp_publish_time(headers=headers)
+
+
+@worker_ready.connect
+def start_metrics_exporter(**kwargs):
+    """Expose metrics of all worker processes on METRICS_WORKER_PORT"""
+    from recordings.metrics import start_worker_exporter
+    start_worker_exporter()
+
+
+@worker_process_shutdown.connect
+def mark_metrics_process_dead(pid=None, **kwargs):
+    """Drop live gauges of the exiting child (multiprocess режим prometheus_client)"""
+    from recordings.metrics import mark_process_dead
+    mark_process_dead(pid)
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # Полнотекстовый поиск по транскрипциям
     'crispy_forms',
     'crispy_bootstrap5',
     'recordings',  # Наше приложение для записей
@@ -73,6 +74,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'voice_recorder.wsgi.application'
+ASGI_APPLICATION = 'voice_recorder.asgi.application'
 
 # Database
 # Используем PostgreSQL в продакшене, SQLite для разработки
@@ -122,6 +124,10 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 # Media files (загруженные файлы)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Internal location nginx для MEDIA_ROOT (nginx/conf.d/default.conf): файлы записей отдает nginx
+# по X-Accel-Redirect после проверки владельца. Пусто - файл отдает Django (runserver без nginx)
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX', '')
+MEDIA_CACHE_MAX_AGE = 86400  # секунд кеша браузера для аудио (Cache-Control: private)
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -135,13 +141,29 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'home'
 
+# Сессии и пользователь сессии читаются из кеша: опрос статусов не обращается к БД
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = ['recordings.auth_backends.CachedModelBackend']
+AUTH_USER_CACHE_TIMEOUT = 300  # секунд
+DASHBOARD_CACHE_TIMEOUT = 600  # секунд, снимок статистики дашборда (сбрасывается при изменении записей)
+DASHBOARD_EVENTS_HEARTBEAT = 15  # секунд между keepalive-комментариями потока событий дашборда
+DASHBOARD_EVENTS_RETRY = 5  # секунд до переподключения браузера после обрыва потока
+
 # File upload settings
 # Ограничения на размер загружаемых файлов
-FILE_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50 MB - файлы больше будут сохраняться на диск
+FILE_UPLOAD_MAX_MEMORY_SIZE = 5 * 1024 * 1024  # 5 MB - файлы больше будут сохраняться на диск
 DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50 MB
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 1000  # Максимальное количество полей в форме
 # Максимальный размер аудио файла (настраивается на уровне веб-сервера)
 MAX_AUDIO_FILE_SIZE = 100 * 1024 * 1024  # 100 MB - максимальный размер одного аудио файла
+# Возобновляемая загрузка по чанкам (/api/uploads/): размер файла не ограничен лимитом одного запроса
+MAX_CHUNKED_UPLOAD_SIZE = int(os.environ.get('MAX_CHUNKED_UPLOAD_SIZE', 2 * 1024 * 1024 * 1024))  # 2 GB
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # размер чанка, который использует клиент
+UPLOAD_CHUNK_MAX_SIZE = 16 * 1024 * 1024  # чанки больше отклоняются (меньше client_max_body_size nginx)
+UPLOAD_SESSION_EXPIRE_HOURS = 24  # незавершенные загрузки удаляются вместе с файлом
+# Потоковая загрузка во время записи: начало распознается каждые N секунд нового аудио (0 - выключено)
+UPLOAD_STREAM_PREFIX_INTERVAL = int(os.environ.get('UPLOAD_STREAM_PREFIX_INTERVAL', 60))
+UPLOAD_STREAM_PREFIX_MARGIN = 5  # последние секунды принятых данных не фиксируются (фраза может быть оборвана)
 
 # Whisper settings
 WHISPER_MODELS = {
@@ -155,6 +177,20 @@ WHISPER_MODELS = {
 DEFAULT_WHISPER_MODEL = 'base'
 WHISPER_LANGUAGE = 'ru'
 
+# Параллельное распознавание длинных записей (faster-whisper)
+# Файл режется на части по паузам (VAD) и части распознаются одновременно
+# в пуле потоков, размер которого равен доступной квоте CPU воркера
+FASTER_WHISPER_CHUNKED = os.environ.get('FASTER_WHISPER_CHUNKED', 'True') == 'True'
+FASTER_WHISPER_CHUNKED_MIN_DURATION = int(os.environ.get('FASTER_WHISPER_CHUNKED_MIN_DURATION', 600))  # секунд
+FASTER_WHISPER_CHUNK_SECONDS = int(os.environ.get('FASTER_WHISPER_CHUNK_SECONDS', 300))  # целевой размер части
+
+# Пакетное распознавание нескольких записей (faster-whisper >= 1.1)
+# Задача забирает из очереди до N записей с той же моделью и языком
+# и декодирует их 30-секундные окна общими пакетами
+FASTER_WHISPER_BATCH_MAX_RECORDINGS = int(os.environ.get('FASTER_WHISPER_BATCH_MAX_RECORDINGS', 4))  # 1 = выключено
+FASTER_WHISPER_BATCH_SIZE = int(os.environ.get('FASTER_WHISPER_BATCH_SIZE', 8))  # окон в одном вызове модели
+FASTER_WHISPER_BATCH_MAX_DURATION = int(os.environ.get('FASTER_WHISPER_BATCH_MAX_DURATION', 1800))  # секунд аудио на пакет
+
 # Celery Configuration
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://redis:6379/0')
 CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', 'redis://redis:6379/0')
@@ -169,6 +205,8 @@ CELERY_TASK_SOFT_TIME_LIMIT = 1500  # 25 минут мягкий лимит
 # Ограничения для предотвращения перегрузки памяти
 CELERY_WORKER_PREFETCH_MULTIPLIER = 1  # Не забирать задачи заранее
 CELERY_WORKER_MAX_TASKS_PER_CHILD = 20  # Перезапускать воркер после N задач
+# Предзагрузка моделей в worker_process_init занимает больше стандартных 4 секунд
+CELERY_WORKER_PROC_ALIVE_TIMEOUT = int(os.environ.get('CELERY_WORKER_PROC_ALIVE_TIMEOUT', 120))
 CELERY_TASK_ACKS_LATE = True  # Подтверждать задачи только после выполнения
 CELERY_TASK_REJECT_ON_WORKER_LOST = True  # Отклонять задачи при потере воркера
 # Очистка результатов (хранить только 24 часа)
@@ -179,6 +217,97 @@ CELERY_RESULT_BACKEND_TRANSPORT_OPTIONS = {
         'timeout': 5.0
     }
 }
+# Маршрутизация распознавания по очередям: у каждой очереди свой воркер (см. docker-compose.yml)
+TRANSCRIPTION_QUEUE_FAST = 'fast'  # vosk и маленькие модели Whisper
+TRANSCRIPTION_QUEUE_HEAVY = 'heavy'  # small и выше
+TRANSCRIPTION_FAST_WHISPER_MODELS = ['tiny', 'base']
+# Проверка загруженных файлов (валидация, длительность, хеш) - отдельная очередь и воркер celery-io
+INGEST_QUEUE = 'io'
+INGEST_PREDECODE_PCM = os.environ.get('INGEST_PREDECODE_PCM', 'True') == 'True'  # декодировать в кеш PCM до распознавания
+CELERY_TASK_DEFAULT_QUEUE = TRANSCRIPTION_QUEUE_FAST  # служебные задачи (очистка кеша) - в быструю очередь
+TRANSCRIPTION_CLAIM_TIMEOUT = 7200  # не меньше --time-limit воркера тяжелой очереди
+TRANSCRIPTION_PROGRESS_INTERVAL = 2.0  # секунд между публикациями прогресса в кеш
+TRANSCRIPTION_CHECKPOINT_INTERVAL = int(os.environ.get('TRANSCRIPTION_CHECKPOINT_INTERVAL', 30))  # секунд между записями чекпоинта в БД
+TRANSCRIPT_SEGMENTS_WINDOW = 300  # секунд транскрипции в одном запросе страницы записи
+# Конфигурации полнотекстового поиска PostgreSQL по языку распознавания (остальные языки - simple)
+TRANSCRIPTION_SEARCH_CONFIGS = {'ru': 'russian'}
+SEARCH_HEADLINE_MAX_FRAGMENTS = 2  # фрагментов транскрипции в результатах поиска
+# Сколько задач каждой очереди выполняется одновременно (= --concurrency ее воркера)
+TRANSCRIPTION_QUEUE_CONCURRENCY = {
+    TRANSCRIPTION_QUEUE_FAST: int(os.environ.get('CELERY_FAST_CONCURRENCY', 2)),
+    TRANSCRIPTION_QUEUE_HEAVY: int(os.environ.get('CELERY_HEAVY_CONCURRENCY', 1)),
+}
+
+# Планировщик: короткие задачи первыми (recordings/scheduler.py)
+TRANSCRIPTION_SCHEDULER_ENABLED = os.environ.get('TRANSCRIPTION_SCHEDULER_ENABLED', 'True') == 'True'
+TRANSCRIPTION_SCHEDULER_AGING = float(os.environ.get('TRANSCRIPTION_SCHEDULER_AGING', 5.0))  # вес стоимости в приоритете
+TRANSCRIPTION_SCHEDULER_MAX_PER_USER = int(os.environ.get('TRANSCRIPTION_SCHEDULER_MAX_PER_USER', 1))  # 0 = без лимита
+TRANSCRIPTION_SCHEDULER_DEFAULT_DURATION = 300  # секунд, если длительность записи неизвестна
+# Секунд обработки на секунду аудио (CPU, int8), ключ "движок:модель" или "движок"
+TRANSCRIPTION_REAL_TIME_FACTORS = {
+    'vosk': 0.1,
+    'faster-whisper:tiny': 0.05,
+    'faster-whisper:base': 0.1,
+    'faster-whisper:small': 0.3,
+    'faster-whisper:medium': 0.8,
+    'faster-whisper:large': 1.6,
+    'whisper:tiny': 0.15,
+    'whisper:base': 0.3,
+    'whisper:small': 0.9,
+    'whisper:medium': 2.5,
+    'whisper:large': 5.0,
+}
+# Периодические задачи (celery-beat)
+CELERY_BEAT_SCHEDULE = {
+    'evict-transcription-cache': {
+        'task': 'recordings.tasks.evict_transcription_cache_task',
+        'schedule': 6 * 3600,  # каждые 6 часов
+    },
+    'dispatch-scheduled-transcriptions': {
+        'task': 'recordings.tasks.dispatch_scheduled_transcriptions_task',
+        'schedule': 60,
+    },
+    'cleanup-upload-sessions': {
+        'task': 'recordings.tasks.cleanup_upload_sessions_task',
+        'schedule': 3600,
+    },
+}
+
+# Реестр загруженных моделей (общий для whisper, faster-whisper и vosk)
+# Бюджет должен быть меньше --max-memory-per-child воркера, 0 = без ограничения
+MODEL_REGISTRY_MEMORY_BUDGET_MB = int(os.environ.get('MODEL_REGISTRY_MEMORY_BUDGET_MB', 1200))
+# Модели, загружаемые при старте процесса воркера: "движок:модель" через запятую,
+# например "faster-whisper:base,vosk:small-ru-0.22"
+MODEL_REGISTRY_PRELOAD = [
+    spec.strip() for spec in os.environ.get('MODEL_REGISTRY_PRELOAD', '').split(',') if spec.strip()
+]
+
+# Кеш результатов распознавания (ключ - хеш аудио + движок, модель, язык, параметры)
+TRANSCRIPTION_CACHE_ENABLED = os.environ.get('TRANSCRIPTION_CACHE_ENABLED', 'True') == 'True'
+TRANSCRIPTION_CACHE_MAX_ENTRIES = int(os.environ.get('TRANSCRIPTION_CACHE_MAX_ENTRIES', 10000))
+TRANSCRIPTION_CACHE_MAX_AGE_DAYS = int(os.environ.get('TRANSCRIPTION_CACHE_MAX_AGE_DAYS', 30))  # по last_used_at
+TRANSCRIPTION_CACHE_VERSION = 1  # увеличить, чтобы сбросить кеш после изменения алгоритмов
+
+# Кеш декодированного аудио: 16 kHz моно float32, общий для всех движков (recordings/services/pcm_cache.py)
+PCM_CACHE_ENABLED = os.environ.get('PCM_CACHE_ENABLED', 'True') == 'True'
+PCM_CACHE_DIR = os.environ.get('PCM_CACHE_DIR', str(BASE_DIR / 'pcm_cache'))
+PCM_CACHE_MAX_SIZE_MB = int(os.environ.get('PCM_CACHE_MAX_SIZE_MB', 5120))  # LRU по времени использования
+
+# Длительность по заголовкам контейнера, запасной путь - ffprobe (recordings/services/audio_probe.py)
+AUDIO_PROBE_WORKERS = int(os.environ.get('AUDIO_PROBE_WORKERS', 8))  # потоков в backfill_durations
+AUDIO_PROBE_FFPROBE_TIMEOUT = 30  # секунд на один вызов ffprobe
+
+# Пики волны для плеера, считаются при проверке загрузки (recordings/services/waveform.py)
+WAVEFORM_ENABLED = os.environ.get('WAVEFORM_ENABLED', 'True') == 'True'
+WAVEFORM_SAMPLES_PER_PEAK = 512  # самый подробный уровень: 32 мс при 16 kHz
+WAVEFORM_LEVEL_FACTOR = 4  # во сколько раз грубее каждый следующий уровень
+WAVEFORM_MIN_PEAKS = 2048  # уровни строятся, пока пиков больше
+
+# Метрики Prometheus (recordings/metrics.py): web - /metrics, воркеры Celery - METRICS_WORKER_PORT.
+# Для gunicorn и prefork Celery нужна переменная окружения PROMETHEUS_MULTIPROC_DIR
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True') == 'True'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')  # Authorization: Bearer <токен>, пусто - без проверки
+METRICS_WORKER_PORT = int(os.environ.get('METRICS_WORKER_PORT', 0))  # 0 - экспортер воркера выключен
 
 # Security settings для продакшена
 if not DEBUG:
@@ -291,6 +420,20 @@ VOSK_MODELS = {
     },
 }
 
+# Параллельное распознавание длинных записей (Vosk)
+# Запись из кеша PCM режется по паузам, каждая часть распознается своим
+# KaldiRecognizer в пуле потоков; Model из реестра общая для всех потоков
+VOSK_PARALLEL = os.environ.get('VOSK_PARALLEL', 'True') == 'True'
+VOSK_PARALLEL_MIN_DURATION = int(os.environ.get('VOSK_PARALLEL_MIN_DURATION', 300))  # секунд
+VOSK_CHUNK_SECONDS = int(os.environ.get('VOSK_CHUNK_SECONDS', 120))  # целевой размер части
+# Очередь длинных записей Vosk: у ее воркера должно быть больше одного ядра на задачу
+# (тяжелая очередь: cpus 2.0, --concurrency=1)
+VOSK_PARALLEL_QUEUE = os.environ.get('VOSK_PARALLEL_QUEUE', TRANSCRIPTION_QUEUE_HEAVY)
+
+# Живое распознавание (WebSocket, сервис asgi)
+VOSK_STREAM_MAX_SESSIONS = int(os.environ.get('VOSK_STREAM_MAX_SESSIONS', 4))  # одновременных сессий на процесс
+VOSK_STREAM_MAX_DURATION = int(os.environ.get('VOSK_STREAM_MAX_DURATION', 3 * 3600))  # секунд
+
 # Создать директорию для логов (только если не в Docker)
 try:
     (BASE_DIR / 'logs').mkdir(exist_ok=True)